@@ -0,0 +1,176 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+
+# --- รูปภาพที่ดาวน์โหลดมาแล้วเก็บไว้บนดิสก์ (พร้อม ETag และเวลาที่ดาวน์โหลด) ---
+ASSET_DIR = os.environ.get('SD_ASSET_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.sd_cache', 'assets'))
+# --- รูปสำรองที่มากับ repo (ชื่อไฟล์เดียวกับใน URL) ใช้เมื่อ offline และยังไม่เคยดาวน์โหลด ---
+BUNDLED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+# --- รูปแทนที่ใน BUNDLED_DIR ใช้เมื่อไม่มีรูปไหนเลย (ไม่มีบนดิสก์ ไม่มีรูปสำรองชื่อเดียวกัน และดาวน์โหลดไม่ได้) ---
+PLACEHOLDER_FILE = 'placeholder.png'
+# --- อายุของรูปบนดิสก์ (วินาที) ก่อนจะเช็คกับ server ใหม่ ---
+ASSET_TTL_SECONDS = int(os.environ.get('SD_ASSET_TTL_SECONDS', str(24 * 3600)))
+FETCH_TIMEOUT_SECONDS = 5
+# --- ถ้าดาวน์โหลดไม่สำเร็จ จะไม่ลองใหม่จนกว่าจะครบเวลานี้ (กันทุก rerun ค้างรอ network) ---
+RETRY_AFTER_SECONDS = 60
+
+# --- รูปที่ Dashboard หุ่นยนต์และหน้า HTML ของ sd_publish ใช้ (ต้องเป็น Raw Link https://raw.githubusercontent.com/...) ---
+# เปลี่ยนได้ผ่าน env เช่น server รูปภายใน หรือ server จำลองของ sd_loadtest
+RIDER_IMAGE_URL = os.environ.get('SD_RIDER_IMAGE_URL', "https://raw.githubusercontent.com/daemuktnant-MFC/streamlit-assets/main/Rider_pic.png")
+ROBOT_IMAGE_URL = os.environ.get('SD_ROBOT_IMAGE_URL', "https://raw.githubusercontent.com/daemuktnant-MFC/streamlit-assets/main/Robot_pic.png")
+
+IMAGE_FORMATS = {'png': 'png', 'jpg': 'jpeg', 'jpeg': 'jpeg', 'gif': 'gif'}
+
+# --- cache ในหน่วยความจำ: url -> (bytes, data URI, เวลาที่เช็คล่าสุด) ---
+_memory = {}
+_refreshing = set()
+_failed_at = {}
+_lock = threading.Lock()
+
+
+def _image_format(url):
+    return IMAGE_FORMATS.get(url.split('?')[0].split('.')[-1].lower(), 'png')
+
+
+def _paths(url):
+    name = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return os.path.join(ASSET_DIR, name), os.path.join(ASSET_DIR, name + '.json')
+
+
+def _read_disk(url):
+    data_path, meta_path = _paths(url)
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(data_path, 'rb') as f:
+            return f.read(), meta
+    except (OSError, ValueError):
+        return None, None
+
+
+def _write_disk(url, data, meta):
+    data_path, meta_path = _paths(url)
+    os.makedirs(ASSET_DIR, exist_ok=True)
+    for path, content, mode in ((data_path, data, 'wb'), (meta_path, json.dumps(meta), 'w')):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, mode) as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+def _read_bundled(url):
+    path = os.path.join(BUNDLED_DIR, os.path.basename(url.split('?')[0]))
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _placeholder():
+    # ไม่เก็บลง _memory เพื่อให้ลองดาวน์โหลดรูปจริงใหม่เมื่อครบ RETRY_AFTER_SECONDS
+    try:
+        with open(os.path.join(BUNDLED_DIR, PLACEHOLDER_FILE), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None, None
+    return data, f"data:image/png;base64,{base64.b64encode(data).decode()}"
+
+
+def _remember(url, data):
+    data_uri = f"data:image/{_image_format(url)};base64,{base64.b64encode(data).decode()}"
+    _memory[url] = (data, data_uri, time.time())
+    return data, data_uri
+
+
+def _fetch(url, meta):
+    # ดาวน์โหลดรูป (ส่ง If-None-Match ถ้ามี ETag เดิม) คืนค่า bytes ใหม่ หรือ None ถ้ารูปไม่เปลี่ยน
+    import requests
+
+    headers = {}
+    if meta and meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    # 💥 คง verify=False ไว้ตามเดิม เพื่อหลีกเลี่ยง SSLError บนเครื่อง kiosk
+    response = requests.get(url, headers=headers, timeout=FETCH_TIMEOUT_SECONDS, verify=False)
+    if response.status_code == 304:
+        _write_disk(url, _read_disk(url)[0], {**meta, 'fetched_at': time.time()})
+        return None
+    response.raise_for_status()
+    data = response.content
+    _write_disk(url, data, {'etag': response.headers.get('ETag'), 'fetched_at': time.time()})
+    return data
+
+
+def _refresh_in_background(url, meta):
+    # เช็ครูปใหม่เบื้องหลัง โดยระหว่างนี้ยังใช้รูปเดิมแสดงผล
+    with _lock:
+        if url in _refreshing:
+            return
+        _refreshing.add(url)
+
+    def worker():
+        import requests
+
+        try:
+            data = _fetch(url, meta)
+            if data:
+                with _lock:
+                    _remember(url, data)
+        except requests.exceptions.RequestException:
+            pass
+        finally:
+            with _lock:
+                _refreshing.discard(url)
+
+    threading.Thread(target=worker, name=f"asset-refresh-{os.path.basename(url)}", daemon=True).start()
+
+
+def get_image(url):
+    # คืนค่า (bytes, data URI) ของรูป หรือ (None, None) ถ้าไม่มีรูปเลย
+    # ลำดับ: หน่วยความจำ -> ดิสก์ -> รูปสำรองใน repo -> ดาวน์โหลด (บล็อกเฉพาะกรณีที่ไม่มีรูปในเครื่องเลย) -> รูปแทนที่
+    with _lock:
+        cached = _memory.get(url)
+    if cached is not None:
+        data, data_uri, checked_at = cached
+        if time.time() - checked_at > ASSET_TTL_SECONDS:
+            _refresh_in_background(url, _read_disk(url)[1])
+            with _lock:
+                _memory[url] = (data, data_uri, time.time())
+        return data, data_uri
+
+    data, meta = _read_disk(url)
+    if data is not None:
+        if time.time() - meta.get('fetched_at', 0) > ASSET_TTL_SECONDS:
+            _refresh_in_background(url, meta)
+        with _lock:
+            return _remember(url, data)
+
+    bundled = _read_bundled(url)
+    if bundled is not None:
+        _refresh_in_background(url, None)
+        with _lock:
+            return _remember(url, bundled)
+
+    if time.time() - _failed_at.get(url, 0) < RETRY_AFTER_SECONDS:
+        return _placeholder()
+    # import requests เฉพาะตอนต้องดาวน์โหลดจริง (ปกติรูปอยู่บนดิสก์หรือใน repo แล้ว)
+    import requests
+
+    try:
+        data = _fetch(url, None)
+    except requests.exceptions.RequestException:
+        _failed_at[url] = time.time()
+        return _placeholder()
+    with _lock:
+        return _remember(url, data)
+
+
+def get_data_uri(url):
+    return get_image(url)[1]
+
+
+def get_bytes(url):
+    return get_image(url)[0]
@@ -0,0 +1,159 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import sd_cache
+import sd_loader
+import sd_snapshot
+import sd_store
+import sd_stream
+
+# --- ความถี่ที่หน้าเว็บเช็คว่างานโหลดเบื้องหลังเสร็จหรือยัง (วินาที) ---
+POLL_SECONDS = float(os.environ.get('SD_BACKGROUND_POLL_SECONDS', '1'))
+# --- จำนวนงานโหลด (ชุดไฟล์ที่อัปโหลด) ที่เก็บผลไว้ใน process ---
+MAX_JOBS = 4
+# --- จำนวน hash ของไฟล์ที่อัปโหลดที่จำไว้ (ต่อ file_id) ---
+MAX_FILE_HASHES = 64
+
+
+class Loaded:
+    # ชุดข้อมูลที่พร้อมแสดง: df (None ถ้าอ่านแบบ streaming) หรือ stream + snapshot ที่สร้างกราฟ/ตัวกรองไว้แล้ว
+    # หน้าเว็บสลับจากชุดเดิมมาใช้ชุดนี้ทั้งก้อนในครั้งเดียว จึงไม่มีจังหวะที่ KPI กับกราฟมาจากคนละไฟล์
+    # ไม่ถือ DataFrame ไว้เอง (งานที่เสร็จแล้วและทุก session เก็บ Loaded ไว้) เก็บแค่ key แล้วดึงจาก sd_store ทุกครั้งที่ใช้
+    # ข้อมูลจึงมีเจ้าของเดียวคือ sd_store และงบ SD_STORE_MAX_MB คุมหน่วยความจำได้จริง
+
+    def __init__(self, key, name, df, stream, snap):
+        self.key = key
+        self.name = name
+        self.dataset = df.attrs['cache']['key'] if df is not None else None
+        self.stream = stream
+        self.snap = snap
+        # attrs ตอนโหลด (เวลาอ่านไฟล์/engine) ใช้แสดงผลต่อ แม้ชุดข้อมูลจะถูกโหลดกลับจาก cache บนดิสก์ภายหลัง
+        self.attrs = dict(df.attrs) if df is not None else stream.attrs
+        self.rows = len(df) if df is not None else stream.rows
+
+    @property
+    def df(self):
+        # view ของชุดข้อมูลจาก sd_store (ถูกเอาออกแล้วโหลดกลับจาก Parquet บนดิสก์) None ถ้าอ่านแบบ streaming หรือหาไม่พบ
+        if self.dataset is None:
+            return None
+        df = sd_cache.cached_orders(self.dataset)
+        if df is not None:
+            df.attrs.update(self.attrs)
+        return df
+
+    def expired(self):
+        # ชุดข้อมูลไม่อยู่ทั้งในหน่วยความจำและบนดิสก์ (cache บนดิสก์ถูก evict) ต้องอ่านไฟล์ใหม่
+        return self.dataset is not None and not sd_store.contains(self.dataset) and not os.path.exists(sd_cache._path(self.dataset))
+
+
+class LoadJob:
+    # งานอ่านไฟล์ + สร้าง snapshot ใน thread เบื้องหลัง ใช้ร่วมกันทุก session ที่อัปโหลดไฟล์ชุดเดียวกัน
+
+    def __init__(self, key, target):
+        self.key = key
+        self.result = None
+        self.error = None
+        self.done = 0
+        self.total = 0
+        self.started_at = time.time()
+        self.finished_at = None
+        self._thread = threading.Thread(target=self._run, args=(target,), name=f"sd-load-{key[:16]}", daemon=True)
+
+    def _run(self, target):
+        try:
+            self.result = target(self.progress)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished_at = time.time()
+
+    def progress(self, done, total):
+        self.done, self.total = done, total
+
+    @property
+    def running(self):
+        return self.finished_at is None
+
+    @property
+    def fraction(self):
+        # สัดส่วนที่อ่านแล้ว (มีเฉพาะการอ่านแบบ streaming) ถ้าไม่รู้จำนวนแถวทั้งหมดคืนค่า None
+        return min(self.done / self.total, 1.0) if self.total else None
+
+    def describe(self):
+        seconds = time.time() - self.started_at
+        if self.done:
+            return f"กำลังอ่านไฟล์: {self.done:,} แถว ({seconds:.0f} วินาที)"
+        return f"กำลังอ่านไฟล์... ({seconds:.0f} วินาที)"
+
+
+_jobs = OrderedDict()
+_file_hashes = OrderedDict()
+_lock = threading.Lock()
+
+
+def submit(key, target):
+    # งานของ key นี้ (เริ่มใหม่ถ้ายังไม่มี) target(progress) ต้องคืนค่า Loaded
+    # งานที่ error ยังอยู่จนหน้าเว็บแจ้งผลแล้วเรียก discard (rerun ถัดไปจึงลองอ่านใหม่ ไม่ค้าง error ชั่วคราวไว้ตลอด)
+    with _lock:
+        job = _jobs.get(key)
+        if job is not None and not (job.result is not None and job.result.expired()):
+            _jobs.move_to_end(key)
+            return job
+        job = _jobs[key] = LoadJob(key, target)
+        finished = [old_key for old_key, old in _jobs.items() if not old.running]
+        for old_key in finished[:max(len(_jobs) - MAX_JOBS, 0)]:
+            del _jobs[old_key]
+    job._thread.start()
+    return job
+
+
+def discard(job):
+    # เอางานที่แจ้ง error แล้วออก (ถ้ายังเป็นงานเดียวกับที่อยู่ใน registry)
+    with _lock:
+        if _jobs.get(job.key) is job:
+            del _jobs[job.key]
+
+
+def file_hash(uploaded_file):
+    # sd_cache.content_hash ของไฟล์ที่อัปโหลด จำไว้ต่อ file_id (UploadedFile ของ Streamlit) จึง hash ไฟล์ละครั้งเดียว
+    # ไม่ใช่ทุก rerun (กดตัวกรอง/เปลี่ยนหน้า) ไฟล์ที่ไม่มี file_id hash ใหม่ทุกครั้ง
+    file_id = getattr(uploaded_file, 'file_id', None)
+    if file_id is not None:
+        with _lock:
+            digest = _file_hashes.get(file_id)
+            if digest is not None:
+                _file_hashes.move_to_end(file_id)
+                return digest
+    digest = sd_cache.content_hash(uploaded_file.getvalue())
+    if file_id is not None:
+        with _lock:
+            _file_hashes[file_id] = digest
+            while len(_file_hashes) > MAX_FILE_HASHES:
+                _file_hashes.popitem(last=False)
+    return digest
+
+
+def upload_key(uploaded_files):
+    # key ของชุดไฟล์ที่อัปโหลด (ชื่อไฟล์ + hash ของเนื้อไฟล์ เพราะชื่อไฟล์ใช้เป็น Site และวันที่ของไฟล์)
+    joined = '|'.join(f"{sd_loader._file_name(f)}:{file_hash(f)}" for f in uploaded_files)
+    return "upload-" + hashlib.blake2b(joined.encode('utf-8'), digest_size=20).hexdigest()
+
+
+def load_uploads(key, uploaded_files, figures, progress=None):
+    # อ่านไฟล์ (หลายไฟล์/streaming/ปกติ) แล้วสร้าง snapshot + กราฟที่หน้าเว็บใช้ + bitmap index ให้เสร็จก่อนสลับมาแสดง
+    # hash ของแต่ละไฟล์มาจาก file_hash (คำนวณไว้แล้วตอนทำ upload_key) ไม่ hash เนื้อไฟล์ซ้ำ
+    hashes = [file_hash(f) for f in uploaded_files]
+    df = stream = None
+    if len(uploaded_files) > 1:
+        df = sd_cache.load_many(uploaded_files, keys=hashes)
+    elif sd_stream.should_stream(uploaded_files[0]):
+        stream = sd_stream.get_stream(hashes[0], uploaded_files[0], progress)
+    else:
+        df = sd_cache.load_orders(uploaded_files[0], key=hashes[0])
+
+    snap = sd_snapshot.get_cube_snapshot(stream.key, stream.cube) if stream is not None else sd_snapshot.get_snapshot(df)
+    snap.prepare(figures)
+    return Loaded(key, sd_loader._file_name(uploaded_files[0]), df, stream, snap)
@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import plotly.io as pio
+import pyarrow.parquet as pq
+
+import sd_charts
+import sd_cube
+import sd_loader
+import sd_schema
+import sd_sla
+import sd_snapshot
+import sd_synth
+
+# --- วัดเวลาแต่ละขั้นของ Dashboard บนไฟล์จำลองหลายขนาด แล้วเขียนรายงาน JSON ---
+# ตัวอย่าง: python sd_bench.py --rows 10000 100000 --format xlsx --out bench.json
+#          python sd_bench.py --rows 1000000 --format parquet --compare bench.json
+
+STAGES = ['parse', 'normalize', 'cube', 'kpis', 'rider_agg', 'hourly_agg', 'figures', 'serialize']
+# --- ช้าลงเกินสัดส่วนนี้เมื่อเทียบกับรายงานเดิม ถือว่า regression ---
+REGRESSION_THRESHOLD = 0.20
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _read(path):
+    if path.endswith('.parquet'):
+        # เฉพาะคอลัมน์ที่มีในไฟล์ (เหมือน usecols ของ sd_loader.read_orders) ไฟล์ที่มีแค่เวลาดิบไม่มี Hours/SLA STS
+        wanted = sd_loader.REQUIRED_COLUMNS + sd_sla.TIME_COLUMNS
+        columns = [col for col in pq.read_schema(path).names if col in wanted]
+        return pd.read_parquet(path, columns=columns)
+    return sd_loader.read_orders(path)
+
+
+def _normalize(raw):
+    # รวมการคำนวณ Hours/SLA STS จากเวลาดิบ (ไฟล์ที่ไม่มีคอลัมน์สูตร) ไว้ในขั้น normalize
+    return sd_schema.normalize_orders(sd_sla.derive(raw))
+
+
+def _hourly_matrix(cube):
+    return sd_charts.hourly_matrix(cube.hourly())
+
+
+def _build_figures(cube, rider_counts, hourly):
+    sla_counts = sd_snapshot.sla_dot_counts(cube.sla_totals())
+    return [
+        sd_charts.build_payment_pie(cube.payment_counts()),
+        sd_charts.build_rider_bar(rider_counts),
+        sd_charts.build_sla_donut(sla_counts),
+        sd_charts.build_hourly_chart(hourly),
+        sd_charts.build_hourly_chart(hourly, combo=True),
+    ]
+
+
+def run_once(path):
+    # วัดเวลาทุกขั้นของไฟล์ 1 ไฟล์ 1 รอบ (วินาที)
+    timings = {}
+    raw, timings['parse'] = _timed(_read, path)
+    df, timings['normalize'] = _timed(_normalize, raw)
+    cube, timings['cube'] = _timed(sd_cube.OrderCube.from_frame, df)
+    _, timings['kpis'] = _timed(cube.kpis)
+    rider_counts, timings['rider_agg'] = _timed(cube.rider_order_counts)
+    hourly, timings['hourly_agg'] = _timed(_hourly_matrix, cube)
+    figures, timings['figures'] = _timed(_build_figures, cube, rider_counts, hourly)
+    _, timings['serialize'] = _timed(lambda: [pio.to_json(fig, validate=False) for fig in figures])
+    timings['total'] = sum(timings[stage] for stage in STAGES)
+    return timings, len(raw)
+
+
+def _environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'engines': {ext: sd_loader.engine_chain(f"x.{ext}") for ext in ('xlsx', 'xlsb')},
+    }
+
+
+def run_benchmark(sizes, fmt='xlsx', repeat=3, seed=0, workdir=None, files=None):
+    results = []
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        inputs = [(f, None) for f in (files or [])]
+        for rows in sizes:
+            path = os.path.join(tmp, f"sd_synth_{rows}.{fmt}")
+            sd_synth.write_export(sd_synth.generate_orders(rows, seed=seed), path, fmt)
+            inputs.append((path, rows))
+
+        for path, rows in inputs:
+            runs = [run_once(path) for _ in range(repeat)]
+            stages = {stage: statistics.median(t[stage] for t, _ in runs) for stage in STAGES + ['total']}
+            results.append({
+                'input': os.path.basename(path) if rows is None else f"synthetic-{rows}.{fmt}",
+                'rows': runs[0][1],
+                'bytes': os.path.getsize(path),
+                'repeat': repeat,
+                'seconds': stages,
+            })
+    return {'environment': _environment(), 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}
+
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    # เทียบกับรายงานเดิม คืนค่ารายการขั้นที่ช้าลงเกิน threshold
+    previous = {r['input']: r for r in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        old = previous.get(result['input'])
+        if old is None:
+            continue
+        for stage, seconds in result['seconds'].items():
+            old_seconds = old['seconds'].get(stage)
+            if old_seconds and seconds > old_seconds * (1 + threshold):
+                regressions.append({
+                    'input': result['input'],
+                    'stage': stage,
+                    'baseline_seconds': old_seconds,
+                    'seconds': seconds,
+                    'ratio': seconds / old_seconds,
+                })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ทุกขั้นของ SD Dashboard")
+    parser.add_argument('--rows', type=int, nargs='*', default=[10_000, 100_000])
+    parser.add_argument('--format', choices=sd_synth.FORMATS, default='xlsx')
+    parser.add_argument('--file', action='append', default=[], help="ไฟล์ export จริงที่ต้องการวัดเพิ่ม (ใส่ได้หลายครั้ง)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help="เขียนรายงาน JSON ลงไฟล์ (ค่าเริ่มต้นพิมพ์ออกหน้าจอ)")
+    parser.add_argument('--compare', help="รายงาน JSON เดิมสำหรับตรวจ regression")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.rows, args.format, args.repeat, args.seed, files=args.file)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            report['regressions'] = compare(report, json.load(f), args.threshold)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 1 if report.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+import hashlib
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import sd_loader
+import sd_schema
+import sd_sla
+import sd_store
+
+# --- ที่เก็บ cache บนดิสก์ (แชร์ได้ระหว่างการรีสตาร์ท server และหลายเครื่อง kiosk) ---
+CACHE_DIR = os.environ.get('SD_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.sd_cache'))
+# --- ขนาดสูงสุดของ cache (MB) เกินแล้วจะลบไฟล์ที่ไม่ได้ใช้นานที่สุดออกก่อน (LRU) ---
+CACHE_MAX_MB = float(os.environ.get('SD_CACHE_MAX_MB', '512'))
+# --- เปลี่ยนเลขนี้เมื่อรูปแบบข้อมูลที่เก็บใน cache เปลี่ยน เพื่อไม่ให้อ่านไฟล์รูปแบบเก่า ---
+CACHE_VERSION = 4
+
+
+def content_hash(data):
+    # key ของ cache คือ hash ของเนื้อไฟล์ ไม่ใช่ชื่อไฟล์ + ค่าตั้งของการคำนวณ Hours/SLA STS จากเวลาดิบ (sd_sla)
+    digest = hashlib.blake2b(data, digest_size=20)
+    digest.update(sd_sla.signature().encode('utf-8'))
+    return f"v{CACHE_VERSION}-" + digest.hexdigest()
+
+
+# --- ชนิดไฟล์ที่เก็บใน cache (DataFrame เป็น Parquet, กราฟที่สร้างแล้วเป็น JSON) ---
+CACHE_EXTENSIONS = ('.parquet', '.json')
+
+
+def _path(key, ext='.parquet'):
+    return os.path.join(CACHE_DIR, f"{key}{ext}")
+
+
+# --- cache ใช้ร่วมกันหลาย process/เครื่อง: ไฟล์อาจถูกอีก process ลบ (evict) ไปก่อนได้ทุกเมื่อ ---
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def get(key):
+    path = _path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        df = pd.read_parquet(path)
+    except FileNotFoundError:
+        # อีก process ลบออกไปแล้ว (evict) ระหว่างเช็คกับอ่าน
+        return None
+    except Exception:
+        # ไฟล์เสีย/เขียนไม่ครบ ให้ลบทิ้งแล้วอ่าน Excel ใหม่
+        _remove(path)
+        return None
+    # แตะเวลาไฟล์ เพื่อใช้เป็นลำดับ LRU
+    _touch(path)
+    return df
+
+
+def _write(path, writer):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # เขียนลงไฟล์ชั่วคราวก่อนแล้วค่อย rename เพื่อไม่ให้อีก process อ่านไฟล์ที่เขียนไม่เสร็จ
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    os.close(fd)
+    try:
+        writer(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    evict()
+    return True
+
+
+def put(key, df):
+    return _write(_path(key), lambda tmp_path: df.to_parquet(tmp_path, index=False))
+
+
+def get_text(key):
+    # ข้อความ (เช่น JSON ของกราฟ) ที่เก็บไว้ด้วย put_text คืนค่า None ถ้าไม่มี
+    path = _path(key, '.json')
+    try:
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+    except OSError:
+        return None
+    _touch(path)
+    return text
+
+
+def put_text(key, text):
+    def writer(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+    return _write(_path(key, '.json'), writer)
+
+
+def evict(max_mb=None):
+    # ลบไฟล์ที่ไม่ได้ใช้นานที่สุดจนขนาดรวมไม่เกิน max_mb
+    max_bytes = (CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    if not os.path.isdir(CACHE_DIR):
+        return
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(CACHE_EXTENSIONS):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove(path)
+        total -= size
+
+
+def latest_key():
+    # key ของชุดข้อมูลที่ใช้ล่าสุด (ไฟล์ Parquet ที่ถูกแตะล่าสุด ไม่นับไฟล์ spill ของ sd_stream) ใช้ pre-warm ตอนเริ่ม server
+    if not os.path.isdir(CACHE_DIR):
+        return None
+    candidates = []
+    for entry in os.scandir(CACHE_DIR):
+        if entry.is_file() and entry.name.endswith('.parquet') and not entry.name.endswith('-stream.parquet'):
+            try:
+                candidates.append((entry.stat().st_mtime_ns, entry.name[:-len('.parquet')]))
+            except FileNotFoundError:
+                continue
+    return max(candidates)[1] if candidates else None
+
+
+def cached_orders(key):
+    # ชุดข้อมูลที่เคยอ่านแล้วจาก key: ในหน่วยความจำ (sd_store) ก่อน แล้วค่อยไฟล์ Parquet (คืนค่า None ถ้าไม่มีทั้งสองที่)
+    start = time.perf_counter()
+    df = sd_store.get(key)
+    if df is None:
+        df = get(key)
+        if df is None:
+            return None
+        df = sd_store.put(key, sd_schema.freeze_frame(df))
+    df.attrs.pop('parse', None)
+    df.attrs['cache'] = {'hit': True, 'key': key, 'seconds': time.perf_counter() - start}
+    return df
+
+
+def load_orders(uploaded_file, key=None):
+    # อ่านไฟล์ผ่าน cache: ถ้าเคยอ่านไฟล์เนื้อหาเดียวกันแล้วจะโหลดจาก Parquet แทนการ parse Excel
+    # (เก็บเป็น DataFrame ที่ปรับ schema แล้ว จึงไม่ต้อง normalize ซ้ำตอนโหลดจาก cache)
+    if key is None:
+        key = content_hash(uploaded_file.getvalue())
+    df = cached_orders(key)
+    if df is not None:
+        return df
+
+    start = time.perf_counter()
+    # อ่านทุก sheet ที่มีข้อมูล Order (ไฟล์ที่มี sheet เดียวอ่านใน process นี้ตามเดิม)
+    df = sd_loader.read_workbooks([(sd_loader._file_name(uploaded_file), uploaded_file.getvalue())])[0]
+    put(key, df)
+    df = sd_store.put(key, df)
+    df.attrs['cache'] = {'hit': False, 'key': key, 'seconds': time.perf_counter() - start}
+    return df
+
+
+def load_many(uploaded_files, keys=None):
+    # หลายไฟล์ (เช่น 1 ไฟล์ต่อ 1 สาขา MFC) รวมเป็นชุดเดียว พร้อมคอลัมน์ Site จากชื่อไฟล์
+    # ไฟล์ที่เคยอ่านแล้วโหลดจาก cache ของไฟล์นั้น ที่เหลืออ่านพร้อมกันใน process pool (1 งานต่อ 1 sheet)
+    # keys: content_hash ของแต่ละไฟล์ ถ้าผู้เรียกคำนวณไว้แล้ว
+    start = time.perf_counter()
+    names = [sd_loader._file_name(f) for f in uploaded_files]
+    if keys is None:
+        keys = [content_hash(f.getvalue()) for f in uploaded_files]
+    sites = [sd_loader.site_name(name) for name in names]
+    joined = '|'.join(f"{site}:{key}" for site, key in zip(sites, keys))
+    key = f"v{CACHE_VERSION}-m-" + hashlib.blake2b(joined.encode('utf-8'), digest_size=20).hexdigest()
+    # ชุดที่รวมแล้วอยู่ในหน่วยความจำหรือบนดิสก์ ไม่ต้องอ่าน/รวมไฟล์ย่อยใหม่
+    df = cached_orders(key)
+    if df is not None:
+        df.attrs['cache']['seconds'] = time.perf_counter() - start
+        df.attrs['sites'] = {'files': len(names), 'sites': len(set(sites))}
+        return df
+    frames = [get(file_key) for file_key in keys]
+
+    missing = [i for i, df in enumerate(frames) if df is None]
+    parse_started = time.perf_counter()
+    parsed = sd_loader.read_workbooks([(names[i], uploaded_files[i].getvalue()) for i in missing]) if missing else []
+    parse_seconds = time.perf_counter() - parse_started
+    for i, df in zip(missing, parsed):
+        put(keys[i], df)
+        frames[i] = df
+
+    parts = [
+        df.assign(Site=pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8), categories=[site]))
+        for df, site in zip(frames, sites)
+    ]
+    df = sd_schema.concat_orders(parts)
+    df.attrs.clear()
+    # เก็บชุดที่รวมแล้วลงดิสก์ด้วย: ทุกชุดใน sd_store โหลดกลับจาก key ได้ (cached_orders) หลังถูกเอาออกจากหน่วยความจำ
+    put(key, df)
+    df = sd_store.put(key, df)
+    if parsed:
+        df.attrs['parse'] = {
+            'engine': '/'.join(sorted({p.attrs['parse']['engine'] for p in parsed})),
+            'seconds': parse_seconds,
+            'rows': sum(len(p) for p in parsed),
+            'files': len(parsed),
+            'workers': min(sd_loader.LOAD_WORKERS, sum(p.attrs['parse'].get('sheets', 1) for p in parsed)),
+        }
+    df.attrs['cache'] = {'hit': not parsed, 'key': key, 'seconds': time.perf_counter() - start}
+    df.attrs['sites'] = {'files': len(names), 'sites': len(set(sites))}
+    return df
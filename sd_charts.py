@@ -0,0 +1,215 @@
+# --- import plotly ตอนสร้างกราฟครั้งแรก (ไม่ใช่ตอน import โมดูล) เพื่อให้ server เริ่มทำงานและแสดงหน้าแรกได้เร็ว ---
+
+# --- ฟังก์ชันสร้างกราฟ (รับข้อมูลที่ aggregate แล้ว ไม่แตะข้อมูลรายแถว) ---
+
+
+# กราฟ Total Order by Payment (sd_dashboard.py)
+def build_payment_pie(payment_counts):
+    import plotly.express as px
+
+    fig_payment = px.pie(payment_counts, names='Payment Code', values='Count', hole=0.3)
+    fig_payment.update_traces(textposition='inside', textinfo='percent+label')
+    return fig_payment
+
+
+# กราฟ Total Order by Rider (Top 20) ใช้ทั้งสอง Dashboard
+def build_rider_bar(rider_order_counts):
+    import plotly.express as px
+
+    top_riders = rider_order_counts.head(20)
+
+    fig_rider_bar = px.bar(
+        top_riders,
+        x='Total Orders',
+        y='Rider Name',
+        orientation='h',
+        text='Total Orders',
+        labels={'Total Orders': 'Number of Orders', 'Rider Name': 'Rider Name'},
+        color='Total Orders',
+        color_continuous_scale=px.colors.sequential.Teal
+    )
+
+    fig_rider_bar.update_layout(yaxis={'categoryorder':'total ascending'})
+
+    fig_rider_bar.update_traces(
+        textposition='inside',
+        textangle=0,
+        insidetextanchor='start',
+        insidetextfont=dict(color='#FF9933')
+    )
+    return fig_rider_bar
+
+
+# กราฟโดนัท DOT vs Over SLA (sd_dashboard_pic_robot.py)
+def build_sla_donut(sla_counts):
+    import plotly.express as px
+
+    # --- 4. สร้าง Pie chart (จากข้อมูลที่ Map แล้ว) ---
+    fig_sla_pie = px.pie(
+        sla_counts,
+        names='SLA STS',    # ตอนนี้จะมีแค่ '% DOT' และ 'Over SLA'
+        values='Count',
+        hole=0.4, # กราฟโดนัท
+        color='SLA STS',
+        color_discrete_map={ # อัปเดตสีให้ตรงกับกลุ่มใหม่
+            'DOT': '#0099FF',      # สีเขียว
+            'Over SLA': '#d62728'   # สีแดง
+        }
+    )
+
+    # --- 5. ปรับแต่งการแสดงผล ---
+    fig_sla_pie.update_traces(
+        textposition='inside',
+        textinfo='percent+label',
+        rotation=270,
+        insidetextorientation='horizontal',
+        pull=[0.05 if s == 'Over SLA' else 0 for s in sla_counts['SLA STS']],
+        textfont=dict(size=40),
+        marker=dict(
+            line=dict(color='#000000', width=1)
+        )
+    )
+    fig_sla_pie.update_layout(
+        legend_title_text='สถานะ',
+        margin=dict(t=0, b=0, l=0, r=0)
+    )
+    return fig_sla_pie
+
+
+# --- สีของแต่ละ SLA STS ในกราฟรายชั่วโมง (sd_dashboard.py / sd_dashboard_pic_robot.py ใช้โทนต่างกันเล็กน้อย) ---
+HOURLY_BAR_COLORS = {
+    'Within SLA': '#0066FF',
+    'Over SLA': '#FF3300',
+    'Dispatched': '#CC66FF',
+    'Pending': '#00FF00',
+    'Cancel': '#B2B2B2'
+}
+HOURLY_COMBO_COLORS = {
+    'Within SLA': '#0099FF',
+    'Over SLA': '#FF3300',
+    'Dispatched': '#CC00FF',
+    'Pending': '#8ED973',
+    'Cancel': '#B2B2B2'
+}
+
+
+def hourly_matrix(df_hourly):
+    # pivot (Hours, SLA STS, Count) เป็นตาราง ชั่วโมง x SLA STS ครั้งเดียว
+    # ลำดับแถว/คอลัมน์มาจากลำดับ category ที่เรียงไว้ตอนโหลด (ไม่ต้อง sort หรือแปลง int(h) ซ้ำ)
+    matrix = df_hourly.groupby(['Hours', 'SLA STS'], observed=True)['Count'].sum().unstack('SLA STS', fill_value=0)
+    matrix = matrix[matrix.sum(axis=1) > 0]
+    matrix.index = matrix.index.astype(str)
+    matrix.columns = matrix.columns.astype(str)
+    return matrix
+
+
+# กราฟแท่งรายชั่วโมง Stacked ตาม SLA + ยอดรวมต่อชั่วโมง ใช้ทั้งสอง Dashboard
+# combo=False: แบบ sd_dashboard.py (ตัวเลขยอดรวมเหนือแท่ง)
+# combo=True: แบบ sd_dashboard_pic_robot.py (เส้น Total บนแกน Y รอง)
+def build_hourly_chart(matrix, combo=False):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    hours = list(matrix.index)
+    totals = matrix.sum(axis=1)
+    color_map = HOURLY_COMBO_COLORS if combo else HOURLY_BAR_COLORS
+
+    # 1. สร้าง Figure (แบบ combo ใช้ Subplots เพื่อรองรับ Secondary Y-Axis)
+    fig_hourly = make_subplots(specs=[[{"secondary_y": True}]]) if combo else go.Figure()
+
+    # 2. เพิ่ม Bar Traces (Stacked Column) 1 trace ต่อ 1 คอลัมน์ของ matrix
+    for status in matrix.columns:
+        # ชั่วโมงที่ไม่มีสถานะนี้ไม่ต้องวาดแท่ง/ตัวเลข 0
+        counts = matrix[status].where(matrix[status] > 0)
+        fig_hourly.add_trace(go.Bar(
+            x=hours,
+            y=counts,
+            name=status,
+            marker_color=color_map.get(status, '#B2B2B2'),
+            text=counts,
+            textposition='inside',
+            textangle=0
+        ))
+
+    # 3. ยอดรวมต่อชั่วโมง
+    if combo:
+        fig_hourly.add_trace(
+            go.Scatter(
+                x=hours,
+                y=totals,
+                name='Total',
+                mode='lines+markers+text',
+                line=dict(color='#FFCC66', width=4, shape='spline'),
+                marker=dict(size=10, color='white', line=dict(width=2, color='#00CCCC')),
+                text=totals,
+                textposition='top center',
+                textfont=dict(color='black', size=16), # 💥 แก้ไข: เพิ่มขนาดตัวอักษร Total
+            ),
+            secondary_y=True, # 💥 ใช้แกน Y รอง (ขวา)
+        )
+    else:
+        fig_hourly.add_trace(go.Scatter(
+            x=hours,
+            y=totals,
+            text=totals,
+            mode='text',
+            textposition='top center',
+            textfont=dict(color='black', size=14),
+            showlegend=False
+        ))
+
+    # 4. ปรับแต่ง Layout และ Axes (แกน X เป็น category ตามลำดับแถวของ matrix)
+    fig_hourly.update_xaxes(
+        type='category',
+        categoryorder='array',
+        categoryarray=hours,
+        title_text='Hour of Day'
+    )
+    max_total = totals.max() if len(totals) else 0
+
+    if not combo:
+        fig_hourly.update_layout(
+            barmode='relative',
+            legend_title_text='SLA STS',
+            yaxis_title_text='Number of Orders',
+            yaxis_range=[0, max_total * 1.15]
+        )
+        return fig_hourly
+
+    # 💥 กำหนดขนาดตัวอักษรเฉพาะ 'Within SLA'
+    fig_hourly.update_traces(
+        selector=dict(name='Within SLA', type='bar'),
+        textposition='inside',
+        textfont=dict(size=20) # 💥 เพิ่มขนาดตัวอักษร Within SLA
+    )
+
+    # 💥 กำหนดแกน Y หลัก (ซ้าย) ให้ Total Order อยู่ด้านบน
+    fig_hourly.update_yaxes(
+        title_text="Number of Orders (SLA Status)",
+        secondary_y=False,
+        range=[0, max_total * 1.5]
+    )
+
+    # 💥 กำหนดแกน Y รอง (ขวา)
+    fig_hourly.update_yaxes(
+        title_text="Total Order",
+        secondary_y=True,
+        showgrid=False, # ซ่อน Grid line ของแกนรอง
+        title_standoff=10,
+        showticklabels=False, # 👈 ซ่อนตัวเลขกำกับแกน Y รอง
+        range=[0, max_total * 1.15]
+    )
+
+    # 💥 ปรับ Layout โดยรวม (Stacked Bar + Legend ด้านบนขวา)
+    fig_hourly.update_layout(
+        barmode='stack',
+        margin=dict(t=50, r=120),
+        legend=dict(
+            orientation="v",
+            yanchor="top",
+            y=1, # ตำแหน่งบนสุด
+            xanchor="right",
+            x=1.1 # ตำแหน่งขวาสุด (นอกกราฟเล็กน้อย)
+        )
+    )
+    return fig_hourly
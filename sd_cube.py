@@ -0,0 +1,190 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+import sd_kpi
+
+# --- มิติของ cube (ทุกกราฟ/KPI เป็นการรวมตามบางมิติเหล่านี้) Site มีเฉพาะตอนรวมหลายไฟล์ ---
+DIMENSIONS = ['Status', 'SLA STS', 'Payment Code', 'Rider Name', 'Hours', 'Site']
+# --- ค่าที่เก็บต่อ 1 ช่อง: จำนวนแถว, ผลรวม Net Order Value, จำนวน Order ID ที่ไม่ซ้ำ ---
+MEASURES = ['rows', 'value', 'orders']
+
+
+def _as_list(values):
+    return list(values) if isinstance(values, (list, tuple, set, frozenset)) else [values]
+
+
+def _freeze(conditions):
+    return tuple(sorted((dim, tuple(_as_list(values))) for dim, values in (conditions or {}).items()))
+
+
+class OrderCube:
+    # cube ที่รวมข้อมูลรายแถวไว้ครั้งเดียวตอนโหลด: 1 แถวของ cells = 1 ชุดค่ามิติที่พบในข้อมูล
+    # KPI/กราฟ/การ slice ใหม่ ๆ คำนวณจาก cells ทั้งหมด ไม่กลับไปอ่านข้อมูลรายแถวอีก
+    #
+    # จำนวน Order ไม่ซ้ำ (orders) บวกกันข้ามช่องได้ก็ต่อเมื่อ 1 Order อยู่ช่องเดียว
+    # Order ที่มีหลายแถวต่างช่องกัน (ปกติมีน้อยมาก) เก็บคู่ (Order, ช่อง) ไว้แยก เพื่อหักส่วนที่นับซ้ำตอน rollup
+
+    def __init__(self, cells, multi_orders, multi_cells):
+        self.cells = cells
+        self.dimensions = [dim for dim in DIMENSIONS if dim in cells.columns]
+        self._multi_orders = multi_orders
+        self._multi_cells = multi_cells
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df):
+        dims = [dim for dim in DIMENSIONS if dim in df.columns]
+        n = len(df)
+
+        # รวมรหัสของทุกมิติเป็นรหัสช่องเดียว (ค่าว่าง = รหัส 0 ของมิตินั้น)
+        dim_codes = []
+        key = np.zeros(n, dtype=np.int64)
+        for dim in dims:
+            codes, uniques = sd_kpi._codes(df[dim])
+            codes = codes.astype(np.int64) + 1
+            dim_codes.append((dim, codes, uniques, df[dim].dtype))
+            key = pd.factorize(key * (len(uniques) + 1) + codes)[0].astype(np.int64)
+        cell_ids, cell_keys = pd.factorize(key)
+        n_cells = len(cell_keys)
+
+        # แถวแรกของแต่ละช่อง ใช้ดึงค่ามิติของช่องนั้น
+        first = np.empty(n_cells, dtype=np.int64)
+        first[cell_ids[::-1]] = np.arange(n)[::-1]
+
+        columns = {}
+        for dim, codes, uniques, dtype in dim_codes:
+            cell_codes = codes[first] - 1
+            if isinstance(dtype, pd.CategoricalDtype):
+                columns[dim] = pd.Categorical.from_codes(cell_codes, dtype=dtype)
+            else:
+                columns[dim] = pd.Categorical.from_codes(cell_codes, categories=pd.Index(uniques))
+        columns['rows'] = np.bincount(cell_ids, minlength=n_cells)
+        columns['value'] = np.bincount(
+            cell_ids, weights=np.nan_to_num(df['Net Order Value'].to_numpy(dtype=np.float64, na_value=np.nan)), minlength=n_cells
+        )
+
+        # Order ID ไม่ซ้ำต่อช่อง จากคู่ (ช่อง, Order) ที่ไม่ซ้ำ
+        order_codes, order_uniques = sd_kpi._codes(df['Order ID'])
+        n_orders = max(len(order_uniques), 1)
+        valid = order_codes >= 0
+        pairs = np.unique(cell_ids[valid].astype(np.int64) * n_orders + order_codes[valid])
+        pair_cells, pair_orders = pairs // n_orders, pairs % n_orders
+        columns['orders'] = np.bincount(pair_cells, minlength=n_cells)
+
+        # Order ที่อยู่มากกว่า 1 ช่อง
+        cells_per_order = np.bincount(pair_orders, minlength=n_orders)
+        in_many = cells_per_order[pair_orders] > 1
+
+        cells = pd.DataFrame(columns)
+        return cls(cells, pair_orders[in_many], pair_cells[in_many])
+
+    def subset(self, mask):
+        # cube ใหม่ที่มีเฉพาะช่องที่ mask เป็น True (ใช้กับผลของตัวกรอง)
+        renumber = np.cumsum(mask) - 1
+        keep = mask[self._multi_cells]
+        cells = self.cells[mask].reset_index(drop=True)
+        return OrderCube(cells, self._multi_orders[keep], renumber[self._multi_cells[keep]])
+
+    def _mask(self, where=None, exclude=None):
+        # where/exclude: {มิติ: ค่า หรือ list ของค่า} (exclude ไม่ตัดช่องที่ค่าว่าง เหมือน != ใน pandas)
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dim, values in (where or {}).items():
+            mask &= self.cells[dim].isin(_as_list(values)).to_numpy()
+        for dim, values in (exclude or {}).items():
+            mask &= ~self.cells[dim].isin(_as_list(values)).to_numpy()
+        return mask
+
+    def _overcount(self, mask, groups, n_groups):
+        # จำนวน Order ที่ถูกนับซ้ำในแต่ละกลุ่ม (Order เดียวกันอยู่หลายช่องในกลุ่มเดียวกัน)
+        if self._multi_orders.size == 0:
+            return np.zeros(n_groups, dtype=np.int64)
+        selected = mask[self._multi_cells]
+        pair_groups = groups[self._multi_cells[selected]]
+        pair_orders = self._multi_orders[selected]
+        keep = pair_groups >= 0
+        pair_groups, pair_orders = pair_groups[keep], pair_orders[keep]
+        n_orders = int(pair_orders.max()) + 1 if pair_orders.size else 1
+        distinct = np.unique(pair_groups * n_orders + pair_orders) // n_orders
+        return np.bincount(pair_groups, minlength=n_groups) - np.bincount(distinct, minlength=n_groups)
+
+    def rollup(self, by=(), where=None, exclude=None):
+        # รวม cube ตามมิติใน by (ไม่ใส่ = รวมทั้งหมดเป็นแถวเดียว) คืนค่า DataFrame: มิติใน by + rows, value, orders
+        # ผลลัพธ์ถูกเก็บไว้ เรียกซ้ำด้วยเงื่อนไขเดิมจะได้ DataFrame เดิม (ห้ามแก้ไข)
+        by = list(by)
+        memo_key = (tuple(by), _freeze(where), _freeze(exclude))
+        with self._lock:
+            cached = self._memo.get(memo_key)
+        if cached is not None:
+            return cached
+
+        mask = self._mask(where, exclude)
+        selected = self.cells[mask]
+        if by:
+            grouper = selected.groupby(by, observed=True, sort=True)
+            result = grouper[MEASURES].sum().reset_index()
+            group_of_selected = grouper.ngroup().to_numpy()
+        else:
+            result = pd.DataFrame({measure: [selected[measure].sum()] for measure in MEASURES})
+            group_of_selected = np.zeros(len(selected), dtype=np.int64)
+
+        groups = np.full(len(self.cells), -1, dtype=np.int64)
+        groups[np.flatnonzero(mask)] = np.nan_to_num(group_of_selected, nan=-1).astype(np.int64)
+        result['orders'] = result['orders'] - self._overcount(mask, groups, len(result))
+
+        with self._lock:
+            self._memo[memo_key] = result
+        return result
+
+    def total(self, measure, where=None, exclude=None):
+        return self.rollup((), where, exclude)[measure].iloc[0].item()
+
+    def distinct(self, dim, where=None, exclude=None):
+        # จำนวนค่าไม่ซ้ำ (ไม่นับค่าว่าง) ของมิติหนึ่ง เช่น จำนวน Rider
+        return len(self.rollup([dim], where, exclude))
+
+    # --- KPI และข้อมูลกราฟ (รูปแบบเดียวกับที่ Dashboard ใช้) ---
+
+    def kpis(self):
+        total_orders = self.total('orders')
+        total_complete = self.total('rows', where={'Status': sd_kpi.STATUS_COMPLETE})
+        non_cancel = {'Status': sd_kpi.STATUS_CANCEL}
+        non_cancel_orders = self.total('orders', exclude=non_cancel)
+        if 'SLA STS' in self.dimensions:
+            over_sla_orders = self.total('orders', where={'SLA STS': sd_kpi.SLA_OVER}, exclude=non_cancel)
+        else:
+            over_sla_orders = 0
+        return sd_kpi.KPIResult(
+            total_orders=total_orders,
+            total_value=float(self.total('value')),
+            total_complete=total_complete,
+            total_on_process=total_orders - total_complete,
+            total_unsuccessful=self.total('rows', where={'Status': sd_kpi.STATUS_UNSUCCESSFUL}),
+            total_riders=self.distinct('Rider Name'),
+            non_cancel_orders=non_cancel_orders,
+            over_sla_orders=over_sla_orders,
+            over_sla_rate=(over_sla_orders / non_cancel_orders) * 100 if non_cancel_orders > 0 else 0.0,
+        )
+
+    def payment_counts(self):
+        counts = self.rollup(['Payment Code'])[['Payment Code', 'rows']]
+        counts = counts.rename(columns={'rows': 'Count'}).astype({'Payment Code': object})
+        return counts.sort_values(by=['Count', 'Payment Code'], ascending=[False, True]).reset_index(drop=True)
+
+    def rider_order_counts(self):
+        # 💡 ไม่นับ Order ที่สถานะ 'CANCEL'
+        counts = self.rollup(['Rider Name'], exclude={'Status': sd_kpi.STATUS_CANCEL})[['Rider Name', 'orders']]
+        counts = counts.rename(columns={'orders': 'Total Orders'}).astype({'Rider Name': object})
+        return counts.sort_values(by=['Total Orders', 'Rider Name'], ascending=[False, True]).reset_index(drop=True)
+
+    def sla_totals(self):
+        # จำนวนแถวต่อ SLA STS (เหมือน value_counts) เรียงตามลำดับ category
+        counts = self.rollup(['SLA STS'])
+        return pd.Series(counts['rows'].to_numpy(), index=counts['SLA STS'].astype(object), name='count')
+
+    def hourly(self):
+        # รูปแบบเดียวกับ df_hourly (Hours, SLA STS, Count) เรียงตามชั่วโมงและ SLA
+        counts = self.rollup(['Hours', 'SLA STS'])[['Hours', 'SLA STS', 'rows']]
+        return counts.rename(columns={'rows': 'Count'})
@@ -1,8 +1,19 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import io
+import sd_background
+import sd_snapshot
+import sd_incremental
+import sd_table
+import sd_profile
+import sd_history
+import sd_filters
+import sd_stream
+import sd_sketch
+import sd_store
+import sd_warm
+import datetime
+
+# --- จับเวลาแต่ละขั้นของ rerun นี้ (เขียน log JSONL และแสดงใน Sidebar เมื่อเปิด Debug) ---
+sd_profile.start('sd_dashboard')
 
 # --- ตั้งค่าหน้าเว็บ (Page Config) ---
 st.set_page_config(
@@ -11,116 +22,226 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- ฟังก์ชันสำหรับโหลดข้อมูลจากไฟล์ที่อัปโหลด ---
-@st.cache_data
-def load_data(uploaded_file):
-    try:
-        # อ่านไฟล์ Excel โดยตรง
-        df = pd.read_excel(uploaded_file, engine='openpyxl')
-        return df
-    except Exception as e:
-        st.error(f"เกิดข้อผิดพลาดในการอ่านไฟล์ Excel: {e}")
-        st.error("กรุณาตรวจสอบว่าไฟล์เป็น .xlsx หรือ .xls ที่ถูกต้อง")
-        return None
+# --- กราฟที่หน้านี้ใช้ (สร้างไว้ล่วงหน้าตอน pre-warm/โหลดเบื้องหลัง) ---
+PAGE_FIGURES = ('payment_pie', 'rider_bar', 'hourly_bar')
+
+# --- pre-warm เบื้องหลังครั้งเดียวต่อ process: ชุดข้อมูลล่าสุด + กราฟที่หน้านี้ใช้ (หน้าจอแรกไม่ต้องรอ) ---
+sd_warm.start(figures=PAGE_FIGURES)
+
+# --- อ่านไฟล์ที่อัปโหลด (ไฟล์เดียว/หลายไฟล์/streaming) + สร้าง snapshot ใน thread เบื้องหลัง (sd_background) ---
+# ระหว่างอ่านไฟล์ใหม่ หน้าจอยังแสดงชุดข้อมูลล่าสุดของ session นี้ แล้วสลับเป็นชุดใหม่ทั้งก้อนเมื่ออ่านเสร็จ
+# อ่านไม่สำเร็จก็ยังแสดงชุดเดิมไว้ (แจ้งเตือนใน Sidebar) แทนการล้างหน้าจอ
+def load_uploads(uploaded_files):
+    key = sd_background.upload_key(uploaded_files)
+    job = sd_background.submit(key, lambda progress: sd_background.load_uploads(key, uploaded_files, PAGE_FIGURES, progress))
+    shown = st.session_state.get('loaded_upload')
+    if job.result is not None:
+        if shown is not job.result:
+            sd_profile.note(load_data='stream' if job.result.stream is not None else 'disk' if job.result.attrs['cache']['hit'] else 'parse')
+            st.session_state['loaded_upload'] = job.result
+        return job.result
+    if job.error is not None:
+        if shown is None:
+            st.error(f"เกิดข้อผิดพลาดในการอ่านไฟล์ Excel: {job.error}")
+            st.error("กรุณาตรวจสอบว่าไฟล์เป็น .xlsx, .xls หรือ .xlsb ที่ถูกต้อง")
+        else:
+            st.sidebar.warning(f"อ่านไฟล์ใหม่ไม่สำเร็จ ยังแสดงข้อมูลชุดเดิม ({shown.name}): {job.error}")
+        # แจ้งแล้วเอางานออก rerun ถัดไปลองอ่านใหม่ (error ชั่วคราว เช่น ไฟล์ยังอัปโหลดไม่ครบ ไม่ค้างไว้ตลอด)
+        sd_background.discard(job)
+        return shown
+    sd_profile.note(load_data='background')
+    wait_for_load(job)
+    return shown
+
+# --- แถบความคืบหน้าของงานโหลดเบื้องหลัง เช็คทุก POLL_SECONDS เสร็จแล้ว rerun ทั้งหน้าเพื่อสลับเป็นชุดใหม่ ---
+@st.fragment(run_every=sd_background.POLL_SECONDS)
+def wait_for_load(job):
+    if not job.running:
+        st.rerun()
+    fraction = job.fraction
+    st.progress(fraction if fraction is not None else 0.0, text=job.describe())
+
+# --- จำนวน Order/Rider ไม่ซ้ำของช่วงวันที่จาก sketch รายวัน (รวม sketch ไม่อ่านข้อมูลรายแถว) ใช้เทียบกับ KPI ที่นับจริง ---
+@st.cache_data(max_entries=16)
+def history_distinct(start, end, range_key):
+    return sd_history.distinct_counts(start, end)
 
 # --- Sidebar สำหรับอัปโหลดไฟล์ ---
 st.sidebar.header("Upload File")
-uploaded_file = st.sidebar.file_uploader(
-    "กรุณาเลือกไฟล์ Excel (.xlsx, .xls)", 
-    type=["xlsx", "xls"]
+uploaded_files = st.sidebar.file_uploader(
+    "กรุณาเลือกไฟล์ Excel (.xlsx, .xls, .xlsb) เลือกได้หลายไฟล์ (1 ไฟล์ต่อ 1 สาขา)", 
+    type=["xlsx", "xls", "xlsb"],
+    accept_multiple_files=True
 )
+uploaded_file = uploaded_files[0] if uploaded_files else None
+
+# --- ดูข้อมูลย้อนหลัง: เลือกช่วงวันที่ แทนการเปิดไฟล์ Excel ทีละวัน ---
+history_days = sd_history.available_days()
+history_mode = False
+if history_days:
+    history_mode = st.sidebar.toggle("ดูข้อมูลย้อนหลัง (History)", help=f"มีข้อมูล {len(history_days)} วัน ({history_days[0]} ถึง {history_days[-1]})")
+if history_mode:
+    date_range = st.sidebar.date_input(
+        "ช่วงวันที่",
+        value=(max(history_days[0], history_days[-1] - datetime.timedelta(days=6)), history_days[-1]),
+        min_value=history_days[0],
+        max_value=history_days[-1]
+    )
+    # ระหว่างเลือกช่วง date_input จะคืนค่าวันเดียว
+    history_start, history_end = (date_range[0], date_range[-1]) if date_range else (history_days[-1], history_days[-1])
 
 # --- ตรวจสอบว่ามีการอัปโหลดไฟล์หรือไม่ ---
-if uploaded_file is not None:
+if uploaded_file is not None or history_mode:
     
-    df = load_data(uploaded_file)
+    sd_profile.note(load_data='memory')
+    df = stream = loaded = None
+    with sd_profile.stage('load_data'):
+        if history_mode:
+            # ข้อมูลย้อนหลังหลายวันจากที่เก็บประวัติ ใช้ร่วมกันทุก session ผ่าน sd_store
+            df = sd_history.cached_query(history_start, history_end)
+            if df is None:
+                st.info("ไม่มีข้อมูลในช่วงวันที่ที่เลือก")
+        else:
+            loaded = load_uploads(uploaded_files)
+            if loaded is not None:
+                df, stream = loaded.df, loaded.stream
+
+    if df is not None or stream is not None:
+        attrs = df.attrs if df is not None else stream.attrs
+
+        # --- แสดงเวลาที่ใช้อ่านไฟล์ (engine ที่ใช้ + วินาที) ---
+        parse_info = attrs.get('parse')
+        if parse_info:
+            st.sidebar.caption(
+                f"อ่านไฟล์ด้วย {parse_info['engine']}: {parse_info['rows']:,} แถว ใน {parse_info['seconds']:.2f} วินาที"
+            )
+        sites_info = attrs.get('sites')
+        if sites_info:
+            st.sidebar.caption(f"รวม {sites_info['files']} ไฟล์ ({sites_info['sites']} สาขา)")
+        cache_info = attrs.get('cache')
+        history_info = attrs.get('history')
+        if history_info:
+            st.sidebar.caption(
+                f"ประวัติ {history_info['days']} วัน ({history_info['start']} ถึง {history_info['end']}): {history_info['rows']:,} แถว ใน {cache_info['seconds']:.2f} วินาที"
+            )
+            distinct = history_distinct(history_start, history_end, cache_info['key'])
+            st.sidebar.caption(
+                f"Sketch (±{sd_sketch.relative_error():.1%}): Order ~{distinct['Order ID']:,} / Rider ~{distinct['Rider Name']:,}"
+            )
+        elif cache_info and cache_info['hit']:
+            st.sidebar.caption(f"โหลดจาก cache ใน {cache_info['seconds']:.3f} วินาที")
+        # --- ชุดข้อมูลที่เก็บในหน่วยความจำของ server (ใช้ร่วมกันทุก session) เทียบกับงบ SD_STORE_MAX_MB ---
+        store_usage = sd_store.usage()
+        if store_usage['datasets']:
+            st.sidebar.caption(
+                f"ชุดข้อมูลในหน่วยความจำ {store_usage['datasets']} ชุด: {store_usage['bytes'] / 2**20:,.1f} / {store_usage['max_bytes'] / 2**20:,.0f} MB"
+            )
+
+        # --- บันทึกไฟล์ที่อัปโหลดเข้าที่เก็บประวัติ (วันละ 1 ไฟล์ ไฟล์ใหม่ของวันเดียวกันจะแทนที่ไฟล์เดิม) ---
+        if not history_info and df is not None:
+            with st.sidebar.expander("บันทึกเข้าประวัติ (History)"):
+                history_day = st.date_input(
+                    "วันที่ของไฟล์นี้",
+                    value=sd_history.export_date(loaded.name, datetime.date.today())
+                )
+                if st.button("บันทึก"):
+                    try:
+                        saved = sd_history.ingest(df, history_day)
+                    except Exception as e:
+                        # บันทึกไม่สำเร็จแสดงใน sidebar ไม่ให้ทั้งหน้าล้ม (เหมือน Live mode)
+                        st.error(f"บันทึกเข้าประวัติไม่สำเร็จ: {e}")
+                    else:
+                        if saved:
+                            st.success(f"บันทึกข้อมูลวันที่ {history_day} แล้ว")
+                        else:
+                            st.info(f"ไฟล์นี้บันทึกเป็นข้อมูลวันที่ {history_day} ไว้แล้ว")
 
-    if df is not None:
+        # --- โหมดต่อข้อมูลระหว่างวัน (Append): ไฟล์ที่อัปโหลดซ้ำ/ไฟล์ delta อัปเดตเฉพาะ Order ที่เปลี่ยน ---
+        intraday = None
+        sd_profile.note(rows=len(df) if df is not None else stream.rows, dataset=attrs.get('cache', {}).get('key'))
+        if not history_info and df is not None and st.sidebar.checkbox("โหมดต่อข้อมูลระหว่างวัน (Append)", help="รวมไฟล์ที่อัปโหลดหลายครั้งในวันเดียวกัน โดยนับ Order ID ละ 1 แถว (แถวล่าสุด)"):
+            intraday = st.session_state.setdefault('intraday_state', sd_incremental.IntradayState())
+            data_key = df.attrs.get('cache', {}).get('key')
+            if st.session_state.get('intraday_last_key') != data_key:
+                with sd_profile.stage('intraday_apply'):
+                    st.session_state['intraday_last_updated'] = intraday.apply(df)
+                st.session_state['intraday_last_key'] = data_key
+            st.sidebar.caption(
+                f"อัปโหลด {intraday.uploads} ครั้ง / รอบล่าสุดอัปเดต {st.session_state['intraday_last_updated']:,} Order"
+            )
+            if st.sidebar.button("ตรวจสอบ (คำนวณใหม่ทั้งหมด)"):
+                mismatches = intraday.verify()
+                if mismatches:
+                    st.sidebar.error(f"ตัวนับสะสมไม่ตรงกับการคำนวณใหม่: {', '.join(mismatches)}")
+                else:
+                    st.sidebar.success("ตัวนับสะสมตรงกับการคำนวณใหม่ทั้งหมด")
+            if st.sidebar.button("ล้างข้อมูลสะสม"):
+                st.session_state.pop('intraday_state', None)
+                st.session_state.pop('intraday_last_key', None)
+                st.rerun()
         
         # --- ส่วนหัวของ Dashboard ---
         st.title("📊 SD Monitoring Dashboard")
 
-        # --- คำนวณ KPIs ---
-        total_orders = df['Order ID'].nunique()
-        total_value = df['Net Order Value'].sum()
-        total_complete = df[df['Status'] == 'COMPLETE'].shape[0]
-        total_unsuccessful = df[df['Status'] == 'UNSUCCESSFUL ON DEMAND DELIVERY'].shape[0]
-        
-        total_riders = df['Rider Name'].nunique()
+        # --- KPI/ข้อมูลกราฟ/กราฟ คำนวณครั้งเดียวต่อชุดข้อมูล และใช้ร่วมกันทุก session (sd_snapshot) ---
+        with sd_profile.stage('snapshot'):
+            if intraday:
+                snap = sd_snapshot.Snapshot.from_intraday(intraday)
+            elif loaded is not None:
+                snap = loaded.snap
+            else:
+                snap = sd_snapshot.get_snapshot(df)
+
+        # --- ตัวกรอง ชั่วโมง/Payment/SLA/Rider (ตอบจาก bitmap index ของชุดข้อมูล ไม่ต้องกรองข้อมูลรายแถวใหม่) ---
+        filter_index = snap.filter_index()
+        if filter_index is not None:
+            filters = sd_filters.render_filter_sidebar(filter_index)
+            with sd_profile.stage('filter'):
+                snap = snap.filtered(filters)
+
+        kpis = snap.kpis
 
         # --- แสดงผล KPIs (แถวบนสุด) - แก้ไขเป็น 5 คอลัมน์ ---
         kpi_col1, kpi_col2, kpi_col3, kpi_col4, kpi_col5 = st.columns(5)
 
         with kpi_col1:
-            st.metric(label="Total Order", value=f"{total_orders:,}")
+            st.metric(label="Total Order", value=f"{kpis.total_orders:,}")
         
         with kpi_col2:
-            st.metric(label="Total Value", value=f"{total_value:,.2f}")
+            st.metric(label="Total Value", value=f"{kpis.total_value:,.2f}")
         
         with kpi_col3:
-            st.metric(label="Total Complete", value=f"{total_complete:,}")
+            st.metric(label="Total Complete", value=f"{kpis.total_complete:,}")
         
         with kpi_col4:
-            st.metric(label="Total Cancel", value=f"{total_unsuccessful:,}")
+            st.metric(label="Total Cancel", value=f"{kpis.total_unsuccessful:,}")
         
         # --- (ส่วนที่เพิ่มใหม่) แสดงผล Total Rider ---
         with kpi_col5:
-            st.metric(label="Total Rider", value=f"{total_riders:,}")
+            st.metric(label="Total Rider", value=f"{kpis.total_riders:,}")
 
 
         # --- สร้าง Divider ---
         st.markdown("---")
 
-        # --- เตรียมข้อมูลสำหรับกราฟ ---
-        payment_counts = df['Payment Code'].value_counts().reset_index()
-        payment_counts.columns = ['Payment Code', 'Count']
-
-        # 💡 ส่วนที่แก้ไข: กรอง Order ที่สถานะไม่ใช่ 'CANCEL' ก่อนนับรวม
-        df_non_cancel = df[df['Status'] != 'CANCEL']
-        
-        rider_order_counts = df_non_cancel.groupby('Rider Name')['Order ID'].nunique().reset_index()
-        rider_order_counts.columns = ['Rider Name', 'Total Orders']
-        rider_order_counts = rider_order_counts.sort_values(by='Total Orders', ascending=False)
-        rider_order_counts = rider_order_counts.dropna(subset=['Rider Name'])
-        # ---------------------------
-
         # --- แสดงผลกราฟ (แถวกลาง) - ปรับอัตราส่วนคอลัมน์เป็น (1, 2) ---
         chart_col1, chart_col2 = st.columns((1, 2)) 
         
         # กราฟที่ 1: Total Order by Payment (จะเล็กลง)
         with chart_col1:
             st.subheader("Total Order by Payment")
-            fig_payment = px.pie(payment_counts, names='Payment Code', values='Count', hole=0.3)
-            fig_payment.update_traces(textposition='inside', textinfo='percent+label')
-            st.plotly_chart(fig_payment, use_container_width=True)
+            with sd_profile.stage('figure:payment_pie'):
+                fig_payment = snap.figure('payment_pie')
+            with sd_profile.stage('plotly_chart:payment_pie'):
+                st.plotly_chart(fig_payment, use_container_width=True)
 
         # กราฟที่ 2: Total Order by Rider (จะกว้างขึ้น)
         with chart_col2:
             st.subheader("Total Order by Rider (Top 20)")
-            
-            top_riders = rider_order_counts.head(20)
-            
-            fig_rider_bar = px.bar(
-                top_riders,
-                x='Total Orders',  
-                y='Rider Name',    
-                orientation='h',   
-                text='Total Orders', 
-                labels={'Total Orders': 'Number of Orders', 'Rider Name': 'Rider Name'},
-                color='Total Orders', 
-                color_continuous_scale=px.colors.sequential.Teal
-            )
-            
-            fig_rider_bar.update_layout(yaxis={'categoryorder':'total ascending'})
-            
-            fig_rider_bar.update_traces(
-                textposition='inside',
-                textangle=0,
-                insidetextanchor='start', 
-                insidetextfont=dict(color='#FF9933')
-            )
-            
-            st.plotly_chart(fig_rider_bar, use_container_width=True)
+            with sd_profile.stage('figure:rider_bar'):
+                fig_rider_bar = snap.figure('rider_bar')
+            with sd_profile.stage('plotly_chart:rider_bar'):
+                st.plotly_chart(fig_rider_bar, use_container_width=True)
 
         # --- สร้าง Divider ---
         st.markdown("---")
@@ -128,71 +249,33 @@ if uploaded_file is not None:
         # --- กราฟแท่งรายชั่วโมง (Stacked by SLA Status) ---
         st.subheader("Total Order by Hour (Stacked by SLA Status)")
 
-        if 'Hours' in df.columns and 'SLA STS' in df.columns:
-            
-            # แปลงเป็น string เพื่อให้ Plotly มองเป็น category
-            df['Hours'] = df['Hours'].astype(str)
-            
-            df_hourly = df.groupby(['Hours', 'SLA STS']).size().reset_index(name='Count')
-            df_hourly_total = df_hourly.groupby('Hours')['Count'].sum().reset_index(name='TotalCount')
-
-            # --- ส่วนที่แก้ไข: การจัดเรียงเวลา ---
-            # 1. สร้างลิสต์ของชั่วโมงที่ต้องการเรียง (08, 09, 10, ... 18)
-            # เราจะค้นหาค่าที่ไม่ซ้ำกันในคอลัมน์ 'Hours', แปลงเป็น int, เรียง, แล้วแปลงกลับเป็น str
-            unique_hours = df['Hours'].unique()
-            sorted_hours = sorted([int(h) for h in unique_hours])
-            sorted_hours_str = [str(h) for h in sorted_hours]
-
-            # --- กำหนดแผนที่สีใหม่ ---
-            color_map = {
-                'Within SLA': '#0066FF',     
-                'Over SLA': '#FF3300',        
-                'Dispatched': '#CC66FF',   
-                'Pending': '#00FF00',        
-                'Cancel': '#B2B2B2'         
-            }
-
-            fig_hourly = px.bar(
-                df_hourly,
-                x='Hours',
-                y='Count',
-                color='SLA STS',
-                text='Count',
-                labels={'Hours': 'Hour of Day', 'Count': 'Number of Orders'},
-                color_discrete_map=color_map 
-            )
-            fig_hourly.update_traces(textposition='inside',textangle=0)
-
-            fig_hourly.add_trace(go.Scatter(
-                x=df_hourly_total['Hours'],
-                y=df_hourly_total['TotalCount'],
-                text=df_hourly_total['TotalCount'],
-                mode='text',
-                textposition='top center',
-                textfont=dict(color='black', size=14),
-                showlegend=False
-            ))
-            
-            max_y = df_hourly_total['TotalCount'].max() * 1.15
-            fig_hourly.update_layout(
-                yaxis_range=[0, max_y],
-                xaxis={
-                    'type': 'category',
-                    # 2. ใช้ sorted_hours_str เพื่อกำหนดลำดับหมวดหมู่
-                    'categoryorder': 'array',
-                    'categoryarray': sorted_hours_str 
-                }
-            )
-
-            st.plotly_chart(fig_hourly, use_container_width=True)
-
+        if snap.hourly is not None:
+            with sd_profile.stage('figure:hourly_bar'):
+                fig_hourly = snap.figure('hourly_bar')
+            with sd_profile.stage('plotly_chart:hourly_bar'):
+                st.plotly_chart(fig_hourly, use_container_width=True)
         else:
             st.warning("ไม่สามารถสร้างกราฟรายชั่วโมงได้ เนื่องจากไม่พบคอลัมน์ 'Hours' หรือ 'SLA STS'")
 
         # --- (ทางเลือก) แสดงตารางข้อมูลดิบ ---
+        # แบ่งหน้าที่ฝั่ง server ส่งไปที่ browser เฉพาะหน้าที่เปิดดู
         with st.expander("ดูข้อมูลดิบ (Raw Data)"):
-            st.dataframe(df)
+            with sd_profile.stage('raw_table'):
+                if df is not None:
+                    sd_table.render_raw_table(df)
+                else:
+                    # ไฟล์ที่อ่านแบบ streaming ไม่มีข้อมูลรายแถวในหน่วยความจำ แสดงเฉพาะแถวแรก ๆ จากไฟล์ spill
+                    preview = sd_stream.preview(stream.spill, sd_stream.PREVIEW_ROWS)
+                    if preview is None:
+                        st.info("ไฟล์นี้อ่านแบบ streaming และไม่ได้เก็บข้อมูลดิบไว้")
+                    else:
+                        st.caption(f"แสดง {len(preview):,} แถวแรกจากทั้งหมด {stream.rows:,} แถว")
+                        st.dataframe(preview, hide_index=True)
 
 else:
     # --- หน้าจอเริ่มต้น เมื่อยังไม่มีการอัปโหลดไฟล์ ---
     st.info("👋 กรุณาอัปโหลดไฟล์ Excel ของคุณที่ Sidebar ด้านซ้ายเพื่อเริ่มต้นใช้งาน")
+
+# --- (ทางเลือก) ตารางเวลาแต่ละขั้นของ rerun นี้ + หน่วยความจำ ---
+show_profile = st.sidebar.checkbox("แสดงเวลาแต่ละขั้น (Debug)")
+sd_profile.finish(st.sidebar if show_profile else None)
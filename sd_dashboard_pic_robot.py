@@ -1,24 +1,45 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import io
-import math
-import base64
-import requests 
-from plotly.subplots import make_subplots 
-from PIL import Image
-from io import BytesIO
+import os
+import sd_background
+import sd_snapshot
+import sd_incremental
+import sd_kpi
+import sd_table
+import sd_live
+import sd_assets
+import sd_profile
+import sd_history
+import sd_filters
+import sd_stream
+import sd_sketch
+import sd_store
+import sd_warm
+import datetime
 
 
 # --- ตั้งค่าหน้าเว็บ (Page Config) ---
 st.set_page_config(layout="wide")
 
+# --- จับเวลาแต่ละขั้นของ rerun นี้ (เขียน log JSONL และแสดงใน Sidebar เมื่อเปิด Debug) ---
+sd_profile.start('sd_dashboard_pic_robot')
+
+# --- กราฟที่หน้านี้ใช้ (สร้างไว้ล่วงหน้าตอน pre-warm/โหลดเบื้องหลัง) ---
+PAGE_FIGURES = ('sla_donut', 'rider_bar', 'hourly_combo')
+
+# --- pre-warm เบื้องหลังครั้งเดียวต่อ process: ชุดข้อมูลล่าสุด + กราฟ + รูปที่หน้านี้ใช้ (หน้าจอแรกไม่ต้องรอ) ---
+sd_warm.start(figures=PAGE_FIGURES, image_urls=(sd_assets.ROBOT_IMAGE_URL, sd_assets.RIDER_IMAGE_URL))
+
+RIDER_IMAGE_URL = sd_assets.RIDER_IMAGE_URL
+
 # --- ✅ ส่วนที่แก้ไข: จัดรูปภาพและข้อความให้อยู่บรรทัดเดียวกัน ---
 col1, col2 = st.columns([1, 10])
 
 with col1:
-    st.image("https://raw.githubusercontent.com/daemuktnant-MFC/streamlit-assets/main/Rider_pic.png", width=80)
+    # รูปจาก cache (ดาวน์โหลดครั้งเดียว เก็บไว้บนดิสก์) ไม่ต้องให้ browser ไปโหลดจาก GitHub ทุกครั้ง
+    with sd_profile.stage('image:rider'):
+        rider_image = sd_assets.get_bytes(RIDER_IMAGE_URL)
+    if rider_image:
+        st.image(rider_image, width=80)
 
 with col2:
     # เปลี่ยนจาก st.title เป็น st.header เพื่อให้ขนาดใกล้เคียงกับรูปภาพที่จัดวาง
@@ -26,48 +47,12 @@ with col2:
     # แต่ st.header น่าจะเหมาะสมที่สุดสำหรับการจัดวางแนวนอน
     st.header("MFC SD Monitoring Dashboard")
 
-# 💥 แก้ไข: เพิ่ม verify=False ใน requests.get() เพื่อแก้ปัญหา SSL 💥
-def get_base64_image(img_source): 
-    data = None
-    image_format = "png" # Default format
-
-    if img_source.startswith("http"):
-        # ถ้าเป็น URL (Web Link)
-        try:
-            # 💥 แก้ไข: เพิ่ม verify=False เพื่อหลีกเลี่ยง SSLError 💥
-            response = requests.get(img_source, timeout=10, verify=False) 
-            response.raise_for_status() # เช็คว่าดาวน์โหลดสำเร็จหรือไม่
-            data = response.content
-            # พยายามดึงนามสกุลไฟล์จาก URL
-            format_ext = img_source.split('.')[-1].lower()
-            if format_ext in ['png', 'jpg', 'jpeg', 'gif']:
-                 image_format = format_ext.replace('jpg', 'jpeg')
-        except requests.exceptions.RequestException as e:
-            st.error(f"Error downloading image from URL: {img_source} - {e}") 
-            st.warning("คำแนะนำ: หากยังเกิด Error อีก อาจต้องอัปโหลดรูปภาพผ่าน st.file_uploader แทน")
-            return None, "png"
-    else:
-        # ถ้าเป็น Local Path
-        try:
-            with open(img_source, "rb") as f:
-                data = f.read()
-            format_ext = img_source.split('.')[-1].lower()
-            if format_ext in ['png', 'jpg', 'jpeg', 'gif']:
-                 image_format = format_ext.replace('jpg', 'jpeg')
-        except FileNotFoundError:
-            st.error(f"Error: Local image file not found at {img_source}")
-            return None, "png"
-
-    if data:
-        # คืนค่า Base64 และรูปแบบภาพ
-        return base64.b64encode(data).decode(), image_format
-    return None, "png"
-
-
 # --- ฝังรูปหุ่นยนต์ถาวร (ใส่ URL ของไฟล์ภาพที่คุณอัปโหลด) ---
-# 💥 แก้ไข: ต้องใช้ Raw Link (รูปแบบ https://raw.githubusercontent.com/...)
-ROBOT_IMAGE_URL = "https://raw.githubusercontent.com/daemuktnant-MFC/streamlit-assets/main/Robot_pic.png" 
-robot_base64, robot_format = get_base64_image(ROBOT_IMAGE_URL) # 💥 รับค่า Base64 และ Format
+# 💥 แก้ไข: ต้องใช้ Raw Link (รูปแบบ https://raw.githubusercontent.com/...) กำหนดไว้ใน sd_assets
+ROBOT_IMAGE_URL = sd_assets.ROBOT_IMAGE_URL
+# 💥 ใช้ sd_assets: ดาวน์โหลดครั้งเดียว เก็บบนดิสก์ (ETag/หมดอายุ) และเก็บ data URI ไว้ในหน่วยความจำ
+with sd_profile.stage('image:robot'):
+    robot_data_uri = sd_assets.get_data_uri(ROBOT_IMAGE_URL)
 
 # 💥 ส่วนที่เพิ่ม: Custom CSS สำหรับ KPI 💥
 st.markdown("""
@@ -85,336 +70,364 @@ div[data-testid="stMetricLabel"] {
 """, unsafe_allow_html=True)
 # 💥 สิ้นสุด Custom CSS 💥
 
-# --- ฟังก์ชันสำหรับโหลดข้อมูลจากไฟล์ที่อัปโหลด ---
-@st.cache_data
-def load_data(uploaded_file):
-    try:
-        # อ่านไฟล์ Excel โดยตรง
-        df = pd.read_excel(uploaded_file, engine='openpyxl')
-        return df
-    except Exception as e:
-        st.error(f"เกิดข้อผิดพลาดในการอ่านไฟล์ Excel: {e}")
-        st.error("กรุณาตรวจสอบว่าไฟล์เป็น .xlsx หรือ .xls ที่ถูกต้อง")
-        return None
+# --- อ่านไฟล์ที่อัปโหลด (ไฟล์เดียว/หลายไฟล์/streaming) + สร้าง snapshot ใน thread เบื้องหลัง (sd_background) ---
+# ระหว่างอ่านไฟล์ใหม่ หน้าจอยังแสดงชุดข้อมูลล่าสุดของ session นี้ แล้วสลับเป็นชุดใหม่ทั้งก้อนเมื่ออ่านเสร็จ
+# อ่านไม่สำเร็จก็ยังแสดงชุดเดิมไว้ (แจ้งเตือนใน Sidebar) แทนการล้างหน้าจอ
+def load_uploads(uploaded_files):
+    key = sd_background.upload_key(uploaded_files)
+    job = sd_background.submit(key, lambda progress: sd_background.load_uploads(key, uploaded_files, PAGE_FIGURES, progress))
+    shown = st.session_state.get('loaded_upload')
+    if job.result is not None:
+        if shown is not job.result:
+            sd_profile.note(load_data='stream' if job.result.stream is not None else 'disk' if job.result.attrs['cache']['hit'] else 'parse')
+            st.session_state['loaded_upload'] = job.result
+        return job.result
+    if job.error is not None:
+        if shown is None:
+            st.error(f"เกิดข้อผิดพลาดในการอ่านไฟล์ Excel: {job.error}")
+            st.error("กรุณาตรวจสอบว่าไฟล์เป็น .xlsx, .xls หรือ .xlsb ที่ถูกต้อง")
+        else:
+            st.sidebar.warning(f"อ่านไฟล์ใหม่ไม่สำเร็จ ยังแสดงข้อมูลชุดเดิม ({shown.name}): {job.error}")
+        # แจ้งแล้วเอางานออก rerun ถัดไปลองอ่านใหม่ (error ชั่วคราว เช่น ไฟล์ยังอัปโหลดไม่ครบ ไม่ค้างไว้ตลอด)
+        sd_background.discard(job)
+        return shown
+    sd_profile.note(load_data='background')
+    wait_for_load(job)
+    return shown
+
+# --- แถบความคืบหน้าของงานโหลดเบื้องหลัง เช็คทุก POLL_SECONDS เสร็จแล้ว rerun ทั้งหน้าเพื่อสลับเป็นชุดใหม่ ---
+@st.fragment(run_every=sd_background.POLL_SECONDS)
+def wait_for_load(job):
+    if not job.running:
+        st.rerun()
+    fraction = job.fraction
+    st.progress(fraction if fraction is not None else 0.0, text=job.describe())
+
+# --- ส่วนแสดงผลแต่ละส่วนของ Dashboard (แยกเป็นฟังก์ชัน เพื่อให้ Live mode rerun เฉพาะส่วนได้) ---
+def render_kpi_row(snap):
+    # --- KPIs คำนวณไว้แล้วใน snapshot (รอบเดียวผ่าน sd_kpi รวม On Process และ Over SLA Rate) ---
+    kpis = snap.kpis
+
+    # --- แสดงผล KPIs (แถวบนสุด) - แก้ไขเป็น 7 คอลัมน์ (6 KPI จาก sd_kpi.kpi_tiles + รูปหุ่นยนต์) ---
+    *kpi_cols, kpi_col7 = st.columns(7)
+
+    for kpi_col, (label, value) in zip(kpi_cols, sd_kpi.kpi_tiles(kpis)):
+        with kpi_col:
+            st.metric(label=label, value=value)
+    with kpi_col7:
+        # 💥 ส่วนนี้ใช้รูปหุ่นยนต์จากด้านบน แต่ปรับ width ให้เข้ากับ kpi_col7 (200px แทน 300px)
+        if robot_data_uri:
+            st.markdown(
+                f"""
+                <div style='text-align:center'>
+                    <img src='{robot_data_uri}' width='500'> 
+                </div>
+                """,
+                unsafe_allow_html=True,
+            )
+        else:
+            st.info("No Image")
 
-# --- Sidebar สำหรับอัปโหลดไฟล์ ---
-st.sidebar.header("Upload File")
-uploaded_file = st.sidebar.file_uploader(
-    "กรุณาเลือกไฟล์ Excel (.xlsx, .xls)", 
-    type=["xlsx", "xls"]
-)
 
-# --- ตรวจสอบว่ามีการอัปโหลดไฟล์หรือไม่ ---
-if uploaded_file is not None:
-    
-    df = load_data(uploaded_file)
-
-    if df is not None:
-
-        # --- คำนวณ KPIs ---
-        total_orders = df['Order ID'].nunique()
-        total_value = df['Net Order Value'].sum()
-        rounded_total_value = math.ceil(total_value) # 💥 ปัด Total Value ขึ้น
-        total_complete = df[df['Status'] == 'COMPLETE'].shape[0]
-        total_on_process = total_orders - total_complete # 💥 คำนวณ On Process
-        total_unsuccessful = df[df['Status'] == 'UNSUCCESSFUL ON DEMAND DELIVERY'].shape[0]
-        total_riders = df['Rider Name'].nunique()
-
-        # --- แสดงผล KPIs (แถวบนสุด) - แก้ไขเป็น 7 คอลัมน์ ---
-        kpi_col1, kpi_col2, kpi_col3, kpi_col4, kpi_col5, kpi_col6, kpi_col7 = st.columns(7)
-
-        with kpi_col1:
-            st.metric(label="Total Order", value=f"{total_orders:,}")
-        with kpi_col2:
-            st.metric(label="Total Complete", value=f"{total_complete:,}")
-        with kpi_col3:
-            st.metric(label="On Process", value=f"{total_on_process:,}")
-        with kpi_col4:
-            st.metric(label="Total Cancel", value=f"{total_unsuccessful:,}")
-        with kpi_col5:
-            st.metric(label="Total Rider", value=f"{total_riders:,}")
-        with kpi_col6:
-            st.metric(label="Total Value", value=f"{rounded_total_value:,}") # 💥 ใช้ค่าที่ปัดแล้ว
-        with kpi_col7:
-            # 💥 ส่วนนี้ใช้รูปหุ่นยนต์จากด้านบน แต่ปรับ width ให้เข้ากับ kpi_col7 (200px แทน 300px)
-            if robot_base64:
-                st.markdown(
-                    f"""
-                    <div style='text-align:center'>
-                        <img src='data:image/{robot_format};base64,{robot_base64}' width='500'> 
-                    </div>
-                    """,
-                    unsafe_allow_html=True,
-                )
-            else:
-                st.info("No Image")
+# กราฟวงกลมสำหรับ SLA Status ---
+def render_sla_donut(snap):
+    if snap.sla_totals is not None:
+        # กราฟโดนัท DOT vs Over SLA (สร้างครั้งเดียวต่อชุดข้อมูล ใช้ร่วมกันทุก session)
+        with sd_profile.stage('figure:sla_donut'):
+            fig_sla_pie = snap.figure('sla_donut')
+        with sd_profile.stage('plotly_chart:sla_donut'):
+            st.plotly_chart(fig_sla_pie, use_container_width=True)
+    else:
+        st.warning("ไม่สามารถสร้างกราฟวงกลมได้ เนื่องจากไม่พบคอลัมน์ 'SLA STS'")
 
 
-        # --- สร้าง Divider ---
-        st.markdown("---")
+# กราฟที่ 2: Total Order by Rider (จะกว้างขึ้น)
+def render_rider_bar(snap):
+    st.subheader("Total Order by Rider (Top 20)")
+    with sd_profile.stage('figure:rider_bar'):
+        fig_rider_bar = snap.figure('rider_bar')
+    with sd_profile.stage('plotly_chart:rider_bar'):
+        st.plotly_chart(fig_rider_bar, use_container_width=True)
 
-        # --- เตรียมข้อมูลสำหรับกราฟ ---
-        
-        # 1. คำนวณ Over SLA KPI (KPI DOT Chart)
-        
-        # กรอง Order ที่ไม่ใช่ 'CANCEL' เพื่อใช้ในการคำนวณ KPI และ Rider Chart
-        df_non_cancel = df[df['Status'] != 'CANCEL'].copy()
-        
-        # คำนวณจำนวน Order ทั้งหมดที่ไม่ใช่ Cancel
-        total_orders_non_cancel = df_non_cancel['Order ID'].nunique()
-        
-        # คำนวณจำนวน Order ที่ 'Over SLA' ในกลุ่มที่ไม่ใช่ Cancel
-        over_sla_orders = df_non_cancel[df_non_cancel['SLA STS'] == 'Over SLA']['Order ID'].nunique()
-        
-        # คำนวณอัตราส่วน
-        if total_orders_non_cancel > 0:
-            over_sla_rate = (over_sla_orders / total_orders_non_cancel) * 100
-        else:
-            over_sla_rate = 0.0
-            
-        # กำหนดสีตามเงื่อนไข (Over SLA Rate มากกว่า 0 จะเป็นสีแดง ส่วนที่เหลือเป็นสีน้ำเงิน)
-        display_color = 'red' if over_sla_rate > 0 else 'blue'
-        
-        # 2. เตรียมข้อมูลสำหรับกราฟ Rider (ใช้ df_non_cancel)
-        rider_order_counts = df_non_cancel.groupby('Rider Name')['Order ID'].nunique().reset_index()
-        rider_order_counts.columns = ['Rider Name', 'Total Orders']
-        rider_order_counts = rider_order_counts.sort_values(by='Total Orders', ascending=False)
-        rider_order_counts = rider_order_counts.dropna(subset=['Rider Name'])
 
-        # --- แสดงผลกราฟ (แถวกลาง) - ปรับอัตราส่วนคอลัมน์เป็น (1, 2) ---
-        chart_col1, chart_col2 = st.columns((1, 2))
+# --- กราฟแท่งรายชั่วโมง (Stacked by SLA Status) ---
+def render_hourly(snap):
+    st.subheader("Status Order by Hour")
 
-        # กราฟวงกลมสำหรับ SLA Status ---
-        with chart_col1:
-            if 'SLA STS' in df.columns:
-                
-                # --- 1. กรองข้อมูล 'Cancel' ออก ---
-                # เราจะใช้เฉพาะข้อมูลที่ไม่ใช่ 'Cancel' ในการสร้างกราฟนี้
-                df_sla_filtered = df[df['SLA STS'] != 'Cancel']['SLA STS'].dropna()
-
-                # --- 2. สร้าง Map เพื่อรวมกลุ่มสถานะ ---
-                # กำหนดให้ 'Within SLA', 'Pending', 'Dispatched' ถูกรวมเป็น 'DOT'
-                # 'Over SLA' จะยังคงเป็น 'Over SLA'
-                replacement_map = {
-                    'Within SLA': 'DOT',
-                    'Pending': 'DOT',
-                    'Dispatched': 'DOT'
-                }
-                
-                # --- 3. ทำการ Map ข้อมูลและนับจำนวน ---
-                # ใช้ .replace() เพื่อเปลี่ยนชื่อกลุ่ม แล้วจึง .value_counts()
-                sla_mapped = df_sla_filtered.replace(replacement_map)
-                sla_counts = sla_mapped.value_counts().reset_index()
-                sla_counts.columns = ['SLA STS', 'Count']
-                
-                # --- 4. สร้าง Pie chart (จากข้อมูลที่ Map แล้ว) ---
-                fig_sla_pie = px.pie(
-                    sla_counts,
-                    names='SLA STS',    # ตอนนี้จะมีแค่ '% DOT' และ 'Over SLA'
-                    values='Count',
-                    hole=0.4, # กราฟโดนัท
-                    color='SLA STS',
-                    color_discrete_map={ # อัปเดตสีให้ตรงกับกลุ่มใหม่
-                        'DOT': '#0099FF',      # สีเขียว
-                        'Over SLA': '#d62728'   # สีแดง
-                    }
-                )
+    if snap.hourly is not None:
+        with sd_profile.stage('figure:hourly_combo'):
+            fig_hourly = snap.figure('hourly_combo')
+        with sd_profile.stage('plotly_chart:hourly_combo'):
+            st.plotly_chart(fig_hourly, use_container_width=True)
+    else:
+        st.warning("ไม่สามารถสร้างกราฟรายชั่วโมงได้ เนื่องจากไม่พบคอลัมน์ 'Hours' หรือ 'SLA STS'")
 
-                # ... (Code lines for creating fig_sla_pie)
-
-                # --- 5. ปรับแต่งการแสดงผล ---
-                fig_sla_pie.update_traces(
-                    textposition='inside',
-                    textinfo='percent+label',
-                    rotation=270,
-                    insidetextorientation='horizontal',
-                    pull=[0.05 if s == 'Over SLA' else 0 for s in sla_counts['SLA STS']],
-                    textfont=dict(size=40),
-                    marker=dict(
-                        line=dict(color='#000000', width=1)
-                    )
-                )
-                # ⬇️ ตรวจสอบให้แน่ใจว่าบรรทัดนี้มีจำนวนการเยื้อง (Indentation) เท่ากับบรรทัดด้านบน
-                fig_sla_pie.update_layout(
-                    legend_title_text='สถานะ',
-                    margin=dict(t=0, b=0, l=0, r=0)
-                )
 
-                # 6. แสดงกราฟใน Streamlit
-                st.plotly_chart(fig_sla_pie, use_container_width=True)
+# --- จำนวน Order/Rider ไม่ซ้ำของช่วงวันที่จาก sketch รายวัน (รวม sketch ไม่อ่านข้อมูลรายแถว) ใช้เทียบกับ KPI ที่นับจริง ---
+@st.cache_data(max_entries=16)
+def history_distinct(start, end, range_key):
+    return sd_history.distinct_counts(start, end)
 
-            else:
-                st.warning("ไม่สามารถสร้างกราฟวงกลมได้ เนื่องจากไม่พบคอลัมน์ 'SLA STS'")
 
-        # กราฟที่ 2: Total Order by Rider (จะกว้างขึ้น)
+# --- Live mode: ตัวเฝ้าโฟลเดอร์ drop ใช้ร่วมกันทุก session ใน process เดียวกัน (ตัวเดียวกับที่ sd_warm ใช้ pre-warm) ---
+def get_drop_watcher(folder):
+    return sd_live.get_watcher(folder)
+
+# --- Sidebar สำหรับอัปโหลดไฟล์ ---
+st.sidebar.header("Upload File")
+live_mode = st.sidebar.toggle(
+    "Live mode (อ่านไฟล์จากโฟลเดอร์ drop)",
+    help=f"เช็คไฟล์ล่าสุดใน {sd_live.DROP_DIR} ทุก {sd_live.REFRESH_SECONDS} วินาที และ rerun เฉพาะส่วนกราฟ/KPI"
+)
+uploaded_file = None
+uploaded_files = []
+if not live_mode:
+    uploaded_files = st.sidebar.file_uploader(
+        "กรุณาเลือกไฟล์ Excel (.xlsx, .xls, .xlsb) เลือกได้หลายไฟล์ (1 ไฟล์ต่อ 1 สาขา)", 
+        type=["xlsx", "xls", "xlsb"],
+        accept_multiple_files=True
+    )
+    uploaded_file = uploaded_files[0] if uploaded_files else None
+
+# --- ดูข้อมูลย้อนหลัง: เลือกช่วงวันที่ แทนการเปิดไฟล์ Excel ทีละวัน ---
+history_days = sd_history.available_days() if not live_mode else []
+history_mode = False
+if history_days:
+    history_mode = st.sidebar.toggle("ดูข้อมูลย้อนหลัง (History)", help=f"มีข้อมูล {len(history_days)} วัน ({history_days[0]} ถึง {history_days[-1]})")
+if history_mode:
+    date_range = st.sidebar.date_input(
+        "ช่วงวันที่",
+        value=(max(history_days[0], history_days[-1] - datetime.timedelta(days=6)), history_days[-1]),
+        min_value=history_days[0],
+        max_value=history_days[-1]
+    )
+    # ระหว่างเลือกช่วง date_input จะคืนค่าวันเดียว
+    history_start, history_end = (date_range[0], date_range[-1]) if date_range else (history_days[-1], history_days[-1])
+
+# --- Live mode: แต่ละส่วน rerun เองตามรอบเวลา (st.fragment) โดยไม่ rerun ทั้งหน้า ---
+if live_mode:
+    watcher = get_drop_watcher(sd_live.DROP_DIR)
+
+    @st.fragment(run_every=sd_live.REFRESH_SECONDS)
+    def live_kpi_row():
+        with sd_profile.fragment('sd_dashboard_pic_robot', 'live_kpi_row'):
+            with sd_profile.stage('poll'):
+                df = watcher.poll()
+            # --- ไฟล์ใหม่ในโฟลเดอร์ drop บันทึกเข้าที่เก็บประวัติ (ครั้งเดียวต่อไฟล์) ---
+            history_error = None
+            if sd_live.HISTORY_INGEST:
+                with sd_profile.stage('history_ingest'):
+                    history_error = watcher.ingest_history()
+            if df is not None:
+                with sd_profile.stage('snapshot'):
+                    snap = sd_snapshot.get_snapshot(df).filtered(live_filters)
+                render_kpi_row(snap)
+                st.caption(f"ไฟล์: {os.path.basename(watcher.path)} (อัปเดตครั้งที่ {watcher.version})")
+            if watcher.error is not None:
+                st.caption(f"⚠️ อ่านไฟล์ล่าสุดไม่สำเร็จ จะลองใหม่รอบถัดไป: {watcher.error}")
+            if history_error is not None:
+                st.caption(f"⚠️ บันทึกเข้าประวัติไม่สำเร็จ: {history_error}")
+
+    @st.fragment(run_every=sd_live.REFRESH_SECONDS)
+    def live_sla_donut():
+        with sd_profile.fragment('sd_dashboard_pic_robot', 'live_sla_donut'):
+            with sd_profile.stage('poll'):
+                df = watcher.poll()
+            if df is not None:
+                with sd_profile.stage('snapshot'):
+                    snap = sd_snapshot.get_snapshot(df).filtered(live_filters)
+                render_sla_donut(snap)
+
+    @st.fragment(run_every=sd_live.REFRESH_SECONDS)
+    def live_rider_bar():
+        with sd_profile.fragment('sd_dashboard_pic_robot', 'live_rider_bar'):
+            with sd_profile.stage('poll'):
+                df = watcher.poll()
+            if df is not None:
+                with sd_profile.stage('snapshot'):
+                    snap = sd_snapshot.get_snapshot(df).filtered(live_filters)
+                render_rider_bar(snap)
+
+    @st.fragment(run_every=sd_live.REFRESH_SECONDS)
+    def live_hourly():
+        with sd_profile.fragment('sd_dashboard_pic_robot', 'live_hourly'):
+            with sd_profile.stage('poll'):
+                df = watcher.poll()
+            if df is not None:
+                with sd_profile.stage('snapshot'):
+                    snap = sd_snapshot.get_snapshot(df).filtered(live_filters)
+                render_hourly(snap)
+
+    # --- ตัวกรองอยู่นอก fragment: เปลี่ยนตัวกรองแล้ว rerun ทั้งหน้า fragment ใช้ค่าล่าสุดผ่าน live_filters ---
+    live_df = watcher.poll()
+    live_filters = {}
+    if live_df is not None:
+        live_filters = sd_filters.render_filter_sidebar(sd_snapshot.get_snapshot(live_df).filter_index())
+
+    if live_df is None:
+        st.info(f"👋 ยังไม่พบไฟล์ Excel ในโฟลเดอร์ {sd_live.DROP_DIR}")
+    else:
+        live_kpi_row()
+
+        # --- สร้าง Divider ---
+        st.markdown("---")
+
+        chart_col1, chart_col2 = st.columns((1, 2))
+        with chart_col1:
+            live_sla_donut()
         with chart_col2:
-            st.subheader("Total Order by Rider (Top 20)")
-            
-            top_riders = rider_order_counts.head(20)
-            
-            fig_rider_bar = px.bar(
-                top_riders,
-                x='Total Orders',  
-                y='Rider Name',    
-                orientation='h',    
-                text='Total Orders', 
-                labels={'Total Orders': 'Number of Orders', 'Rider Name': 'Rider Name'},
-                color='Total Orders', 
-                color_continuous_scale=px.colors.sequential.Teal
-            )
-            
-            fig_rider_bar.update_layout(yaxis={'categoryorder':'total ascending'})
-            
-            fig_rider_bar.update_traces(
-                textposition='inside',
-                textangle=0,
-                insidetextanchor='start', 
-                insidetextfont=dict(color='#FF9933')
-            )
-            
-            st.plotly_chart(fig_rider_bar, use_container_width=True)
+            live_rider_bar()
 
         # --- สร้าง Divider ---
         st.markdown("---")
 
-        # --- กราฟแท่งรายชั่วโมง (Stacked by SLA Status) ---
-        st.subheader("Status Order by Hour")
-
-        if 'Hours' in df.columns and 'SLA STS' in df.columns:
-            
-            # แปลงเป็น string เพื่อให้ Plotly มองเป็น category
-            df['Hours'] = df['Hours'].astype(str)
-            
-            df_hourly = df.groupby(['Hours', 'SLA STS']).size().reset_index(name='Count')
-            df_hourly_total = df_hourly.groupby('Hours')['Count'].sum().reset_index(name='TotalCount')
-
-            # --- ส่วนที่แก้ไข: การจัดเรียงเวลา ---
-            # 1. สร้างลิสต์ของชั่วโมงที่ต้องการเรียง (08, 09, 10, ... 18)
-            # เราจะค้นหาค่าที่ไม่ซ้ำกันในคอลัมน์ 'Hours', แปลงเป็น int, เรียง, แล้วแปลงกลับเป็น str
-            unique_hours = df['Hours'].unique()
-            sorted_hours = sorted([int(h) for h in unique_hours])
-            sorted_hours_str = [str(h) for h in sorted_hours]
-            # 💥 เพิ่มบรรทัดนี้ เพื่อจัดเรียง df_hourly_total ให้ตรงกับแกน X
-            df_hourly_total['Hours'] = pd.Categorical(df_hourly_total['Hours'], categories=sorted_hours_str, ordered=True)
-            df_hourly_total = df_hourly_total.sort_values('Hours')
-
-            # --- กำหนดแผนที่สีใหม่ ---
-            color_map = {
-                'Within SLA': '#0099FF',      
-                'Over SLA': '#FF3300',        
-                'Dispatched': '#CC00FF',    
-                'Pending': '#8ED973',        
-                'Cancel': '#B2B2B2'          
-            }
-
-            # 1. สร้าง Figure ด้วย Subplots เพื่อรองรับ Secondary Y-Axis
-            fig_hourly = make_subplots(specs=[[{"secondary_y": True}]])
-
-            # 2. เพิ่ม Bar Traces (Stacked Column) สำหรับ SLA Status
-            sla_statuses = ['Within SLA', 'Over SLA', 'Dispatched', 'Pending', 'Cancel']
-    
-            for status in sla_statuses:
-                df_status = df_hourly[df_hourly['SLA STS'] == status]
-                if not df_status.empty:
-                    fig_hourly.add_trace(
-                        go.Bar(
-                            x=df_status['Hours'],
-                            y=df_status['Count'],
-                            name=status,
-                            marker_color=color_map.get(status, '#B2B2B2'),
-                            text=df_status['Count'],
-                            # ตั้งค่าเริ่มต้นของตัวเลขทั้งหมด
-                            textposition='inside',
-                            textangle=0
-                        ),
-                        secondary_y=False, # ใช้แกน Y หลัก (ซ้าย)
-                    )
-
-            # 3. เพิ่ม Line Trace (Scatter) สำหรับ Total Order (แกน Y รอง)
-            fig_hourly.add_trace(
-                go.Scatter(
-                    x=df_hourly_total['Hours'],
-                    y=df_hourly_total['TotalCount'],
-                    name='Total',
-                    mode='lines+markers+text',
-                    line=dict(color='#FFCC66', width=4, shape='spline'),
-                    marker=dict(size=10, color='white', line=dict(width=2, color='#00CCCC')),
-                    text=df_hourly_total['TotalCount'],
-                    textposition='top center',
-                    textfont=dict(color='black', size=16), # 💥 แก้ไข: เพิ่มขนาดตัวอักษร Total
-                ),
-                secondary_y=True, # 💥 ใช้แกน Y รอง (ขวา)
-            )
+        live_hourly()
 
-            # 4. ปรับแต่ง Layout และ Axes
-    
-            # 💥 ตั้งค่า Stacked Bar
-            fig_hourly.update_layout(barmode='stack')
+# --- ตรวจสอบว่ามีการอัปโหลดไฟล์หรือไม่ ---
+elif uploaded_file is not None or history_mode:
     
-            # 💥 กำหนดขนาดตัวอักษรเฉพาะ 'Within SLA' (Trace ลำดับที่ 0 หาก Within SLA มีข้อมูล)
-            # เราใช้ชื่อ trace เพื่อให้แน่ใจว่าถูกต้อง
-            fig_hourly.update_traces(
-                selector=dict(name='Within SLA', type='bar'), 
-                textposition='inside',
-                textfont=dict(size=20) # 💥 เพิ่มขนาดตัวอักษร Within SLA
+    sd_profile.note(load_data='memory')
+    df = stream = loaded = None
+    with sd_profile.stage('load_data'):
+        if history_mode:
+            # ข้อมูลย้อนหลังหลายวันจากที่เก็บประวัติ ใช้ร่วมกันทุก session ผ่าน sd_store
+            df = sd_history.cached_query(history_start, history_end)
+            if df is None:
+                st.info("ไม่มีข้อมูลในช่วงวันที่ที่เลือก")
+        else:
+            loaded = load_uploads(uploaded_files)
+            if loaded is not None:
+                df, stream = loaded.df, loaded.stream
+
+    if df is not None or stream is not None:
+        attrs = df.attrs if df is not None else stream.attrs
+
+        # --- แสดงเวลาที่ใช้อ่านไฟล์ (engine ที่ใช้ + วินาที) ---
+        parse_info = attrs.get('parse')
+        if parse_info:
+            st.sidebar.caption(
+                f"อ่านไฟล์ด้วย {parse_info['engine']}: {parse_info['rows']:,} แถว ใน {parse_info['seconds']:.2f} วินาที"
             )
-
-           # 💥 กำหนดลำดับ X-Axis และชื่อแกน
-            fig_hourly.update_xaxes(
-                type='category',
-                categoryorder='array',
-                categoryarray=sorted_hours_str,
-                title_text='Hour of Day'
+        sites_info = attrs.get('sites')
+        if sites_info:
+            st.sidebar.caption(f"รวม {sites_info['files']} ไฟล์ ({sites_info['sites']} สาขา)")
+        cache_info = attrs.get('cache')
+        history_info = attrs.get('history')
+        if history_info:
+            st.sidebar.caption(
+                f"ประวัติ {history_info['days']} วัน ({history_info['start']} ถึง {history_info['end']}): {history_info['rows']:,} แถว ใน {cache_info['seconds']:.2f} วินาที"
             )
-    
-           # 💥 กำหนดแกน Y หลัก (ซ้าย)
-            fig_hourly.update_yaxes(
-                title_text="Number of Orders (SLA Status)", 
-                secondary_y=False,
-                # ตั้งค่า Y-axis range ให้ Total Order อยู่ด้านบน (อาจจะต้องปรับ max_y อีกครั้ง)
-                range=[0, df_hourly_total['TotalCount'].max() * 1.5] 
+            distinct = history_distinct(history_start, history_end, cache_info['key'])
+            st.sidebar.caption(
+                f"Sketch (±{sd_sketch.relative_error():.1%}): Order ~{distinct['Order ID']:,} / Rider ~{distinct['Rider Name']:,}"
             )
-    
-            # 💥 กำหนดแกน Y รอง (ขวา)
-            fig_hourly.update_yaxes(
-                title_text="Total Order", 
-                secondary_y=True,
-                showgrid=False, # ซ่อน Grid line ของแกนรอง
-                title_standoff=10,
-                # กำหนด Range ให้ใกล้เคียงกับแกน Y หลัก เพื่อไม่ให้เส้นดูแบนเกินไป
-                showticklabels=False, # 👈 ซ่อนตัวเลขกำกับแกน Y รอง
-                range=[0, df_hourly_total['TotalCount'].max() * 1.15] 
+        elif cache_info and cache_info['hit']:
+            st.sidebar.caption(f"โหลดจาก cache ใน {cache_info['seconds']:.3f} วินาที")
+        # --- ชุดข้อมูลที่เก็บในหน่วยความจำของ server (ใช้ร่วมกันทุก session) เทียบกับงบ SD_STORE_MAX_MB ---
+        store_usage = sd_store.usage()
+        if store_usage['datasets']:
+            st.sidebar.caption(
+                f"ชุดข้อมูลในหน่วยความจำ {store_usage['datasets']} ชุด: {store_usage['bytes'] / 2**20:,.1f} / {store_usage['max_bytes'] / 2**20:,.0f} MB"
             )
-            
-            # 💥 ปรับ Layout โดยรวม (เพิ่ม Legend)
-            fig_hourly.update_layout(
-                barmode='stack',
-                # 💥 แก้ไข: ย้าย Legend ไปด้านบนขวา
-                margin=dict(t=50, r=120),
-                legend=dict(
-                    orientation="v",
-                    yanchor="top",
-                    y=1, # ตำแหน่งบนสุด
-                    xanchor="right",
-                    x=1.1 # ตำแหน่งขวาสุด (นอกกราฟเล็กน้อย)
+
+        # --- บันทึกไฟล์ที่อัปโหลดเข้าที่เก็บประวัติ (วันละ 1 ไฟล์ ไฟล์ใหม่ของวันเดียวกันจะแทนที่ไฟล์เดิม) ---
+        if not history_info and df is not None:
+            with st.sidebar.expander("บันทึกเข้าประวัติ (History)"):
+                history_day = st.date_input(
+                    "วันที่ของไฟล์นี้",
+                    value=sd_history.export_date(loaded.name, datetime.date.today())
                 )
+                if st.button("บันทึก"):
+                    try:
+                        saved = sd_history.ingest(df, history_day)
+                    except Exception as e:
+                        # บันทึกไม่สำเร็จแสดงใน sidebar ไม่ให้ทั้งหน้าล้ม (เหมือน Live mode)
+                        st.error(f"บันทึกเข้าประวัติไม่สำเร็จ: {e}")
+                    else:
+                        if saved:
+                            st.success(f"บันทึกข้อมูลวันที่ {history_day} แล้ว")
+                        else:
+                            st.info(f"ไฟล์นี้บันทึกเป็นข้อมูลวันที่ {history_day} ไว้แล้ว")
+
+        # --- โหมดต่อข้อมูลระหว่างวัน (Append): ไฟล์ที่อัปโหลดซ้ำ/ไฟล์ delta อัปเดตเฉพาะ Order ที่เปลี่ยน ---
+        intraday = None
+        sd_profile.note(rows=len(df) if df is not None else stream.rows, dataset=attrs.get('cache', {}).get('key'))
+        if not history_info and df is not None and st.sidebar.checkbox("โหมดต่อข้อมูลระหว่างวัน (Append)", help="รวมไฟล์ที่อัปโหลดหลายครั้งในวันเดียวกัน โดยนับ Order ID ละ 1 แถว (แถวล่าสุด)"):
+            intraday = st.session_state.setdefault('intraday_state', sd_incremental.IntradayState())
+            data_key = df.attrs.get('cache', {}).get('key')
+            if st.session_state.get('intraday_last_key') != data_key:
+                with sd_profile.stage('intraday_apply'):
+                    st.session_state['intraday_last_updated'] = intraday.apply(df)
+                st.session_state['intraday_last_key'] = data_key
+            st.sidebar.caption(
+                f"อัปโหลด {intraday.uploads} ครั้ง / รอบล่าสุดอัปเดต {st.session_state['intraday_last_updated']:,} Order"
             )
+            if st.sidebar.button("ตรวจสอบ (คำนวณใหม่ทั้งหมด)"):
+                mismatches = intraday.verify()
+                if mismatches:
+                    st.sidebar.error(f"ตัวนับสะสมไม่ตรงกับการคำนวณใหม่: {', '.join(mismatches)}")
+                else:
+                    st.sidebar.success("ตัวนับสะสมตรงกับการคำนวณใหม่ทั้งหมด")
+            if st.sidebar.button("ล้างข้อมูลสะสม"):
+                st.session_state.pop('intraday_state', None)
+                st.session_state.pop('intraday_last_key', None)
+                st.rerun()
+
+        # --- KPI/ข้อมูลกราฟ/กราฟ คำนวณครั้งเดียวต่อชุดข้อมูล และใช้ร่วมกันทุก session (sd_snapshot) ---
+        with sd_profile.stage('snapshot'):
+            if intraday:
+                snap = sd_snapshot.Snapshot.from_intraday(intraday)
+            elif loaded is not None:
+                snap = loaded.snap
+            else:
+                snap = sd_snapshot.get_snapshot(df)
 
-            st.plotly_chart(fig_hourly, use_container_width=True)
+        # --- ตัวกรอง ชั่วโมง/Payment/SLA/Rider (ตอบจาก bitmap index ของชุดข้อมูล ไม่ต้องกรองข้อมูลรายแถวใหม่) ---
+        filter_index = snap.filter_index()
+        if filter_index is not None:
+            filters = sd_filters.render_filter_sidebar(filter_index)
+            with sd_profile.stage('filter'):
+                snap = snap.filtered(filters)
 
-        else:
-            st.warning("ไม่สามารถสร้างกราฟรายชั่วโมงได้ เนื่องจากไม่พบคอลัมน์ 'Hours' หรือ 'SLA STS'")
+        with sd_profile.stage('kpi_row'):
+            render_kpi_row(snap)
 
-        # --- (ทางเลือก) แสดงตารางข้อมูลดิบ ---
-        with st.expander("ดูข้อมูลดิบ (Raw Data)"):
-            st.dataframe(df)
+        # --- สร้าง Divider ---
+        st.markdown("---")
 
-else:
-    # --- หน้าจอเริ่มต้น เมื่อยังไม่มีการอัปโหลดไฟล์ ---
-    st.info("👋 กรุณาอัปโหลดไฟล์ Excel ของคุณที่ Sidebar ด้านซ้ายเพื่อเริ่มต้นใช้งาน")
+        # --- แสดงผลกราฟ (แถวกลาง) - ปรับอัตราส่วนคอลัมน์เป็น (1, 2) ---
+        chart_col1, chart_col2 = st.columns((1, 2))
+
+        with chart_col1:
+            render_sla_donut(snap)
 
+        with chart_col2:
+            render_rider_bar(snap)
 
+        # --- สร้าง Divider ---
+        st.markdown("---")
 
+        render_hourly(snap)
 
+        # --- (ทางเลือก) แสดงตารางข้อมูลดิบ ---
+        # แบ่งหน้าที่ฝั่ง server ส่งไปที่ browser เฉพาะหน้าที่เปิดดู
+        with st.expander("ดูข้อมูลดิบ (Raw Data)"):
+            with sd_profile.stage('raw_table'):
+                if df is not None:
+                    sd_table.render_raw_table(df)
+                else:
+                    # ไฟล์ที่อ่านแบบ streaming ไม่มีข้อมูลรายแถวในหน่วยความจำ แสดงเฉพาะแถวแรก ๆ จากไฟล์ spill
+                    preview = sd_stream.preview(stream.spill, sd_stream.PREVIEW_ROWS)
+                    if preview is None:
+                        st.info("ไฟล์นี้อ่านแบบ streaming และไม่ได้เก็บข้อมูลดิบไว้")
+                    else:
+                        st.caption(f"แสดง {len(preview):,} แถวแรกจากทั้งหมด {stream.rows:,} แถว")
+                        st.dataframe(preview, hide_index=True)
 
+else:
+    # --- หน้าจอเริ่มต้น เมื่อยังไม่มีการอัปโหลดไฟล์ ---
+    st.info("👋 กรุณาอัปโหลดไฟล์ Excel ของคุณที่ Sidebar ด้านซ้ายเพื่อเริ่มต้นใช้งาน")
 
+# --- (ทางเลือก) ตารางเวลาแต่ละขั้นของ rerun นี้ + หน่วยความจำ ---
+show_profile = st.sidebar.checkbox("แสดงเวลาแต่ละขั้น (Debug)")
+sd_profile.finish(st.sidebar if show_profile else None)
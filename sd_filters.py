@@ -0,0 +1,106 @@
+import numpy as np
+import streamlit as st
+
+# --- มิติที่ใช้กรองทั้ง Dashboard (ชั่วโมงเลือกเป็นช่วง ที่เหลือเลือกได้หลายค่า) ---
+FILTER_DIMENSIONS = ['Hours', 'Payment Code', 'SLA STS', 'Rider Name', 'Site']
+# --- มิติที่มีค่าไม่ซ้ำไม่เกินนี้เก็บ bitmap ของทุกค่าไว้ล่วงหน้า มากกว่านี้ (เช่น Rider) เก็บเป็นรายการตำแหน่งแทน ---
+DENSE_MAX_VALUES = 64
+
+
+class _ColumnIndex:
+    # index ของ 1 มิติ: ค่า -> ตำแหน่งที่มีค่านั้น (bitmap แบบ packbits หรือรายการตำแหน่งที่เรียงแล้ว)
+
+    def __init__(self, codes, categories):
+        self.size = len(codes)
+        self.categories = list(categories)
+        self.positions = {category: i for i, category in enumerate(self.categories)}
+        self.dense = len(self.categories) <= DENSE_MAX_VALUES
+        if self.dense:
+            self.bitmaps = [np.packbits(codes == code) for code in range(len(self.categories))]
+        else:
+            order = np.argsort(codes, kind='stable').astype(np.int32)
+            self.order = order
+            self.offsets = np.searchsorted(codes[order], np.arange(len(self.categories) + 1))
+
+    def bitmap(self, values):
+        # OR ของ bitmap ทุกค่าที่เลือก (ค่าที่ไม่มีในข้อมูลถูกข้าม)
+        codes = [self.positions[v] for v in values if v in self.positions]
+        if self.dense:
+            result = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+            for code in codes:
+                np.bitwise_or(result, self.bitmaps[code], out=result)
+            return result
+        selected = np.zeros(self.size, dtype=bool)
+        for code in codes:
+            selected[self.order[self.offsets[code]:self.offsets[code + 1]]] = True
+        return np.packbits(selected)
+
+
+class BitmapIndex:
+    # bitmap index ของทุกมิติที่กรองได้ สร้างครั้งเดียวต่อชุดข้อมูล
+    # ตำแหน่งใน index คือแถวของ cube.cells (ทุกแถวข้อมูลในช่องเดียวกันมีค่ามิติเหมือนกัน
+    # จึงกรองที่ระดับช่องได้ผลเท่ากับกรองรายแถว แต่จำนวนช่องน้อยกว่าจำนวนแถวมาก)
+
+    def __init__(self, cells, dimensions=FILTER_DIMENSIONS):
+        self.size = len(cells)
+        self.columns = {}
+        for dim in dimensions:
+            if dim in cells.columns:
+                values = cells[dim].array
+                self.columns[dim] = _ColumnIndex(values.codes, values.categories)
+
+    def options(self, dim):
+        # ค่าที่เลือกได้ของมิตินี้ (เฉพาะค่าที่มีในข้อมูล ตามลำดับ category)
+        index = self.columns[dim]
+        if index.dense:
+            return [c for c, bitmap in zip(index.categories, index.bitmaps) if bitmap.any()]
+        counts = np.diff(index.offsets)
+        return [c for c, count in zip(index.categories, counts) if count > 0]
+
+    def select(self, filters):
+        # AND ของทุกมิติที่มีการเลือก (ภายในมิติเดียวกันเป็น OR) คืนค่า mask ของช่อง หรือ None ถ้าไม่ได้กรอง
+        result = None
+        for dim, values in filters.items():
+            if not values or dim not in self.columns:
+                continue
+            bitmap = self.columns[dim].bitmap(values)
+            result = bitmap if result is None else np.bitwise_and(result, bitmap)
+        if result is None:
+            return None
+        return np.unpackbits(result, count=self.size).astype(bool)
+
+
+def filter_key(filters):
+    # key ของชุดตัวกรอง (ไม่สนลำดับที่เลือก และตัดมิติที่ไม่ได้เลือกออก)
+    return tuple(sorted((dim, tuple(sorted(map(str, values)))) for dim, values in filters.items() if values))
+
+
+def _reset_stale(widget_key, options):
+    # ตัวเลือกเปลี่ยน (เช่น เปลี่ยนไฟล์/ช่วงวันที่) ให้ล้างค่าที่เลือกค้างไว้ ไม่งั้นช่วงชั่วโมงเดิมจะกรองข้อมูลชุดใหม่โดยไม่ตั้งใจ
+    options_key = f"{widget_key}__options"
+    options = tuple(options)
+    if st.session_state.get(options_key) != options:
+        st.session_state.pop(widget_key, None)
+        st.session_state[options_key] = options
+
+
+def render_filter_sidebar(index, key='filters'):
+    # ตัวกรองใน Sidebar คืนค่า {มิติ: รายการค่าที่เลือก} (มิติที่ไม่ได้เลือก = ทั้งหมด)
+    st.sidebar.header("Filter")
+    filters = {}
+    if 'Hours' in index.columns:
+        hours = index.options('Hours')
+        if len(hours) > 1:
+            _reset_stale(f"{key}_hours", hours)
+            start, end = st.sidebar.select_slider("ช่วงชั่วโมง", options=hours, value=(hours[0], hours[-1]), key=f"{key}_hours")
+            if (start, end) != (hours[0], hours[-1]):
+                filters['Hours'] = hours[hours.index(start):hours.index(end) + 1]
+    # Site แสดงเฉพาะตอนรวมหลายสาขา
+    if 'Site' in index.columns and len(index.options('Site')) > 1:
+        _reset_stale(f"{key}_Site", index.options('Site'))
+        filters['Site'] = st.sidebar.multiselect("Site", index.options('Site'), placeholder="ทั้งหมด", key=f"{key}_Site")
+    for dim, label in (('Payment Code', "Payment"), ('SLA STS', "SLA STS"), ('Rider Name', "Rider")):
+        if dim in index.columns:
+            _reset_stale(f"{key}_{dim}", index.options(dim))
+            filters[dim] = st.sidebar.multiselect(label, index.options(dim), placeholder="ทั้งหมด", key=f"{key}_{dim}")
+    return {dim: values for dim, values in filters.items() if values}
@@ -0,0 +1,285 @@
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import sd_loader
+import sd_schema
+import sd_sketch
+import sd_snapshot
+import sd_store
+
+# --- ที่เก็บประวัติรายวัน: <HISTORY_DIR>/date=YYYY-MM-DD/orders.parquet (1 โฟลเดอร์ต่อ 1 วัน) ---
+HISTORY_DIR = os.environ.get('SD_HISTORY_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.sd_history'))
+# --- จำนวนแถวต่อ row group ในไฟล์ Parquet (ยิ่งเล็ก การกรอง Rider/ชั่วโมงยิ่งข้ามข้อมูลได้มาก แต่ไฟล์ใหญ่ขึ้น) ---
+ROW_GROUP_ROWS = 16_384
+
+MANIFEST_NAME = 'manifest.json'
+DATA_FILE = 'orders.parquet'
+# --- sketch จำนวน Order/Rider ไม่ซ้ำ ต่อ (สาขา, ชั่วโมง) ของแต่ละวัน ใช้นับข้ามหลายวัน/หลายสาขาโดยไม่อ่านข้อมูลรายแถว ---
+SKETCH_FILE = 'sketches.parquet'
+
+# --- schema คงที่ทุกวัน เพื่อให้อ่านหลายวันรวมกันได้โดยไม่ต้องเดา type ---
+# คอลัมน์ข้อความเก็บเป็น string ธรรมดา (Parquet บีบอัดแบบ dictionary ให้เอง และ min/max ของ row group ใช้กรองได้)
+# แล้วค่อยอ่านกลับเป็น dictionary (category) ตอน query
+HISTORY_SCHEMA = pa.schema([
+    ('Order ID', pa.string()),
+    ('Net Order Value', pa.float64()),
+    ('Status', pa.string()),
+    ('Rider Name', pa.string()),
+    ('Payment Code', pa.string()),
+    ('Hours', pa.string()),
+    ('SLA STS', pa.string()),
+    # สาขา (เฉพาะไฟล์ที่รวมหลายสาขา ไฟล์ของวันก่อนหน้าที่ไม่มีคอลัมน์นี้อ่านได้เป็นค่าว่าง)
+    ('Site', pa.string()),
+    # ชั่วโมงแบบตัวเลข ใช้กรองด้วย statistics ของ row group (null ถ้า Hours ไม่ใช่ตัวเลข)
+    ('hour', pa.int8()),
+])
+CATEGORY_COLUMNS = ['Status', 'Rider Name', 'Payment Code', 'Hours', 'SLA STS', 'Site']
+PARTITIONING = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+DATASET_SCHEMA = pa.schema(
+    [pa.field(f.name, pa.dictionary(pa.int32(), pa.string())) if f.name in CATEGORY_COLUMNS else f for f in HISTORY_SCHEMA]
+    + [pa.field('date', pa.string())]
+)
+READ_FORMAT = ds.ParquetFileFormat(read_options=ds.ParquetReadOptions(dictionary_columns=CATEGORY_COLUMNS))
+
+_lock = threading.Lock()
+
+
+def export_date(file_name, default=None):
+    # เดาวันที่ของไฟล์ export จากชื่อไฟล์ ถ้าไม่พบคืนค่า default
+    for pattern, fields in sd_loader.DATE_PATTERNS:
+        for match in pattern.finditer(os.path.basename(file_name)):
+            parts = dict(zip(fields, (int(g) for g in match.groups())))
+            try:
+                return datetime.date(parts['year'], parts['month'], parts['day'])
+            except ValueError:
+                continue
+    return default
+
+
+def _manifest_path():
+    return os.path.join(HISTORY_DIR, MANIFEST_NAME)
+
+
+def manifest():
+    # วันที่ -> ข้อมูลไฟล์ที่ ingest ไว้ (key ของไฟล์ต้นทาง, จำนวนแถว, เวลาที่บันทึก)
+    try:
+        with open(_manifest_path(), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(entries):
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=HISTORY_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, _manifest_path())
+
+
+def available_days():
+    return sorted(datetime.date.fromisoformat(day) for day in manifest())
+
+
+def _text(df, col):
+    # คอลัมน์ที่ไม่มีในไฟล์ (เช่น Site ของไฟล์เดียว, Hours/SLA STS ของ export ที่ไม่มีคอลัมน์สูตร) เก็บเป็นค่าว่าง
+    if col not in df.columns:
+        return pd.Series(pd.NA, index=df.index, dtype='string')
+    return df[col].astype('string')
+
+
+def _to_table(df):
+    hours = _text(df, 'Hours')
+    # ช่วงย่อยจาก sd_sla ('08:15') ใช้ชั่วโมงข้างหน้า
+    hour = pd.to_numeric(hours.str.split(':', n=1).str[0], errors='coerce')
+    hour = hour.where((hour >= 0) & (hour <= 23))
+    table = pd.DataFrame({
+        'Order ID': df['Order ID'].astype('string'),
+        'Net Order Value': df['Net Order Value'].astype('float64'),
+        'Status': df['Status'].astype('string'),
+        'Rider Name': df['Rider Name'].astype('string'),
+        'Payment Code': df['Payment Code'].astype('string'),
+        'Hours': hours,
+        'SLA STS': _text(df, 'SLA STS'),
+        'Site': _text(df, 'Site'),
+        'hour': hour.astype('Int8'),
+    })
+    # เรียงตาม Rider แล้วตามชั่วโมง: min/max ของแต่ละ row group จึงแคบ ใช้แทน index ตอนกรอง
+    table = table.sort_values(['Rider Name', 'hour'], kind='stable', na_position='last')
+    return pa.Table.from_pandas(table, schema=HISTORY_SCHEMA, preserve_index=False).replace_schema_metadata(None)
+
+
+def ingest(df, day, source_key=None):
+    # บันทึก export ของวันนั้น (ไฟล์ใหม่ของวันเดียวกันจะแทนที่ไฟล์เดิม เพราะ export ระหว่างวันเป็นยอดสะสม)
+    # คืนค่า False ถ้าไฟล์นี้เคยบันทึกไว้แล้ว
+    day = day.isoformat()
+    source_key = source_key or sd_snapshot.dataset_key(df)
+    with _lock:
+        entries = manifest()
+        if entries.get(day, {}).get('key') == source_key:
+            return False
+
+        table = _to_table(df)
+        folder = os.path.join(HISTORY_DIR, f"date={day}")
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_ROWS, compression='lz4',
+                           write_statistics=True)
+            os.replace(tmp_path, os.path.join(folder, DATA_FILE))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        _write_sketches(folder, table)
+
+        entries[day] = {
+            'key': source_key,
+            'rows': table.num_rows,
+            'ingested_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        _write_manifest(entries)
+    return True
+
+
+def remove_day(day):
+    with _lock:
+        entries = manifest()
+        entries.pop(day.isoformat(), None)
+        _write_manifest(entries)
+        shutil.rmtree(os.path.join(HISTORY_DIR, f"date={day.isoformat()}"), ignore_errors=True)
+
+
+def _days_in_range(entries, start, end):
+    return [day for day in sorted(entries) if start.isoformat() <= day <= end.isoformat()]
+
+
+def range_key(start, end):
+    # key ของชุดข้อมูลในช่วงวันที่ (เปลี่ยนเมื่อมีการ ingest วันใดวันหนึ่งในช่วงใหม่) None ถ้าไม่มีข้อมูล
+    entries = manifest()
+    days = _days_in_range(entries, start, end)
+    if not days:
+        return None
+    joined = '|'.join(f"{day}:{entries[day]['key']}" for day in days)
+    return 'h-' + hashlib.blake2b(joined.encode('utf-8'), digest_size=20).hexdigest()
+
+
+def query(start, end, riders=None, hours=None):
+    # อ่าน Order ในช่วงวันที่ (รวมทั้งสองวัน) อ่านเฉพาะโฟลเดอร์ของวันในช่วง
+    # และกรอง Rider/ชั่วโมงด้วย statistics ของ row group (ข้าม row group ที่ไม่เกี่ยวโดยไม่ต้องอ่าน)
+    # คืนค่า DataFrame ที่มีคอลัมน์ Date เพิ่ม หรือ None ถ้าไม่มีข้อมูลในช่วงนี้
+    started = time.perf_counter()
+    entries = manifest()
+    days = _days_in_range(entries, start, end)
+    paths = [os.path.join(HISTORY_DIR, f"date={day}", DATA_FILE) for day in days]
+    paths = [path for path in paths if os.path.exists(path)]
+    if not paths:
+        return None
+
+    dataset = ds.dataset(paths, schema=DATASET_SCHEMA, format=READ_FORMAT,
+                         partitioning=PARTITIONING, partition_base_dir=HISTORY_DIR)
+    expression = None
+    if riders:
+        expression = ds.field('Rider Name').isin(list(riders))
+    if hours:
+        hour_filter = ds.field('hour').isin([int(h) for h in hours])
+        expression = hour_filter if expression is None else expression & hour_filter
+    table = dataset.to_table(filter=expression, columns=[f.name for f in HISTORY_SCHEMA if f.name != 'hour'] + ['date'])
+
+    df = table.to_pandas()
+    df = df.rename(columns={'date': 'Date'})
+    if df['Site'].isna().all():
+        df = df.drop(columns=['Site'])
+    df['Date'] = df['Date'].astype('category')
+    df = sd_schema.freeze_frame(sd_schema.order_categories(df))
+    key = range_key(start, end)
+    if riders or hours:
+        filters = json.dumps([sorted(riders or []), sorted(int(h) for h in hours or [])], ensure_ascii=False)
+        key += '-' + hashlib.blake2b(filters.encode('utf-8'), digest_size=8).hexdigest()
+    df.attrs['cache'] = {'hit': True, 'key': key, 'seconds': time.perf_counter() - started}
+    df.attrs['history'] = {'start': start.isoformat(), 'end': end.isoformat(), 'days': len(paths), 'rows': len(df)}
+    return df
+
+
+def cached_query(start, end):
+    # ข้อมูลทั้งช่วงวันที่ผ่าน sd_store: ชุดเดียวใช้ร่วมกันทุก session และนับรวมในงบ SD_STORE_MAX_MB
+    # key (range_key) เปลี่ยนเมื่อมีการบันทึกวันใดวันหนึ่งในช่วงนี้ใหม่ จึงไม่ได้ผลลัพธ์เก่า
+    key = range_key(start, end)
+    if key is None:
+        return None
+    df = sd_store.get(key)
+    if df is None:
+        df = query(start, end)
+        if df is None:
+            return None
+        df = sd_store.put(key, df)
+    return df
+
+
+def _write_sketches(folder, table):
+    sketches = sd_sketch.group_sketches(table.select(['Order ID', 'Rider Name', 'Site', 'hour']).to_pandas(), ['Site', 'hour'])
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    os.close(fd)
+    try:
+        sketches.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, os.path.join(folder, SKETCH_FILE))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return sketches
+
+
+def _day_sketches(day):
+    # sketch ของวันนั้น (วันที่บันทึกไว้ก่อนมี sketch หรือ precision เปลี่ยน จะสร้างจากข้อมูลของวันนั้นครั้งเดียวแล้วเก็บไว้)
+    folder = os.path.join(HISTORY_DIR, f"date={day}")
+    try:
+        sketches = pd.read_parquet(os.path.join(folder, SKETCH_FILE))
+        if len(sketches) and len(sketches['registers'].iloc[0]) == 2 ** sd_sketch.SKETCH_PRECISION:
+            return sketches
+    except (OSError, ValueError):
+        pass
+    data_path = os.path.join(folder, DATA_FILE)
+    if not os.path.exists(data_path):
+        return None
+    table = ds.dataset(data_path, schema=HISTORY_SCHEMA).to_table()
+    with _lock:
+        return _write_sketches(folder, table)
+
+
+def distinct_counts(start, end, sites=None, hours=None, exact=False):
+    # จำนวน Order ID / Rider Name ไม่ซ้ำในช่วงวันที่ (เลือกเฉพาะบางสาขา/ชั่วโมงได้)
+    # ค่าเริ่มต้นรวม sketch ของแต่ละวัน (ประมาณ ±sd_sketch.relative_error()) exact=True อ่านข้อมูลรายแถวมานับจริงเพื่อตรวจสอบ
+    if exact:
+        df = query(start, end, hours=hours)
+        if df is None:
+            return {col: 0 for col in sd_sketch.SKETCH_COLUMNS}
+        if sites:
+            df = df[df['Site'].isin(sites)] if 'Site' in df.columns else df.iloc[0:0]
+        return {col: int(df[col].astype(str).where(df[col].notna()).nunique()) for col in sd_sketch.SKETCH_COLUMNS}
+
+    parts = [_day_sketches(day) for day in _days_in_range(manifest(), start, end)]
+    parts = [part for part in parts if part is not None]
+    if not parts:
+        return {col: 0 for col in sd_sketch.SKETCH_COLUMNS}
+    sketches = pd.concat(parts, ignore_index=True)
+    if sites:
+        sketches = sketches[sketches['Site'].isin(sites)]
+    if hours:
+        sketches = sketches[sketches['hour'].isin([int(h) for h in hours])]
+    return {
+        col: sd_sketch.merge_bytes(sketches.loc[sketches['column'] == col, 'registers']).estimate()
+        for col in sd_sketch.SKETCH_COLUMNS
+    }
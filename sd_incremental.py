@@ -0,0 +1,167 @@
+import math
+from collections import Counter
+from dataclasses import astuple
+
+import numpy as np
+import pandas as pd
+
+import sd_kpi
+from sd_schema import SLA_ORDER
+
+# --- คอลัมน์ที่เก็บไว้ต่อ 1 Order (ใช้ตรวจว่า Order มีการเปลี่ยนสถานะ/SLA หรือไม่) ---
+TRACKED_COLUMNS = ['Net Order Value', 'Status', 'Rider Name', 'Payment Code', 'Hours', 'SLA STS']
+
+
+def _same(a, b):
+    # เทียบค่าทีละแถว โดยถือว่า NaN == NaN
+    return (a == b) | (a.isna() & b.isna())
+
+
+class IntradayState:
+    # สถานะสะสมของทั้งวัน: ไฟล์ที่อัปโหลดซ้ำ/ไฟล์ delta จะอัปเดตเฉพาะ Order ที่เปลี่ยน
+    # หมายเหตุ: โหมดนี้นับที่ระดับ Order (1 Order ID = 1 แถว ใช้แถวล่าสุด)
+
+    def __init__(self):
+        self.orders = pd.DataFrame(columns=TRACKED_COLUMNS, index=pd.Index([], name='Order ID'))
+        self.status_counts = Counter()
+        self.rider_counts_all = Counter()
+        self.rider_counts_non_cancel = Counter()
+        self.payment_counts = Counter()
+        self.sla_counts = Counter()
+        self.hour_sla_counts = Counter()
+        self.total_value = 0.0
+        self.non_cancel_orders = 0
+        self.over_sla_orders = 0
+        self.uploads = 0
+        # คอลัมน์ที่เคยพบในไฟล์ที่อัปโหลด (ไฟล์ที่ไม่มี Hours/SLA STS ไม่มีกราฟนั้น เหมือนการโหลดทั้งไฟล์)
+        self.columns = set()
+
+    def _apply_counts(self, rows, sign):
+        # บวก/ลบ ผลของกลุ่ม Order ออกจากตัวนับ (sign = +1 หรือ -1)
+        if rows.empty:
+            return
+        non_cancel = rows['Status'] != sd_kpi.STATUS_CANCEL
+        self.total_value += sign * float(rows['Net Order Value'].sum())
+        self.non_cancel_orders += sign * int(non_cancel.sum())
+        self.over_sla_orders += sign * int((non_cancel & (rows['SLA STS'] == sd_kpi.SLA_OVER)).sum())
+        for counter, values in (
+            (self.status_counts, rows['Status']),
+            (self.rider_counts_all, rows['Rider Name']),
+            (self.rider_counts_non_cancel, rows.loc[non_cancel, 'Rider Name']),
+            (self.payment_counts, rows['Payment Code']),
+            (self.sla_counts, rows['SLA STS']),
+        ):
+            for key, count in values.value_counts().items():
+                counter[key] += sign * int(count)
+        hour_sla = rows.groupby(['Hours', 'SLA STS']).size()
+        for key, count in hour_sla.items():
+            self.hour_sla_counts[key] += sign * int(count)
+
+    def apply(self, df):
+        # รับไฟล์ใหม่ (ทั้งวันหรือ delta) แล้วอัปเดตเฉพาะ Order ที่ใหม่/เปลี่ยน คืนค่าจำนวน Order ที่อัปเดต
+        self.columns.update(col for col in TRACKED_COLUMNS if col in df.columns)
+        incoming = df.drop_duplicates('Order ID', keep='last').set_index('Order ID')
+        incoming = incoming.reindex(columns=TRACKED_COLUMNS).astype(object)
+        incoming = incoming.where(incoming.notna(), np.nan)
+        self.uploads += 1
+
+        known = incoming.index.isin(self.orders.index)
+        new_rows = incoming[~known]
+        existing = incoming[known]
+        old_rows = self.orders.loc[existing.index]
+        unchanged = np.logical_and.reduce(
+            [_same(existing[col], old_rows[col]).to_numpy() for col in TRACKED_COLUMNS]
+        ) if len(existing) else np.zeros(0, dtype=bool)
+        changed_new = existing[~unchanged]
+        changed_old = old_rows[~unchanged]
+
+        self._apply_counts(changed_old, -1)
+        self._apply_counts(changed_new, +1)
+        self._apply_counts(new_rows, +1)
+
+        if len(changed_new):
+            self.orders.loc[changed_new.index] = changed_new
+        if len(new_rows):
+            self.orders = pd.concat([self.orders, new_rows]) if len(self.orders) else new_rows.copy()
+        return len(changed_new) + len(new_rows)
+
+    def kpis(self):
+        total_orders = len(self.orders)
+        total_complete = self.status_counts[sd_kpi.STATUS_COMPLETE]
+        return sd_kpi.KPIResult(
+            total_orders=total_orders,
+            total_value=self.total_value,
+            total_complete=total_complete,
+            total_on_process=total_orders - total_complete,
+            total_unsuccessful=self.status_counts[sd_kpi.STATUS_UNSUCCESSFUL],
+            total_riders=sum(1 for rider, count in self.rider_counts_all.items() if count > 0 and pd.notna(rider)),
+            non_cancel_orders=self.non_cancel_orders,
+            over_sla_orders=self.over_sla_orders,
+            over_sla_rate=(self.over_sla_orders / self.non_cancel_orders) * 100 if self.non_cancel_orders > 0 else 0.0,
+        )
+
+    def rider_counts(self):
+        # รูปแบบเดียวกับ rider_order_counts ใน Dashboard (ไม่รวม CANCEL, เรียงมากไปน้อย)
+        rows = [(rider, count) for rider, count in self.rider_counts_non_cancel.items() if count > 0 and pd.notna(rider)]
+        counts = pd.DataFrame(rows, columns=['Rider Name', 'Total Orders'])
+        return counts.sort_values(by=['Total Orders', 'Rider Name'], ascending=[False, True]).reset_index(drop=True)
+
+    def payments(self):
+        # รูปแบบเดียวกับ payment_counts ใน Dashboard (Payment Code, Count)
+        rows = [(code, count) for code, count in self.payment_counts.items() if count > 0]
+        counts = pd.DataFrame(rows, columns=['Payment Code', 'Count'])
+        return counts.sort_values(by=['Count', 'Payment Code'], ascending=[False, True]).reset_index(drop=True)
+
+    def sla_totals(self):
+        # จำนวน Order ต่อ SLA STS (นับแยกจากตาราง ชั่วโมง x SLA จึงรวม Order ที่ไม่มี Hours ด้วย) None ถ้าไม่มีคอลัมน์ SLA STS
+        if 'SLA STS' not in self.columns:
+            return None
+        slas = SLA_ORDER + sorted(set(self.sla_counts) - set(SLA_ORDER))
+        return pd.Series([self.sla_counts[sla] for sla in slas], index=slas, name='count').loc[lambda s: s > 0]
+
+    def hourly(self):
+        # รูปแบบเดียวกับ df_hourly ใน Dashboard (Hours, SLA STS, Count) None ถ้าไม่มีคอลัมน์ Hours หรือ SLA STS
+        if not {'Hours', 'SLA STS'} <= self.columns:
+            return None
+        rows = [(hour, sla, count) for (hour, sla), count in self.hour_sla_counts.items() if count > 0]
+        hourly = pd.DataFrame(rows, columns=['Hours', 'SLA STS', 'Count'])
+        hours = sorted(hourly['Hours'].unique(), key=lambda h: (not str(h).isdigit(), int(h) if str(h).isdigit() else 0, str(h)))
+        slas = SLA_ORDER + sorted(set(hourly['SLA STS']) - set(SLA_ORDER))
+        hourly['Hours'] = pd.Categorical(hourly['Hours'], categories=hours, ordered=True)
+        hourly['SLA STS'] = pd.Categorical(hourly['SLA STS'], categories=slas, ordered=True)
+        return hourly.sort_values(['Hours', 'SLA STS']).reset_index(drop=True)
+
+    def verify(self):
+        # ทางตรวจสอบ: คำนวณใหม่จาก Order ที่เก็บไว้ด้วยทางอื่น (sd_kpi.compute_kpis + groupby ธรรมดา) แล้วเทียบกับตัวนับสะสม
+        # คืนค่ารายชื่อส่วนที่ไม่ตรงกัน (list ว่าง = ตรงทั้งหมด)
+        orders = self.orders.reset_index().astype({'Net Order Value': 'float64'})
+        non_cancel = orders[orders['Status'] != sd_kpi.STATUS_CANCEL]
+        has_sla = 'SLA STS' in self.columns
+        has_hourly = has_sla and 'Hours' in self.columns
+        expected = {
+            'kpis': astuple(sd_kpi.compute_kpis(orders)),
+            'rider_counts': non_cancel['Rider Name'].value_counts().to_dict(),
+            'payments': orders['Payment Code'].value_counts().to_dict(),
+            'sla_totals': orders['SLA STS'].value_counts().to_dict() if has_sla else None,
+            'hourly': orders.groupby(['Hours', 'SLA STS']).size().to_dict() if has_hourly else None,
+        }
+        rider_counts = self.rider_counts()
+        payments = self.payments()
+        sla_totals = self.sla_totals()
+        hourly = self.hourly()
+        actual = {
+            'kpis': astuple(self.kpis()),
+            'rider_counts': dict(zip(rider_counts['Rider Name'], rider_counts['Total Orders'])),
+            'payments': dict(zip(payments['Payment Code'], payments['Count'])),
+            'sla_totals': sla_totals.to_dict() if sla_totals is not None else None,
+            'hourly': dict(zip(zip(hourly['Hours'], hourly['SLA STS']), hourly['Count'])) if hourly is not None else None,
+        }
+        mismatches = []
+        for name, values in expected.items():
+            if name == 'kpis':
+                same = all(math.isclose(a, b, abs_tol=1e-6) for a, b in zip(values, actual[name]))
+            else:
+                same = values == actual[name]
+            if not same:
+                mismatches.append(name)
+        return mismatches
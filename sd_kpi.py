@@ -0,0 +1,99 @@
+import math
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+STATUS_COMPLETE = 'COMPLETE'
+STATUS_UNSUCCESSFUL = 'UNSUCCESSFUL ON DEMAND DELIVERY'
+STATUS_CANCEL = 'CANCEL'
+SLA_OVER = 'Over SLA'
+
+
+# --- ผลลัพธ์ KPI (แก้ไขไม่ได้ ใช้แสดงผลได้ทั้งสอง Dashboard) ---
+@dataclass(frozen=True)
+class KPIResult:
+    total_orders: int
+    total_value: float
+    total_complete: int
+    total_on_process: int
+    total_unsuccessful: int
+    total_riders: int
+    non_cancel_orders: int
+    over_sla_orders: int
+    over_sla_rate: float
+
+
+def kpi_tiles(kpis):
+    # KPI แถวบนของ sd_dashboard_pic_robot.py เป็น (ชื่อ, ค่าที่จัดรูปแบบแล้ว) ตามลำดับที่แสดง ใช้ร่วมกับหน้า HTML ของ sd_publish
+    return [
+        ("Total Order", f"{kpis.total_orders:,}"),
+        ("Total Complete", f"{kpis.total_complete:,}"),
+        ("On Process", f"{kpis.total_on_process:,}"),
+        ("Total Cancel", f"{kpis.total_unsuccessful:,}"),
+        ("Total Rider", f"{kpis.total_riders:,}"),
+        ("Total Value", f"{math.ceil(kpis.total_value):,}"),  # 💥 ปัด Total Value ขึ้น
+    ]
+
+
+def _codes(series):
+    # แปลงคอลัมน์เป็นรหัสตัวเลข (ค่าว่าง = -1) พร้อมรายการค่าที่ไม่ซ้ำ
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), list(series.cat.categories)
+    codes, uniques = pd.factorize(series)
+    return codes, list(uniques)
+
+
+def _code_of(uniques, value):
+    try:
+        return uniques.index(value)
+    except ValueError:
+        return -2  # ไม่มีค่านี้ในไฟล์ (ไม่ตรงกับรหัสใดเลย)
+
+
+def _distinct(codes, n_uniques, mask=None):
+    # นับจำนวนค่าที่ไม่ซ้ำจากรหัส ด้วย bincount แทน nunique()
+    if mask is not None:
+        codes = codes[mask]
+    codes = codes[codes >= 0]
+    if n_uniques == 0 or codes.size == 0:
+        return 0
+    return int(np.count_nonzero(np.bincount(codes, minlength=n_uniques)))
+
+
+def compute_kpis(df):
+    # คำนวณ KPI ทั้งหมดจากรหัส categorical ในรอบเดียว แทนการกรอง DataFrame ทีละตัวชี้วัด
+    order_codes, orders = _codes(df['Order ID'])
+    status_codes, statuses = _codes(df['Status'])
+    rider_codes, riders = _codes(df['Rider Name'])
+
+    status_counts = np.bincount(status_codes + 1, minlength=len(statuses) + 1)[1:]
+    total_complete = int(status_counts[statuses.index(STATUS_COMPLETE)]) if STATUS_COMPLETE in statuses else 0
+    total_unsuccessful = int(status_counts[statuses.index(STATUS_UNSUCCESSFUL)]) if STATUS_UNSUCCESSFUL in statuses else 0
+
+    total_orders = _distinct(order_codes, len(orders))
+    total_value = float(df['Net Order Value'].sum())
+
+    # Order ที่ไม่ใช่ CANCEL และ Over SLA ในกลุ่มนั้น
+    non_cancel = status_codes != _code_of(statuses, STATUS_CANCEL)
+    non_cancel_orders = _distinct(order_codes, len(orders), non_cancel)
+    if 'SLA STS' in df.columns:
+        sla_codes, slas = _codes(df['SLA STS'])
+        over_sla = non_cancel & (sla_codes == _code_of(slas, SLA_OVER))
+        over_sla_orders = _distinct(order_codes, len(orders), over_sla)
+    else:
+        over_sla_orders = 0
+
+    over_sla_rate = (over_sla_orders / non_cancel_orders) * 100 if non_cancel_orders > 0 else 0.0
+
+    return KPIResult(
+        total_orders=total_orders,
+        total_value=total_value,
+        total_complete=total_complete,
+        total_on_process=total_orders - total_complete,
+        total_unsuccessful=total_unsuccessful,
+        total_riders=_distinct(rider_codes, len(riders)),
+        non_cancel_orders=non_cancel_orders,
+        over_sla_orders=over_sla_orders,
+        over_sla_rate=over_sla_rate,
+    )
@@ -0,0 +1,139 @@
+import datetime
+import io
+import os
+import threading
+
+import sd_cache
+import sd_history
+
+# --- โฟลเดอร์ที่ระบบ export วางไฟล์ไว้ (Live mode จะดูไฟล์ล่าสุดในโฟลเดอร์นี้) ---
+DROP_DIR = os.environ.get('SD_DROP_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'drop'))
+# --- ความถี่ในการเช็คไฟล์และ rerun ส่วนของ Dashboard (วินาที) ---
+REFRESH_SECONDS = int(os.environ.get('SD_REFRESH_SECONDS', '60'))
+
+# --- Live mode ของ Dashboard บันทึกไฟล์ใหม่ที่เข้ามาในโฟลเดอร์ drop เข้าที่เก็บประวัติ (sd_history) อัตโนมัติ ---
+# (เฉพาะที่เรียก DropFolderWatcher.ingest_history() เอง poll() ของ pre-warm/sd_publish ไม่เขียนประวัติ)
+HISTORY_INGEST = os.environ.get('SD_HISTORY_INGEST', '1') == '1'
+
+EXPORT_EXTENSIONS = ('.xlsx', '.xls', '.xlsb')
+
+
+def latest_export(folder):
+    # หาไฟล์ export ที่แก้ไขล่าสุดในโฟลเดอร์ (ข้ามไฟล์ชั่วคราวของ Excel ที่ขึ้นต้นด้วย ~$)
+    if not os.path.isdir(folder):
+        return None
+    candidates = []
+    for entry in os.scandir(folder):
+        if entry.is_file() and entry.name.lower().endswith(EXPORT_EXTENSIONS) and not entry.name.startswith('~$'):
+            candidates.append((entry.stat().st_mtime_ns, entry.path))
+    return max(candidates)[1] if candidates else None
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+def read_export(path):
+    # อ่านไฟล์จากดิสก์ให้อยู่ในรูปเดียวกับ UploadedFile (มี .name และ .getvalue())
+    with open(path, 'rb') as f:
+        data = io.BytesIO(f.read())
+    data.name = os.path.basename(path)
+    return data
+
+
+class DropFolderWatcher:
+    # เฝ้าดูโฟลเดอร์ drop: โหลดใหม่เฉพาะเมื่อ mtime/ขนาดไฟล์เปลี่ยน และเนื้อไฟล์ (hash) เปลี่ยนจริง
+    # ใช้ร่วมกันได้หลาย session (มี lock กันการโหลดซ้อน)
+    # ไม่ถือ DataFrame ไว้เอง เก็บแค่ key ของชุดล่าสุด แล้วดึงจาก sd_store (หรือ cache บนดิสก์) ทุกครั้งที่ poll
+
+    def __init__(self, folder=DROP_DIR):
+        self.folder = folder
+        self.signature = None
+        self.key = None
+        self.path = None
+        self.attrs = {}
+        self.version = 0
+        self.error = None
+        self.ingested_version = 0
+        self.history_error = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        # ชุดข้อมูลล่าสุดที่โหลดไว้ (None ถ้ายังไม่เคยโหลด หรือถูกเอาออกทั้งจากหน่วยความจำและดิสก์แล้ว)
+        if self.key is None:
+            return None
+        df = sd_cache.cached_orders(self.key)
+        if df is not None:
+            df.attrs.update(self.attrs)
+        return df
+
+    def poll(self):
+        # คืนค่า DataFrame ล่าสุด (เช็คแค่ stat ของไฟล์ ถ้าไม่เปลี่ยนจะไม่อ่านไฟล์เลย)
+        path = latest_export(self.folder)
+        if path is None:
+            return self.current()
+        try:
+            signature = file_signature(path)
+        except FileNotFoundError:
+            return self.current()
+        if signature == self.signature:
+            df = self.current()
+            if df is not None:
+                return df
+
+        with self._lock:
+            if signature == self.signature:
+                df = self.current()
+                if df is not None:
+                    return df
+            try:
+                # ไฟล์ใหม่ หรือชุดเดิมถูกเอาออกจาก cache ทั้งสองที่แล้ว (อ่านไฟล์ใหม่ แต่ version ไม่เปลี่ยนถ้าเนื้อไฟล์เดิม)
+                data = read_export(path)
+                key = sd_cache.content_hash(data.getvalue())
+                df = sd_cache.load_orders(data, key=key)
+                if key != self.key:
+                    self.attrs = dict(df.attrs)
+                    self.key = key
+                    self.path = path
+                    self.version += 1
+                df.attrs.update(self.attrs)
+                self.signature = signature
+                self.error = None
+                return df
+            except Exception as e:
+                # ไฟล์อาจยังเขียนไม่เสร็จ เก็บ error ไว้แล้วลองใหม่รอบถัดไป (ข้อมูลเดิมยังแสดงอยู่)
+                self.error = e
+        return self.current()
+
+    def ingest_history(self):
+        # บันทึกชุดข้อมูลล่าสุดเข้าที่เก็บประวัติ ครั้งเดียวต่อเวอร์ชัน คืนค่า error ของการบันทึกครั้งล่าสุด (None = สำเร็จ)
+        with self._lock:
+            if self.key is None or self.ingested_version == self.version:
+                return self.history_error
+            df = self.current()
+            if df is None:
+                return self.history_error
+            # วันที่ของไฟล์เอาจากชื่อไฟล์ ถ้าไม่มีใช้วันที่แก้ไขไฟล์ล่าสุด
+            day = sd_history.export_date(self.path, datetime.date.fromtimestamp(self.signature[1] / 1e9))
+            try:
+                sd_history.ingest(df, day, source_key=self.key)
+                self.history_error = None
+            except Exception as e:
+                # บันทึกประวัติไม่สำเร็จไม่ควรทำให้หน้า Live ไม่อัปเดต (แสดงเป็น error แทน)
+                self.history_error = e
+            self.ingested_version = self.version
+            return self.history_error
+
+
+# --- ตัวเฝ้าโฟลเดอร์ 1 ตัวต่อ 1 โฟลเดอร์ทั้ง process (ใช้ร่วมกันระหว่าง session และการ pre-warm ตอนเริ่ม server) ---
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+
+def get_watcher(folder=DROP_DIR):
+    with _watchers_lock:
+        watcher = _watchers.get(folder)
+        if watcher is None:
+            watcher = _watchers[folder] = DropFolderWatcher(folder)
+        return watcher
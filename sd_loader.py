@@ -0,0 +1,243 @@
+import importlib.util
+import io
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+import sd_schema
+import sd_sla
+
+# --- คอลัมน์ที่ Dashboard ใช้จริง (อ่านเฉพาะคอลัมน์เหล่านี้) ---
+REQUIRED_COLUMNS = [
+    'Order ID',
+    'Net Order Value',
+    'Status',
+    'Rider Name',
+    'Payment Code',
+    'Hours',
+    'SLA STS',
+]
+# --- ไฟล์ที่มีเวลาดิบ (sd_sla.TIME_COLUMNS) ไม่ต้องมี Hours/SLA STS: คำนวณจากเวลาตอนโหลด ---
+DERIVED_COLUMNS = ['Hours', 'SLA STS']
+
+# --- กำหนด dtype ล่วงหน้า เพื่อไม่ให้ pandas ต้องเดาชนิดข้อมูลเอง ---
+# 'Hours' ปล่อยให้ reader ตัดสินใจ เพราะบางไฟล์เป็นตัวเลข บางไฟล์เป็นข้อความ
+COLUMN_DTYPES = {
+    'Order ID': str,
+    'Net Order Value': 'float64',
+    'Status': str,
+    'Rider Name': str,
+    'Payment Code': str,
+    'SLA STS': str,
+}
+
+# --- สถิติเวลาในการอ่านไฟล์ แยกตาม engine (สะสมตลอดอายุของ process) ---
+PARSE_STATS = {}
+
+# --- รูปแบบวันที่ในชื่อไฟล์ export เช่น SD_2024-05-31.xlsx, SD_20240531.xlsb, SD_31-05-2024.xlsx ---
+DATE_PATTERNS = [
+    (re.compile(r'(20\d{2})[-_.]?(\d{2})[-_.]?(\d{2})'), ('year', 'month', 'day')),
+    (re.compile(r'(\d{2})[-_.](\d{2})[-_.](20\d{2})'), ('day', 'month', 'year')),
+]
+
+# --- จำนวน process ที่ใช้อ่านหลายไฟล์/หลาย sheet พร้อมกัน (ค่าเริ่มต้น = จำนวน core, 1 = อ่านใน process นี้) ---
+LOAD_WORKERS = int(os.environ.get('SD_LOAD_WORKERS', '0')) or os.cpu_count() or 1
+
+
+# --- ชื่อ module ที่แต่ละ engine ของ pandas ต้องใช้ ---
+ENGINE_MODULES = {
+    'pyxlsb': 'pyxlsb',
+    'calamine': 'python_calamine',
+    'openpyxl': 'openpyxl',
+}
+
+
+def _has_module(name):
+    return importlib.util.find_spec(name) is not None
+
+
+def _file_name(source):
+    # รองรับทั้ง path (str) และ UploadedFile ของ Streamlit (มี .name)
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    return getattr(source, 'name', '') or ''
+
+
+def engine_chain(file_name):
+    # ลำดับ reader ที่จะลองใช้ตามนามสกุลไฟล์ (ตัวแรกเร็วที่สุด ตัวท้ายคือตัวสำรอง)
+    ext = os.path.splitext(file_name)[1].lower()
+    if ext == '.xlsb':
+        chain = ['pyxlsb', 'calamine']
+    else:
+        chain = ['calamine', 'openpyxl']
+    installed = [e for e in chain if _has_module(ENGINE_MODULES[e])]
+    return installed or chain[-1:]
+
+
+def _record(engine, seconds, rows):
+    stats = PARSE_STATS.setdefault(engine, {'count': 0, 'seconds': 0.0, 'rows': 0, 'last': 0.0})
+    stats['count'] += 1
+    stats['seconds'] += seconds
+    stats['rows'] += rows
+    stats['last'] = seconds
+
+
+def read_orders(source, engine=None, sheet_name=0):
+    # อ่านไฟล์ Excel เฉพาะคอลัมน์ที่ใช้ พร้อมจับเวลา
+    # ถ้า engine ที่เร็วกว่าใช้ไม่ได้ (ไม่ได้ติดตั้ง/อ่านไม่ได้) จะถอยไปใช้ตัวถัดไปใน engine_chain
+    candidates = [engine] if engine else engine_chain(_file_name(source))
+
+    last_error = None
+    for candidate in candidates:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        start = time.perf_counter()
+        try:
+            df = pd.read_excel(
+                source,
+                sheet_name=sheet_name,
+                engine=candidate,
+                usecols=lambda col: col in REQUIRED_COLUMNS or col in sd_sla.TIME_COLUMNS,
+                dtype=COLUMN_DTYPES,
+            )
+        except Exception as e:
+            last_error = e
+            continue
+        seconds = time.perf_counter() - start
+        _record(candidate, seconds, len(df))
+        df.attrs['parse'] = {'engine': candidate, 'seconds': seconds, 'rows': len(df)}
+        return df
+
+    raise last_error
+
+
+def parse_summary():
+    # สรุปเวลาเฉลี่ยต่อ engine สำหรับแสดงผล/เปรียบเทียบ
+    rows = []
+    for engine, stats in PARSE_STATS.items():
+        rows.append({
+            'engine': engine,
+            'files': stats['count'],
+            'rows': stats['rows'],
+            'avg_seconds': stats['seconds'] / stats['count'],
+            'last_seconds': stats['last'],
+        })
+    return pd.DataFrame(rows, columns=['engine', 'files', 'rows', 'avg_seconds', 'last_seconds'])
+
+
+def site_name(file_name):
+    # ชื่อสาขาจากชื่อไฟล์ export (ตัดนามสกุลและวันที่ออก) เช่น MFC_Bangna_2024-05-31.xlsx -> MFC_Bangna
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    site = stem
+    for pattern, _ in DATE_PATTERNS:
+        site = pattern.sub('', site)
+    return site.strip(' _-.') or stem
+
+
+def named_buffer(data, name):
+    # bytes ของไฟล์ในรูปเดียวกับ UploadedFile (มี .name ให้เลือก engine ตามนามสกุลได้)
+    buffer = io.BytesIO(data)
+    buffer.name = name
+    return buffer
+
+
+def sheet_names(source):
+    candidates = engine_chain(_file_name(source))
+    last_error = None
+    for candidate in candidates:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        try:
+            with pd.ExcelFile(source, engine=candidate) as book:
+                return list(book.sheet_names)
+        except Exception as e:
+            last_error = e
+    raise last_error
+
+
+def _parse_sheet(task):
+    # งาน 1 ชิ้นของ process pool = 1 sheet คืนค่า DataFrame ที่ normalize แล้ว
+    # หรือ None ถ้า sheet นี้ไม่ใช่ข้อมูล Order (เช่น sheet สรุป/pivot ที่ไม่มีคอลัมน์ Order ID)
+    data, name, sheet = task
+    df = read_orders(named_buffer(data, name), sheet_name=sheet)
+    if 'Order ID' not in df.columns:
+        return None
+    df = sd_schema.normalize_orders(sd_sla.derive(df))
+    df.attrs['parse']['sheet'] = sheet
+    return df
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    # pool เดียวใช้ตลอดอายุ process (spawn ครั้งแรกต้อง import pandas ใน process ลูก จึงไม่สร้างใหม่ทุกครั้ง)
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=LOAD_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def parse_sheets(tasks):
+    # อ่านหลาย sheet (tasks = list ของ (bytes, ชื่อไฟล์, ชื่อ sheet)) พร้อมกันใน process pool
+    # คืนค่า list ของผลลัพธ์ตามลำดับ tasks
+    if LOAD_WORKERS <= 1 or len(tasks) <= 1:
+        results = [_parse_sheet(task) for task in tasks]
+    else:
+        try:
+            results = list(_get_pool().map(_parse_sheet, tasks))
+        except BrokenProcessPool:
+            # process ลูกตาย (เช่น หน่วยความจำไม่พอ) อ่านใน process นี้แทน
+            _reset_pool()
+            return [_parse_sheet(task) for task in tasks]
+        # สถิติของ process ลูกไม่กลับมาเอง บันทึกจาก attrs ของผลลัพธ์แทน
+        for df in results:
+            if df is not None:
+                info = df.attrs['parse']
+                _record(info['engine'], info['seconds'], info['rows'])
+    return results
+
+
+def read_workbooks(files):
+    # อ่านทุก sheet ที่มีข้อมูล Order ของทุกไฟล์ (files = list ของ (ชื่อไฟล์, bytes))
+    # แต่ละ sheet เป็นงาน 1 ชิ้นใน process pool คืนค่า DataFrame ที่ normalize แล้ว 1 ชุดต่อไฟล์
+    tasks = [(i, (data, name, sheet)) for i, (name, data) in enumerate(files) for sheet in sheet_names(named_buffer(data, name))]
+    results = parse_sheets([task for _, task in tasks])
+
+    per_file = [[] for _ in files]
+    for (i, _), df in zip(tasks, results):
+        if df is not None:
+            per_file[i].append(df)
+
+    frames = []
+    for (name, _), parts in zip(files, per_file):
+        if not parts:
+            raise ValueError(f"ไม่พบคอลัมน์ Order ID ในไฟล์ {name}")
+        if len(parts) == 1:
+            frames.append(parts[0])
+            continue
+        df = sd_schema.concat_orders(parts)
+        df.attrs['parse'] = {
+            'engine': '/'.join(sorted({part.attrs['parse']['engine'] for part in parts})),
+            'seconds': sum(part.attrs['parse']['seconds'] for part in parts),
+            'rows': len(df),
+            'sheets': len(parts),
+        }
+        frames.append(df)
+    return frames
@@ -0,0 +1,397 @@
+import argparse
+import asyncio
+import http.server
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+import numpy as np
+
+import sd_synth
+
+# --- จำลองผู้ชมหลายคนพร้อมกันบน streamlit server จริง (client แบบ headless ผ่าน websocket เดียวกับ browser) ---
+# แต่ละ session อัปโหลดไฟล์ export -> รอจนหน้ามีข้อมูล -> rerun ต่อเนื่อง แล้ววัดเวลา rerun + CPU/RSS ของ server
+# ตัวอย่าง: python sd_loadtest.py --rows 10000 100000 --sessions 1 2 4 8 --reruns 10 --out load.json
+# รูปภาพของ Dashboard มาจาก server จำลองในเครื่อง (ไม่ต้องต่อ internet) cache/ประวัติ/log ใช้โฟลเดอร์ชั่วคราว
+
+APPS = ['sd_dashboard.py', 'sd_dashboard_pic_robot.py']
+# --- เวลาสูงสุดของ rerun 1 ครั้ง / การรอจนหน้ามีข้อมูล / การรอ server เริ่ม (วินาที) ---
+RUN_TIMEOUT_SECONDS = 300
+LOAD_TIMEOUT_SECONDS = 600
+START_TIMEOUT_SECONDS = 60
+# --- ระหว่างรองานโหลดเบื้องหลัง session จะ rerun ทุกกี่วินาที (แทน fragment run_every ของ browser) ---
+LOAD_POLL_SECONDS = 0.2
+# --- ความถี่ในการวัดหน่วยความจำของ server ระหว่างทดสอบ (วินาที) ---
+RSS_SAMPLE_SECONDS = 0.05
+
+
+def _png(width=64, height=64, rgb=(0x1f, 0x77, 0xb4)):
+    # รูป PNG สีเดียว (ไม่ต้องใช้ library รูปภาพ)
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    row = b'\x00' + bytes(rgb) * width
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(row * height))
+            + chunk(b'IEND', b''))
+
+
+class ImageServer:
+    # HTTP server ในเครื่องแทน raw.githubusercontent.com: ตอบรูป PNG เดียวกันทุก path
+
+    def __init__(self):
+        image = _png()
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', str(len(image)))
+                self.end_headers()
+                self.wfile.write(image)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, name='sd-loadtest-images', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def server_env(workdir, image_url):
+    # env ของ streamlit server: cache/รูป/ประวัติ/log แยกโฟลเดอร์ และรูปจาก ImageServer (ค่าที่ตั้งไว้แล้วใน env ใช้ตามเดิม)
+    env = dict(os.environ)
+    for name, folder in (('SD_CACHE_DIR', 'cache'), ('SD_ASSET_DIR', 'assets'), ('SD_HISTORY_DIR', 'history'),
+                         ('SD_DROP_DIR', 'drop'), ('SD_PROFILE_DIR', 'profile')):
+        env.setdefault(name, os.path.join(workdir, folder))
+    env.setdefault('SD_RIDER_IMAGE_URL', f"{image_url}/Rider_pic.png")
+    env.setdefault('SD_ROBOT_IMAGE_URL', f"{image_url}/Robot_pic.png")
+    return env
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class StreamlitServer:
+    # `streamlit run <app>` แบบ headless ใน process แยก + วัด CPU/RSS ของ process นั้นจาก /proc
+
+    def __init__(self, app_path, env, log_path):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._command = [
+            sys.executable, '-m', 'streamlit', 'run', app_path,
+            '--server.headless=true', '--server.address=127.0.0.1', f'--server.port={self.port}',
+            '--server.fileWatcherType=none', '--server.enableXsrfProtection=false', '--browser.gatherUsageStats=false',
+        ]
+        self._env = env
+        self._log_path = log_path
+        self.process = None
+
+    def __enter__(self):
+        import requests
+
+        self._log = open(self._log_path, 'ab')
+        self.process = subprocess.Popen(self._command, env=self._env, stdout=self._log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + START_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"streamlit server หยุดทำงาน (exit {self.process.returncode}) ดู log ที่ {self._log_path}")
+            try:
+                if requests.get(f"{self.url}/_stcore/health", timeout=1).ok:
+                    return self
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError(f"streamlit server ไม่พร้อมใน {START_TIMEOUT_SECONDS} วินาที ดู log ที่ {self._log_path}")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self._log.close()
+
+    def cpu_seconds(self):
+        # เวลา CPU (user + system) ของ server ตั้งแต่เริ่ม คืนค่า None ถ้าไม่มี /proc (เช่น macOS/Windows)
+        try:
+            with open(f"/proc/{self.process.pid}/stat") as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def rss_mb(self):
+        try:
+            with open(f"/proc/{self.process.pid}/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+        except (OSError, ValueError):
+            return None
+
+
+class Session:
+    # ผู้ชม 1 คน: websocket 1 เส้นกับ server ส่ง BackMsg แบบเดียวกับ frontend ของ Streamlit
+
+    def __init__(self, server_url, path):
+        self._ws_url = server_url.replace('http://', 'ws://') + '/_stcore/stream'
+        self._server_url = server_url
+        self._path = path
+        self.session_id = None
+        self.page_hash = ''
+        self.widget_states = None
+        self.uploader_id = None
+        self.errors = []
+
+    async def __aenter__(self):
+        import websockets
+
+        self._ws = await websockets.connect(self._ws_url, subprotocols=['streamlit'], max_size=None)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._ws.close()
+
+    async def _receive(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        return ForwardMsg.FromString(await self._ws.recv())
+
+    async def rerun(self):
+        # rerun ทั้งหน้า 1 ครั้ง คืนค่าชนิด element ที่หน้าแสดง (อ่าน message จนจบ run ที่ไม่ถูกแทรกด้วย st.rerun)
+        from streamlit.proto.Alert_pb2 import Alert
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = BackMsg()
+        msg.rerun_script.query_string = ''
+        msg.rerun_script.page_script_hash = self.page_hash
+        if self.widget_states is not None:
+            msg.rerun_script.widget_states.CopyFrom(self.widget_states)
+        await self._ws.send(msg.SerializeToString())
+
+        elements = {}
+        while True:
+            fwd = await asyncio.wait_for(self._receive(), RUN_TIMEOUT_SECONDS)
+            kind = fwd.WhichOneof('type')
+            if kind == 'new_session':
+                self.session_id = fwd.new_session.initialize.session_id
+                self.page_hash = fwd.new_session.page_script_hash
+                elements = {}
+            elif kind == 'delta' and fwd.delta.WhichOneof('type') == 'new_element':
+                element = fwd.delta.new_element
+                name = element.WhichOneof('type')
+                elements[name] = elements.get(name, 0) + 1
+                if name == 'file_uploader':
+                    self.uploader_id = element.file_uploader.id
+                elif name == 'exception':
+                    self.errors.append(element.exception.message)
+                elif name == 'alert' and element.alert.format == Alert.ERROR:
+                    self.errors.append(element.alert.body)
+            elif kind == 'script_finished' and fwd.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return elements
+
+    async def upload(self):
+        # อัปโหลดไฟล์แบบเดียวกับ st.file_uploader ของ browser: ขอ URL -> PUT ไฟล์ -> ตั้งค่า widget
+        import requests
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.WidgetStates_pb2 import WidgetStates
+
+        name = os.path.basename(self._path)
+        msg = BackMsg()
+        msg.file_urls_request.request_id = 'sd-loadtest'
+        msg.file_urls_request.file_names.append(name)
+        msg.file_urls_request.session_id = self.session_id
+        await self._ws.send(msg.SerializeToString())
+        while True:
+            fwd = await asyncio.wait_for(self._receive(), RUN_TIMEOUT_SECONDS)
+            if fwd.WhichOneof('type') == 'file_urls_response':
+                break
+        if fwd.file_urls_response.error_msg:
+            raise RuntimeError(fwd.file_urls_response.error_msg)
+        urls = fwd.file_urls_response.file_urls[0]
+
+        with open(self._path, 'rb') as f:
+            data = f.read()
+        upload_url = urls.upload_url if urls.upload_url.startswith('http') else self._server_url + urls.upload_url
+        response = await asyncio.to_thread(requests.put, upload_url, files={'file': (name, data)}, timeout=RUN_TIMEOUT_SECONDS)
+        response.raise_for_status()
+
+        states = WidgetStates()
+        state = states.widgets.add()
+        state.id = self.uploader_id
+        info = state.file_uploader_state_value.uploaded_file_info.add()
+        info.name, info.size, info.file_id = name, len(data), urls.file_id
+        info.file_urls.CopyFrom(urls)
+        self.widget_states = states
+
+
+async def _viewer(server_url, path, reruns, interval, result):
+    # session 1 คน: เปิดหน้า -> อัปโหลด -> รองานโหลดเบื้องหลังจนหน้ามี KPI (first load) -> rerun ต่อเนื่อง reruns ครั้ง
+    start = time.perf_counter()
+    async with Session(server_url, path) as session:
+        try:
+            await session.rerun()
+            await session.upload()
+            while 'metric' not in await session.rerun():
+                if session.errors or time.perf_counter() - start > LOAD_TIMEOUT_SECONDS:
+                    raise RuntimeError(session.errors[-1] if session.errors else "หน้าไม่มีข้อมูลภายในเวลาที่กำหนด")
+                await asyncio.sleep(LOAD_POLL_SECONDS)
+            result['first_load'] = time.perf_counter() - start
+
+            latencies = []
+            for _ in range(reruns):
+                if interval:
+                    await asyncio.sleep(interval)
+                run_start = time.perf_counter()
+                await session.rerun()
+                latencies.append(time.perf_counter() - run_start)
+            result['latencies'] = latencies
+        except Exception as e:
+            session.errors.append(f"{type(e).__name__}: {e}")
+        result['errors'] = session.errors
+
+
+async def _run_level(server, path, sessions, reruns, interval):
+    results = [{} for _ in range(sessions)]
+    peak = [server.rss_mb()]
+    done = asyncio.Event()
+
+    async def sample():
+        while not done.is_set():
+            rss = server.rss_mb()
+            if rss is not None and (peak[0] is None or rss > peak[0]):
+                peak[0] = rss
+            await asyncio.sleep(RSS_SAMPLE_SECONDS)
+
+    sampler = asyncio.create_task(sample())
+    await asyncio.gather(*(_viewer(server.url, path, reruns, interval, result) for result in results))
+    done.set()
+    await sampler
+    return results, peak[0]
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if len(values) else None
+
+
+def run_level(server, path, sessions, reruns=10, interval=0.0):
+    # N session พร้อมกันบน server เดียว วัด latency ของ rerun, CPU และ RSS สูงสุดของ server ในระดับนี้
+    cpu_before = server.cpu_seconds()
+    wall_start = time.perf_counter()
+    results, peak_rss = asyncio.run(_run_level(server, path, sessions, reruns, interval))
+    wall = time.perf_counter() - wall_start
+    cpu_after = server.cpu_seconds()
+    cpu = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+
+    latencies = np.array([x for r in results for x in r.get('latencies', [])])
+    first_loads = np.array([r['first_load'] for r in results if 'first_load' in r])
+    errors = [e for r in results for e in r.get('errors', [])]
+    return {
+        'sessions': sessions,
+        'completed_sessions': sum('latencies' in r for r in results),
+        'reruns': int(len(latencies)),
+        'rerun_seconds': {
+            'p50': _percentile(latencies, 50),
+            'p95': _percentile(latencies, 95),
+            'max': float(latencies.max()) if len(latencies) else None,
+        },
+        'first_load_seconds': {
+            'p50': _percentile(first_loads, 50),
+            'max': float(first_loads.max()) if len(first_loads) else None,
+        },
+        'wall_seconds': wall,
+        'cpu_seconds': cpu,
+        # 100% = 1 core เต็ม
+        'cpu_percent': 100 * cpu / wall if cpu is not None and wall else None,
+        'peak_rss_mb': peak_rss,
+        'errors': len(errors),
+        'error_samples': sorted(set(errors))[:5],
+    }
+
+
+def run_loadtest(apps, sizes, levels, reruns=10, interval=0.0, seed=0, workdir=None, files=None, timestamps=False):
+    # server ใหม่ 1 ตัวต่อ (หน้า, ไฟล์) แล้วไล่ระดับจำนวน session จากน้อยไปมาก (ระดับแรกรวมเวลาอ่านไฟล์ครั้งแรกด้วย)
+    import sd_bench
+
+    repo = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp, ImageServer() as images:
+        inputs = [(f, None) for f in (files or [])]
+        for rows in sizes:
+            path = os.path.join(tmp, f"sd_synth_{rows}.xlsx")
+            sd_synth.write_export(sd_synth.generate_orders(rows, seed=seed, timestamps=timestamps), path, 'xlsx')
+            inputs.append((path, rows))
+
+        for i, (path, rows) in enumerate(inputs):
+            for app in apps:
+                server_dir = os.path.join(tmp, f"server-{i}-{os.path.splitext(app)[0]}")
+                os.makedirs(server_dir)
+                with StreamlitServer(os.path.join(repo, app), server_env(server_dir, images.url), os.path.join(server_dir, 'server.log')) as server:
+                    for sessions in levels:
+                        level = run_level(server, path, sessions, reruns, interval)
+                        level.update({
+                            'app': app,
+                            'input': os.path.basename(path) if rows is None else f"synthetic-{rows}.xlsx",
+                            'bytes': os.path.getsize(path),
+                        })
+                        results.append(level)
+                        print(_summary(level), file=sys.stderr)
+    environment = sd_bench._environment()
+    environment['cpus'] = os.cpu_count()
+    return {'environment': environment, 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}
+
+
+def _summary(level):
+    p50, p95 = level['rerun_seconds']['p50'], level['rerun_seconds']['p95']
+    latency = f"p50 {p50:.3f}s p95 {p95:.3f}s" if p50 is not None else "ไม่มี rerun ที่สำเร็จ"
+    cpu = f"{level['cpu_percent']:.0f}%" if level['cpu_percent'] is not None else '-'
+    rss = f"{level['peak_rss_mb']:.0f} MB" if level['peak_rss_mb'] is not None else '-'
+    return f"{level['app']} {level['input']} x{level['sessions']}: {latency}, CPU {cpu}, RSS สูงสุด {rss}, error {level['errors']}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test: ผู้ชมหลายคนพร้อมกันบน SD Dashboard (streamlit server จริง + client แบบ headless)")
+    parser.add_argument('--app', action='append', choices=APPS, help="Dashboard ที่ทดสอบ (ใส่ได้หลายครั้ง ค่าเริ่มต้นทั้งสองหน้า)")
+    parser.add_argument('--rows', type=int, nargs='*', default=[10_000])
+    parser.add_argument('--file', action='append', default=[], help="ไฟล์ export จริงที่ต้องการทดสอบเพิ่ม (ใส่ได้หลายครั้ง)")
+    parser.add_argument('--sessions', type=int, nargs='*', default=[1, 2, 4, 8], help="จำนวน session พร้อมกันในแต่ละระดับ")
+    parser.add_argument('--reruns', type=int, default=10, help="จำนวน rerun ต่อ session หลังหน้ามีข้อมูลแล้ว")
+    parser.add_argument('--interval', type=float, default=0.0, help="เวลารอระหว่าง rerun ของแต่ละ session (วินาที, 0 = ต่อเนื่อง)")
+    parser.add_argument('--timestamps', action='store_true', help="ไฟล์จำลองมีเวลาดิบแทน Hours/SLA STS")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help="เขียนรายงาน JSON ลงไฟล์ (ค่าเริ่มต้นพิมพ์ออกหน้าจอ)")
+    args = parser.parse_args(argv)
+
+    report = run_loadtest(args.app or APPS, args.rows, args.sessions, args.reruns, args.interval, args.seed,
+                          files=args.file, timestamps=args.timestamps)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 1 if any(r['errors'] for r in report['results']) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
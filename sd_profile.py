@@ -0,0 +1,228 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# --- โฟลเดอร์เก็บ log เวลาแต่ละ rerun (ไฟล์ JSONL วันละ 1 ไฟล์) ตั้งเป็นค่าว่างเพื่อปิดการเขียน log ---
+PROFILE_DIR = os.environ.get('SD_PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.sd_cache', 'profile'))
+
+_current = threading.local()
+_write_lock = threading.Lock()
+
+
+def rss_mb():
+    # หน่วยความจำที่ process ใช้อยู่ตอนนี้ (MB) คืนค่า None ถ้าวัดไม่ได้บนเครื่องนี้
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS รายงานเป็น byte ส่วน Linux เป็น KB
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def _session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx else None
+    except ImportError:
+        return None
+
+
+class RerunProfile:
+    # เวลาและหน่วยความจำของแต่ละขั้นใน rerun เดียว (หรือ fragment rerun เดียว)
+
+    def __init__(self, script, fragment=None):
+        self.script = script
+        self.fragment = fragment
+        self.stages = []
+        self.notes = {}
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        rss_before = rss_mb()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            rss_after = rss_mb()
+            self.stages.append({
+                'stage': name,
+                'seconds': time.perf_counter() - start,
+                'rss_mb': rss_after,
+                'rss_delta_mb': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+            })
+
+    def note(self, **fields):
+        # ข้อมูลเพิ่มเติมของ rerun นี้ เช่น load_data มาจาก cache ชั้นไหน จำนวนแถว
+        self.notes.update(fields)
+
+    def totals(self):
+        # รวมเวลาของขั้นที่ชื่อซ้ำกัน (เช่น poll ของหลาย fragment ใน rerun เดียว)
+        totals = {}
+        for s in self.stages:
+            totals[s['stage']] = totals.get(s['stage'], 0.0) + s['seconds']
+        return totals
+
+    def record(self):
+        return {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+            'script': self.script,
+            'fragment': self.fragment,
+            'session': _session_id(),
+            'seconds': time.perf_counter() - self._start,
+            'stages': {name: round(seconds, 6) for name, seconds in self.totals().items()},
+            'rss_mb': rss_mb(),
+            'peak_rss_mb': peak_rss_mb(),
+            **self.notes,
+        }
+
+    def write_log(self, record=None):
+        if not PROFILE_DIR:
+            return None
+        record = record or self.record()
+        path = os.path.join(PROFILE_DIR, f"profile-{record['ts'][:10]}.jsonl")
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            with _write_lock, open(path, 'a', encoding='utf-8') as f:
+                f.write(line)
+        except OSError:
+            # เขียน log ไม่ได้ (ดิสก์เต็ม/ไม่มีสิทธิ์) ไม่ควรทำให้หน้า Dashboard พัง
+            return None
+        return path
+
+    def render_panel(self, container, record):
+        import pandas as pd
+
+        panel = container.expander("⏱️ เวลาแต่ละขั้น (rerun นี้)", expanded=True)
+        table = pd.DataFrame(self.stages, columns=['stage', 'seconds', 'rss_mb', 'rss_delta_mb'])
+        panel.dataframe(table.round(4), hide_index=True, use_container_width=True)
+        memory = f"{record['rss_mb']:,.0f} MB" if record['rss_mb'] is not None else "ไม่ทราบ"
+        peak = f"{record['peak_rss_mb']:,.0f} MB" if record['peak_rss_mb'] is not None else "ไม่ทราบ"
+        panel.caption(f"รวม {record['seconds']:.3f} วินาที / หน่วยความจำ {memory} (สูงสุด {peak})")
+        for name, value in self.notes.items():
+            panel.caption(f"{name}: {value}")
+
+
+def start(script):
+    # เริ่มจับเวลา rerun ใหม่ของ script นี้ (เรียกบรรทัดแรก ๆ ของ script)
+    profile = RerunProfile(script)
+    _current.profile = profile
+    return profile
+
+
+def current():
+    return getattr(_current, 'profile', None)
+
+
+@contextmanager
+def stage(name):
+    # จับเวลาขั้นนี้ใน rerun ปัจจุบัน ถ้าไม่มี rerun ที่กำลังจับเวลาอยู่จะไม่ทำอะไร
+    profile = current()
+    if profile is None:
+        yield
+        return
+    with profile.stage(name):
+        yield
+
+
+def note(**fields):
+    profile = current()
+    if profile is not None:
+        profile.note(**fields)
+
+
+def finish(panel=None):
+    # จบ rerun: เขียน log 1 บรรทัด และแสดงตารางใน panel (เช่น st.sidebar) ถ้าส่งมา
+    profile = current()
+    if profile is None:
+        return None
+    _current.profile = None
+    record = profile.record()
+    profile.write_log(record)
+    if panel is not None:
+        profile.render_panel(panel, record)
+    return record
+
+
+@contextmanager
+def fragment(script, name):
+    # fragment ที่ rerun เอง (run_every) ไม่ได้รันโค้ดส่วนบนของ script จึงต้องจับเวลาแยกเป็น rerun ของตัวเอง
+    # ถ้าถูกเรียกระหว่าง rerun ทั้งหน้า จะนับเป็นขั้นหนึ่งของ rerun นั้นแทน
+    if current() is not None:
+        with stage(f"fragment:{name}"):
+            yield
+        return
+    profile = RerunProfile(script, fragment=name)
+    _current.profile = profile
+    try:
+        yield
+    finally:
+        if _current.profile is profile:
+            _current.profile = None
+            profile.write_log()
+
+
+def summarize(paths):
+    # รวม log หลายบรรทัดเป็นสถิติต่อขั้น (จำนวนครั้ง, p50, p95, max วินาที)
+    samples = {}
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                prefix = f"{record['script']}/{record['fragment']}" if record.get('fragment') else record['script']
+                samples.setdefault((prefix, 'total'), []).append(record['seconds'])
+                for name, seconds in record['stages'].items():
+                    samples.setdefault((prefix, name), []).append(seconds)
+    rows = []
+    for (script, name), values in sorted(samples.items()):
+        values.sort()
+        rows.append({
+            'script': script,
+            'stage': name,
+            'count': len(values),
+            'p50': statistics.median(values),
+            'p95': values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))],
+            'max': values[-1],
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="สรุปเวลาแต่ละขั้นจาก log ของ Dashboard")
+    parser.add_argument('paths', nargs='*', help=f"ไฟล์ JSONL (ค่าเริ่มต้น: log ของวันนี้ใน {PROFILE_DIR})")
+    args = parser.parse_args(argv)
+
+    paths = args.paths or [os.path.join(PROFILE_DIR, f"profile-{time.strftime('%Y-%m-%d')}.jsonl")]
+    rows = summarize(paths)
+    print(f"{'script':<40} {'stage':<28} {'count':>6} {'p50':>9} {'p95':>9} {'max':>9}")
+    for row in rows:
+        print(f"{row['script']:<40} {row['stage']:<28} {row['count']:>6} {row['p50']:>9.4f} {row['p95']:>9.4f} {row['max']:>9.4f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
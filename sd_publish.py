@@ -0,0 +1,192 @@
+import argparse
+import dataclasses
+import datetime
+import html
+import json
+import os
+import sys
+import tempfile
+import time
+
+import sd_assets
+import sd_cache
+import sd_kpi
+import sd_live
+import sd_snapshot
+
+# --- หน้า HTML/JSON แบบ static สำหรับจอ wall display: สร้างครั้งเดียวต่อไฟล์ export จอกี่จอก็เปิดไฟล์เดียวกัน ---
+# (เปิดจากโฟลเดอร์ตรง ๆ หรือผ่าน web server ธรรมดา ไม่มีการคำนวณต่อผู้ชมฝั่ง server)
+PUBLISH_DIR = os.environ.get('SD_PUBLISH_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'publish'))
+# --- หน้าเว็บโหลดตัวเองใหม่ทุกกี่วินาที (ใช้รอบเดียวกับ Live mode) ---
+PAGE_REFRESH_SECONDS = sd_live.REFRESH_SECONDS
+# --- กราฟเดียวกับ sd_dashboard_pic_robot.py ---
+PAGE_FIGURES = ('sla_donut', 'rider_bar', 'hourly_combo')
+
+PAGE_FILE = 'index.html'
+METRICS_FILE = 'metrics.json'
+
+PAGE_STYLE = """
+body { font-family: "Source Sans Pro", sans-serif; margin: 16px 32px; color: #31333F; }
+header { display: flex; align-items: center; gap: 16px; }
+header h1 { font-size: 2rem; margin: 0; }
+.kpis { display: grid; grid-template-columns: repeat(7, 1fr); gap: 16px; align-items: center; }
+.kpi-label { font-size: 16px; }
+.kpi-value { font-size: 40px; }
+.kpis img { max-width: 100%; }
+.charts { display: grid; grid-template-columns: 1fr 2fr; gap: 16px; }
+.warning { background: #FFFCE7; color: #926C05; padding: 12px 16px; border-radius: 8px; }
+.caption { color: #808495; font-size: 14px; }
+hr { border: none; border-top: 1px solid #E6EAF1; margin: 24px 0; }
+"""
+
+
+def _write_atomic(path, text):
+    # เขียนลงไฟล์ชั่วคราวในโฟลเดอร์เดียวกันแล้วค่อย rename จอที่โหลดหน้าอยู่จะไม่เจอไฟล์ที่เขียนไม่เสร็จ
+    folder = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        # mkstemp สร้างไฟล์ที่อ่านได้เฉพาะเจ้าของ ให้ web server/ผู้ใช้อื่นอ่านได้
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _plotly_script(out_dir, inline):
+    # plotly.js ฝังในหน้าเลย (inline) หรือเขียนเป็นไฟล์แยกครั้งเดียวในโฟลเดอร์เดียวกัน ให้ browser ของแต่ละจอ cache ไว้ได้
+    import plotly
+    from plotly.offline import get_plotlyjs
+
+    if inline:
+        return f"<script>{get_plotlyjs()}</script>"
+    name = f"plotly-{plotly.__version__}.min.js"
+    path = os.path.join(out_dir, name)
+    if not os.path.exists(path):
+        _write_atomic(path, get_plotlyjs())
+    return f'<script src="{name}"></script>'
+
+
+def _figure_html(snap, name):
+    return snap.figure(name).to_html(full_html=False, include_plotlyjs=False, config={'displayModeBar': False, 'responsive': True})
+
+
+def _warning(text):
+    return f'<div class="warning">{html.escape(text)}</div>'
+
+
+def render_page(snap, source_name, generated_at, plotly_script):
+    # หน้าเดียวกับ sd_dashboard_pic_robot.py (หัวข้อ, KPI 6 ช่อง + รูปหุ่นยนต์, โดนัท SLA, Rider Top 20, รายชั่วโมง)
+    rider_image = sd_assets.get_data_uri(sd_assets.RIDER_IMAGE_URL)
+    robot_image = sd_assets.get_data_uri(sd_assets.ROBOT_IMAGE_URL)
+
+    tiles = ''.join(
+        f'<div><div class="kpi-label">{html.escape(label)}</div><div class="kpi-value">{html.escape(value)}</div></div>'
+        for label, value in sd_kpi.kpi_tiles(snap.kpis)
+    )
+    tiles += f'<div style="text-align:center"><img src="{robot_image}"></div>' if robot_image else '<div>No Image</div>'
+
+    if snap.sla_totals is not None:
+        sla_donut = _figure_html(snap, 'sla_donut')
+    else:
+        sla_donut = _warning("ไม่สามารถสร้างกราฟวงกลมได้ เนื่องจากไม่พบคอลัมน์ 'SLA STS'")
+    if snap.hourly is not None:
+        hourly = _figure_html(snap, 'hourly_combo')
+    else:
+        hourly = _warning("ไม่สามารถสร้างกราฟรายชั่วโมงได้ เนื่องจากไม่พบคอลัมน์ 'Hours' หรือ 'SLA STS'")
+
+    return f"""<!DOCTYPE html>
+<html lang="th">
+<head>
+<meta charset="utf-8">
+<meta http-equiv="refresh" content="{PAGE_REFRESH_SECONDS}">
+<title>MFC SD Monitoring Dashboard</title>
+<style>{PAGE_STYLE}</style>
+{plotly_script}
+</head>
+<body>
+<header>{f'<img src="{rider_image}" width="80">' if rider_image else ''}<h1>MFC SD Monitoring Dashboard</h1></header>
+<div class="kpis">{tiles}</div>
+<p class="caption">ไฟล์: {html.escape(source_name)} (สร้างเมื่อ {generated_at:%Y-%m-%d %H:%M:%S})</p>
+<hr>
+<div class="charts">
+<div>{sla_donut}</div>
+<div><h3>Total Order by Rider (Top 20)</h3>{_figure_html(snap, 'rider_bar')}</div>
+</div>
+<hr>
+<h3>Status Order by Hour</h3>
+{hourly}
+</body>
+</html>
+"""
+
+
+def metrics(snap, source_name, generated_at, rows):
+    # KPI ชุดเดียวกับหน้า HTML สำหรับระบบอื่น/จอที่แสดงเฉพาะตัวเลข
+    return {
+        'source': source_name,
+        'dataset': snap.key,
+        'generated_at': generated_at.isoformat(timespec='seconds'),
+        'rows': rows,
+        'kpis': dataclasses.asdict(snap.kpis),
+        'tiles': dict(sd_kpi.kpi_tiles(snap.kpis)),
+    }
+
+
+def publish(df, source_name, out_dir=PUBLISH_DIR, inline_js=False):
+    # สร้าง index.html + metrics.json ของชุดข้อมูลนี้ (ใช้ snapshot/JSON ของกราฟชุดเดียวกับ Dashboard)
+    os.makedirs(out_dir, exist_ok=True)
+    generated_at = datetime.datetime.now()
+    snap = sd_snapshot.get_snapshot(df)
+    snap.prepare(PAGE_FIGURES)
+    page = render_page(snap, source_name, generated_at, _plotly_script(out_dir, inline_js))
+    _write_atomic(os.path.join(out_dir, PAGE_FILE), page)
+    _write_atomic(os.path.join(out_dir, METRICS_FILE), json.dumps(metrics(snap, source_name, generated_at, len(df)), ensure_ascii=False, indent=2))
+    return os.path.join(out_dir, PAGE_FILE)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="สร้างหน้า HTML + JSON แบบ static ของ Dashboard จากไฟล์ export (สำหรับจอ wall display)")
+    parser.add_argument('--file', help="ไฟล์ export ที่ต้องการ (ไม่ใส่ = ไฟล์ล่าสุดในโฟลเดอร์ drop)")
+    parser.add_argument('--folder', default=sd_live.DROP_DIR, help="โฟลเดอร์ drop")
+    parser.add_argument('--out', default=PUBLISH_DIR, help="โฟลเดอร์ที่เขียน index.html/metrics.json")
+    parser.add_argument('--every', type=float, default=0, help="เช็คโฟลเดอร์ drop ทุกกี่วินาที และสร้างหน้าใหม่เมื่อมีไฟล์ใหม่ (0 = ครั้งเดียว)")
+    parser.add_argument('--inline-js', action='store_true', help="ฝัง plotly.js ในหน้า HTML (ไฟล์เดียวจบ แต่ใหญ่ขึ้นหลาย MB)")
+    args = parser.parse_args(argv)
+
+    if args.file:
+        df = sd_cache.load_orders(sd_live.read_export(args.file))
+        print(publish(df, os.path.basename(args.file), args.out, args.inline_js))
+        return 0
+
+    watcher = sd_live.get_watcher(args.folder)
+    published = None
+    while True:
+        start = time.perf_counter()
+        df = watcher.poll()
+        if watcher.error is not None:
+            print(f"อ่านไฟล์ล่าสุดไม่สำเร็จ จะลองใหม่รอบถัดไป: {watcher.error}", file=sys.stderr)
+        if df is not None and watcher.version != published:
+            try:
+                path = publish(df, os.path.basename(watcher.path), args.out, args.inline_js)
+            except Exception as e:
+                # สร้างหน้าไม่สำเร็จ หน้าเดิมยังอยู่ (เขียนแบบ atomic) โหมดตั้งเวลาจะลองใหม่รอบถัดไป
+                if not args.every:
+                    raise
+                print(f"สร้างหน้าไม่สำเร็จ จะลองใหม่รอบถัดไป: {e}", file=sys.stderr)
+            else:
+                published = watcher.version
+                print(f"{path}: {os.path.basename(watcher.path)} ใน {time.perf_counter() - start:.2f} วินาที")
+        elif df is None and not args.every:
+            print(f"ไม่พบไฟล์ export ใน {args.folder}", file=sys.stderr)
+            return 1
+        if not args.every:
+            return 0
+        time.sleep(args.every)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# --- ลำดับ SLA STS คงที่ (ใช้ทั้งลำดับ legend และลำดับ stack ในกราฟ) ---
+SLA_ORDER = ['Within SLA', 'Over SLA', 'Dispatched', 'Pending', 'Cancel']
+
+# --- คอลัมน์ข้อความที่มีค่าซ้ำเยอะ แปลงเป็น categorical ---
+CATEGORY_COLUMNS = ['Status', 'Payment Code', 'Rider Name']
+
+
+def _hours_category(series):
+    # แปลง Hours (ตัวเลข/ข้อความปนกัน เช่น 8, 8.0, '08') เป็น category ข้อความเรียงตามชั่วโมง
+    numeric = pd.to_numeric(series, errors='coerce')
+    as_text = series.astype('string').str.strip()
+    is_hour = numeric.notna() & (numeric == numeric.round())
+    as_text = as_text.where(~is_hour, numeric.where(is_hour).astype('Int64').astype('string'))
+    hours = sorted({int(h) for h in numeric[is_hour].unique()})
+    others = sorted(set(as_text[~is_hour].dropna().unique()))
+    return pd.Categorical(as_text, categories=[str(h) for h in hours] + others, ordered=True)
+
+
+def _sla_category(series):
+    extra = sorted(set(series.dropna().unique()) - set(SLA_ORDER))
+    return pd.Categorical(series, categories=SLA_ORDER + extra, ordered=True)
+
+
+def _downcast_ids(series):
+    # Order ID ที่เป็นตัวเลขล้วนเก็บเป็น int ขนาดเล็กที่สุดที่พอ แทนข้อความ
+    # ข้อความแปลงได้เฉพาะเมื่อแปลงกลับเป็นข้อความแล้วได้ค่าเดิมทั้งคอลัมน์ ('00123', '1e3', ' 123' คงเป็นข้อความ ไม่ชนกับ '123')
+    numeric = pd.to_numeric(series, errors='coerce')
+    if not (numeric.notna().all() and (numeric == numeric.round()).all()):
+        return series
+    ids = numeric.astype('int64')
+    if not pd.api.types.is_numeric_dtype(series.dtype) and not (ids.astype(str) == series.astype(str)).all():
+        return series
+    return pd.to_numeric(ids, downcast='integer')
+
+
+def freeze_frame(df):
+    # ทำให้ array ข้างในเป็น read-only เพื่อกันการแก้ไข DataFrame ที่อยู่ใน cache โดยไม่ตั้งใจ
+    columns = {}
+    for col in df.columns:
+        values = df[col].array
+        if isinstance(values, pd.Categorical):
+            codes = values.codes.copy()
+            codes.flags.writeable = False
+            columns[col] = pd.Categorical.from_codes(codes, dtype=values.dtype)
+        elif isinstance(df[col].dtype, np.dtype):
+            arr = df[col].to_numpy(copy=True)
+            arr.flags.writeable = False
+            columns[col] = arr
+        else:
+            columns[col] = values
+    frozen = pd.DataFrame(columns, index=df.index, copy=False)
+    frozen.attrs.update(df.attrs)
+    frozen.attrs['frozen'] = True
+    return frozen
+
+
+def order_categories(df):
+    # เรียงลำดับ category ของ Hours/SLA STS ใหม่ โดยดูแค่รายการ category (ไม่แตะข้อมูลรายแถว)
+    # ใช้กับ DataFrame ที่รวมมาจากหลายไฟล์ Parquet ซึ่งลำดับ category ไม่คงที่
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if col == 'Hours' and isinstance(series.dtype, pd.CategoricalDtype):
+            categories = _hours_category(pd.Series(series.cat.categories)).categories
+            columns[col] = series.cat.set_categories(categories, ordered=True)
+        elif col == 'SLA STS' and isinstance(series.dtype, pd.CategoricalDtype):
+            columns[col] = series.cat.set_categories(_sla_category(series.cat.categories).categories, ordered=True)
+        else:
+            columns[col] = series
+    ordered = pd.DataFrame(columns, index=df.index)
+    ordered.attrs.update(df.attrs)
+    return ordered
+
+
+def concat_orders(frames):
+    # รวม DataFrame ที่ normalize แล้วหลายชุด (หลาย sheet/หลายไฟล์) เป็นชุดเดียว
+    # category ของแต่ละชุดไม่เหมือนกัน จึงรวมรายการ category ก่อน (ไม่แปลงกลับเป็นข้อความรายแถว)
+    names = list(dict.fromkeys(col for f in frames for col in f.columns))
+    columns = {}
+    for col in names:
+        present = [f[col] for f in frames if col in f.columns]
+        categorical = all(isinstance(p.dtype, pd.CategoricalDtype) for p in present)
+        # ชุดที่ไม่มีคอลัมน์นี้ เติมเป็นค่าว่าง
+        parts = [
+            f[col] if col in f.columns
+            else pd.Series(pd.Categorical.from_codes(np.full(len(f), -1), categories=[])) if categorical
+            else pd.Series(np.nan, index=range(len(f)))
+            for f in frames
+        ]
+        if categorical:
+            arrays = [p.array for p in parts]
+            if len({a.categories.dtype for a in arrays}) > 1:
+                arrays = [a.set_categories(a.categories.astype(object)) for a in arrays]
+            columns[col] = union_categoricals(arrays, ignore_order=True)
+        elif all(pd.api.types.is_numeric_dtype(p.dtype) for p in parts):
+            columns[col] = pd.concat(parts, ignore_index=True)
+        elif len({p.dtype for p in parts}) > 1:
+            # เช่น Order ID เป็นตัวเลขในไฟล์หนึ่ง แต่เป็นข้อความในอีกไฟล์ ใช้ข้อความทั้งหมดเพื่อให้นับ Order ไม่ซ้ำได้ถูก
+            columns[col] = pd.concat([p.astype('string').astype(object) for p in parts], ignore_index=True)
+        else:
+            columns[col] = pd.concat(parts, ignore_index=True)
+    combined = pd.DataFrame(columns)
+    combined.attrs.update(frames[0].attrs)
+    return freeze_frame(order_categories(combined))
+
+
+def normalize_orders(df):
+    # ปรับ schema ครั้งเดียวตอนโหลด: categorical ลำดับคงที่ + ลดขนาดตัวเลข + freeze
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if col in ('Hours', 'SLA STS') and isinstance(series.dtype, pd.CategoricalDtype):
+            # คำนวณจากเวลาดิบมาแล้ว (sd_sla) เรียงแค่รายการ category ด้วย order_categories ด้านล่าง
+            columns[col] = series
+        elif col == 'Hours':
+            columns[col] = _hours_category(series)
+        elif col == 'SLA STS':
+            columns[col] = _sla_category(series)
+        elif col in CATEGORY_COLUMNS:
+            columns[col] = series.astype('category')
+        elif col == 'Order ID':
+            columns[col] = _downcast_ids(series)
+        elif col == 'Net Order Value':
+            # คง float64 ไว้เพื่อให้ผลรวมมูลค่าไม่คลาดเคลื่อน
+            columns[col] = pd.to_numeric(series, errors='coerce').astype('float64')
+        else:
+            columns[col] = series
+    normalized = pd.DataFrame(columns, index=df.index)
+    normalized.attrs.update(df.attrs)
+    return freeze_frame(order_categories(normalized))
@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import sd_kpi
+import sd_schema
+
+# --- คำนวณ Hours และ SLA STS จากเวลาดิบในไฟล์ export (แทนคอลัมน์สูตรใน Excel ที่ทำให้ไฟล์หนักและอ่านช้า) ---
+# ชื่อคอลัมน์เวลาในไฟล์ เปลี่ยนได้ผ่าน env ถ้าระบบต้นทางใช้ชื่ออื่น
+ORDER_TIME_COLUMN = os.environ.get('SD_ORDER_TIME_COLUMN', 'Order Time')
+DISPATCH_TIME_COLUMN = os.environ.get('SD_DISPATCH_TIME_COLUMN', 'Dispatch Time')
+DELIVERY_TIME_COLUMN = os.environ.get('SD_DELIVERY_TIME_COLUMN', 'Delivery Time')
+TIME_COLUMNS = [ORDER_TIME_COLUMN, DISPATCH_TIME_COLUMN, DELIVERY_TIME_COLUMN]
+
+# --- ส่งถึงภายในกี่นาทีนับจากเวลาสั่ง = Within SLA (เกิน = Over SLA) ---
+SLA_MINUTES = float(os.environ.get('SD_SLA_MINUTES', '60'))
+# --- ขนาดช่วงเวลาของกราฟรายชั่วโมง (นาที): 60 = รายชั่วโมง ('8', '9', ...), 15/30 = ย่อยลงไป ('08:00', '08:15', ...) ---
+BUCKET_MINUTES = int(os.environ.get('SD_BUCKET_MINUTES', '60'))
+# --- auto: คำนวณเฉพาะเมื่อไฟล์ไม่มีคอลัมน์ Hours/SLA STS, always: คำนวณใหม่ทับค่าในไฟล์, off: ไม่คำนวณ ---
+DERIVE_MODE = os.environ.get('SD_DERIVE_MODE', 'auto')
+
+MINUTE_NS = 60 * 1_000_000_000
+DAY_MINUTES = 24 * 60
+
+# รหัสใน SLA_ORDER (Within SLA, Over SLA, Dispatched, Pending, Cancel)
+_WITHIN, _OVER, _DISPATCHED, _PENDING, _CANCEL = range(5)
+
+
+def signature(sla_minutes=None, bucket_minutes=None, mode=None):
+    # ค่าตั้งที่มีผลกับข้อมูลที่คำนวณได้ (ใส่ใน key ของ cache เพื่อไม่ให้ใช้ผลที่คำนวณด้วยค่าตั้งเดิม)
+    return '|'.join(str(v) for v in (
+        mode or DERIVE_MODE,
+        SLA_MINUTES if sla_minutes is None else sla_minutes,
+        bucket_minutes or BUCKET_MINUTES,
+        *TIME_COLUMNS,
+    ))
+
+
+def timestamps(series):
+    # เวลาเป็นจำนวน ns (int64) + mask ของแถวที่มีเวลา (datetime จาก reader ใช้ได้เลย ข้อความแปลงครั้งเดียวทั้งคอลัมน์)
+    if not pd.api.types.is_datetime64_dtype(series.dtype):
+        series = pd.to_datetime(series, errors='coerce')
+    if series.dt.tz is not None:
+        series = series.dt.tz_localize(None)
+    values = series.to_numpy(dtype='datetime64[ns]')
+    valid = ~np.isnat(values)
+    return values.view(np.int64), valid
+
+
+def bucket_labels(bucket_minutes):
+    # ชื่อช่วงเวลาทั้งวัน: รายชั่วโมงใช้ชื่อเดียวกับ Hours ในไฟล์ export ('8'), ช่วงย่อยใช้ 'HH:MM' (เรียงตามตัวอักษรได้ถูก)
+    if bucket_minutes == 60:
+        return [str(h) for h in range(24)]
+    return [f"{m // 60:02d}:{m % 60:02d}" for m in range(0, DAY_MINUTES, bucket_minutes)]
+
+
+def hour_buckets(order_ns, valid, bucket_minutes=None):
+    # ช่วงเวลาของแต่ละ Order จากเวลาสั่ง (คำนวณด้วยเลขจำนวนเต็ม ไม่วนทีละแถว) คืนค่า Categorical เฉพาะช่วงที่มีข้อมูล
+    bucket_minutes = bucket_minutes or BUCKET_MINUTES
+    if DAY_MINUTES % bucket_minutes:
+        raise ValueError(f"ช่วงเวลา {bucket_minutes} นาที ต้องหาร 1440 (1 วัน) ลงตัว")
+    labels = bucket_labels(bucket_minutes)
+    codes = (order_ns // MINUTE_NS) % DAY_MINUTES // bucket_minutes
+    codes = np.where(valid, codes, -1)
+    present = np.bincount(codes[valid], minlength=len(labels)) > 0
+    renumber = np.cumsum(present) - 1
+    codes = np.where(valid, renumber[np.maximum(codes, 0)], -1)
+    return pd.Categorical.from_codes(codes, categories=[labels[i] for i in np.flatnonzero(present)], ordered=True)
+
+
+def classify(status, order, dispatch, delivery, sla_minutes=None):
+    # SLA STS จากสถานะ + เวลา (order/dispatch/delivery = ผลของ timestamps()):
+    #   Cancel      สถานะ CANCEL
+    #   Within/Over ส่งถึงแล้ว เทียบเวลาส่งถึง - เวลาสั่ง กับ sla_minutes
+    #   Dispatched  ออกจากสาขาแล้วแต่ยังไม่ถึง, Pending ยังไม่ออกจากสาขา
+    sla_ns = int((SLA_MINUTES if sla_minutes is None else sla_minutes) * MINUTE_NS)
+    order_ns, has_order = order
+    dispatch_ns, has_dispatch = dispatch
+    delivery_ns, has_delivery = delivery
+
+    codes = np.full(len(order_ns), _PENDING, dtype=np.int8)
+    codes[has_dispatch] = _DISPATCHED
+    delivered = has_delivery & has_order
+    codes[delivered] = np.where(delivery_ns[delivered] - order_ns[delivered] <= sla_ns, _WITHIN, _OVER)
+    # ส่งถึงแล้วแต่ไม่มีเวลาสั่ง ตัดสิน SLA ไม่ได้
+    codes[has_delivery & ~has_order] = -1
+    is_cancel = (status == sd_kpi.STATUS_CANCEL).to_numpy(dtype=bool, na_value=False)
+    codes[is_cancel] = _CANCEL
+    return pd.Categorical.from_codes(codes, categories=sd_schema.SLA_ORDER, ordered=True)
+
+
+def derive(df, sla_minutes=None, bucket_minutes=None, mode=None):
+    # เติม Hours/SLA STS จากเวลาดิบ (ตาม mode) แล้วตัดคอลัมน์เวลาดิบออก ไฟล์ที่ไม่มีเวลาสั่งคืนค่าเดิม
+    mode = mode or DERIVE_MODE
+    present = [col for col in TIME_COLUMNS if col in df.columns]
+    if not present:
+        return df
+    derived = {}
+    if mode != 'off' and ORDER_TIME_COLUMN in df.columns:
+        order = timestamps(df[ORDER_TIME_COLUMN])
+        if mode == 'always' or 'Hours' not in df.columns:
+            derived['Hours'] = hour_buckets(*order, bucket_minutes)
+        if (mode == 'always' or 'SLA STS' not in df.columns) and 'Status' in df.columns:
+            missing = (np.zeros(len(df), dtype=np.int64), np.zeros(len(df), dtype=bool))
+            dispatch = timestamps(df[DISPATCH_TIME_COLUMN]) if DISPATCH_TIME_COLUMN in df.columns else missing
+            delivery = timestamps(df[DELIVERY_TIME_COLUMN]) if DELIVERY_TIME_COLUMN in df.columns else missing
+            derived['SLA STS'] = classify(df['Status'], order, dispatch, delivery, sla_minutes)
+    result = df.drop(columns=present).assign(**derived)
+    result.attrs.update(df.attrs)
+    return result
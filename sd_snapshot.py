@@ -0,0 +1,206 @@
+import json
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+import sd_cache
+import sd_charts
+import sd_cube
+import sd_filters
+
+# --- จำนวน snapshot (ชุดข้อมูล) ที่เก็บไว้ใน process พร้อมกัน ---
+MAX_SNAPSHOTS = 8
+# --- จำนวนผลการกรองที่เก็บไว้ต่อ 1 ชุดข้อมูล ---
+MAX_FILTERED = 16
+# --- เปลี่ยนเลขนี้เมื่อแก้หน้าตากราฟใน sd_charts เพื่อไม่ให้ใช้ JSON ของกราฟแบบเก่าที่เก็บไว้บนดิสก์ ---
+FIGURE_VERSION = 2
+
+# --- กลุ่มสถานะที่นับเป็น DOT ในกราฟโดนัท ---
+DOT_MAP = {
+    'Within SLA': 'DOT',
+    'Pending': 'DOT',
+    'Dispatched': 'DOT'
+}
+
+
+def sla_dot_counts(sla_totals):
+    # รวม Within SLA/Pending/Dispatched เป็น DOT (ไม่รวม Cancel) จากจำนวนที่นับไว้แล้วต่อ SLA STS
+    sla_totals = sla_totals[sla_totals.index != 'Cancel']
+    counts = sla_totals.groupby(lambda s: DOT_MAP.get(s, s)).sum()
+    counts = counts[counts > 0].sort_values(ascending=False).reset_index()
+    counts.columns = ['SLA STS', 'Count']
+    return counts
+
+
+# --- ชื่อกราฟ -> ฟังก์ชันสร้างกราฟจาก snapshot ---
+FIGURE_BUILDERS = {
+    'payment_pie': lambda snap: sd_charts.build_payment_pie(snap.payment_counts),
+    'rider_bar': lambda snap: sd_charts.build_rider_bar(snap.rider_order_counts),
+    'sla_donut': lambda snap: sd_charts.build_sla_donut(sla_dot_counts(snap.sla_totals)),
+    'hourly_bar': lambda snap: sd_charts.build_hourly_chart(sd_charts.hourly_matrix(snap.hourly)),
+    'hourly_combo': lambda snap: sd_charts.build_hourly_chart(sd_charts.hourly_matrix(snap.hourly), combo=True),
+}
+# --- ข้อมูลที่กราฟต้องใช้ (ไฟล์ที่ไม่มีคอลัมน์ SLA STS/Hours จะไม่มีกราฟนั้น) ---
+FIGURE_INPUTS = {
+    'sla_donut': 'sla_totals',
+    'hourly_bar': 'hourly',
+    'hourly_combo': 'hourly',
+}
+
+
+class Snapshot:
+    # ผลการคำนวณของชุดข้อมูล 1 ชุด (KPI + ข้อมูลกราฟ + กราฟที่สร้างแล้ว) ใช้ร่วมกันทุก session
+    # ห้ามแก้ไขค่าข้างใน เพราะหลาย session อ่านพร้อมกัน
+
+    def __init__(self, key, kpis, payment_counts, rider_order_counts, sla_totals, hourly, cube=None):
+        self.key = key
+        # cube ของชุดข้อมูลนี้ (None ในโหมด Append) ใช้ตอบการ slice อื่น ๆ โดยไม่ต้องอ่านข้อมูลรายแถว
+        self.cube = cube
+        self.kpis = kpis
+        self.payment_counts = payment_counts
+        self.rider_order_counts = rider_order_counts
+        self.sla_totals = sla_totals
+        self.hourly = hourly
+        self._figures = {}
+        self._filter_index = None
+        self._filtered = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, key, df):
+        # อ่านข้อมูลรายแถวครั้งเดียวเพื่อสร้าง cube แล้ว KPI/ข้อมูลกราฟทั้งหมดมาจาก cube
+        return cls.from_cube(key, sd_cube.OrderCube.from_frame(df))
+
+    @classmethod
+    def from_cube(cls, key, cube):
+        has_sla = 'SLA STS' in cube.dimensions
+        return cls(
+            key=key,
+            kpis=cube.kpis(),
+            payment_counts=cube.payment_counts(),
+            rider_order_counts=cube.rider_order_counts(),
+            sla_totals=cube.sla_totals() if has_sla else None,
+            hourly=cube.hourly() if has_sla and 'Hours' in cube.dimensions else None,
+            cube=cube,
+        )
+
+    @classmethod
+    def from_intraday(cls, intraday):
+        # โหมด Append: ใช้ตัวนับสะสมของ session แทนการคำนวณจาก DataFrame (ไม่เก็บใน registry)
+        return cls(
+            key=None,
+            kpis=intraday.kpis(),
+            payment_counts=intraday.payments(),
+            rider_order_counts=intraday.rider_counts(),
+            sla_totals=intraday.sla_totals(),
+            hourly=intraday.hourly(),
+        )
+
+    def filter_index(self):
+        # bitmap index ของตัวกรอง สร้างครั้งแรกที่มีคนใช้ตัวกรอง (None ในโหมด Append ที่ไม่มี cube)
+        if self.cube is None:
+            return None
+        with self._lock:
+            if self._filter_index is None:
+                self._filter_index = sd_filters.BitmapIndex(self.cube.cells)
+            return self._filter_index
+
+    def filtered(self, filters):
+        # snapshot ของข้อมูลที่ผ่านตัวกรอง (ไม่มีตัวกรอง = ตัวเอง) เก็บผลล่าสุดไว้ MAX_FILTERED ชุด
+        key = sd_filters.filter_key(filters)
+        index = self.filter_index()
+        if not key or index is None:
+            return self
+        with self._lock:
+            snap = self._filtered.get(key)
+            if snap is not None:
+                self._filtered.move_to_end(key)
+                return snap
+        mask = index.select(filters)
+        # ไม่เก็บ JSON ของกราฟที่กรองแล้วลงดิสก์ (key=None) เพราะชุดตัวกรองมีได้มากมาย
+        snap = Snapshot.from_cube(None, self.cube.subset(mask))
+        with self._lock:
+            self._filtered[key] = snap
+            while len(self._filtered) > MAX_FILTERED:
+                self._filtered.popitem(last=False)
+        return snap
+
+    def figure(self, name):
+        # สร้างกราฟครั้งแรกที่มีคนขอ แล้วเก็บไว้ให้ session อื่นใช้ต่อ
+        with self._lock:
+            if name not in self._figures:
+                self._figures[name] = self._load_or_build(name)
+            return self._figures[name]
+
+    def prepare(self, figures):
+        # สร้างกราฟที่ระบุ (ข้ามกราฟที่ไม่มีข้อมูล) และ bitmap index ไว้ล่วงหน้า ใช้ตอน pre-warm/โหลดเบื้องหลัง
+        for name in figures:
+            if getattr(self, FIGURE_INPUTS.get(name, 'payment_counts')) is not None:
+                self.figure(name)
+        self.filter_index()
+
+    def _load_or_build(self, name):
+        # ชุดข้อมูลเดิม (key = hash เดิม) ใช้ JSON ของกราฟที่เก็บไว้บนดิสก์ ไม่ต้องสร้างกราฟด้วย Plotly ใหม่
+        # (เช่น หลังรีสตาร์ท server หรือ process อื่นที่อ่านไฟล์เดียวกัน)
+        if self.key is None:
+            return FIGURE_BUILDERS[name](self)
+        import plotly.graph_objects as go
+        import plotly.io as pio
+
+        cache_key = f"{self.key}-{name}-f{FIGURE_VERSION}"
+        text = sd_cache.get_text(cache_key)
+        if text is not None:
+            try:
+                # JSON นี้มาจาก Figure ที่ผ่านการตรวจแล้ว จึงข้ามการ validate ของ Plotly
+                return go.Figure(json.loads(text), _validate=False)
+            except ValueError:
+                pass
+        fig = FIGURE_BUILDERS[name](self)
+        sd_cache.put_text(cache_key, pio.to_json(fig, validate=False))
+        return fig
+
+
+# --- registry ของ snapshot ทั้ง process: key = hash ของชุดข้อมูล ---
+_snapshots = OrderedDict()
+_key_locks = {}
+_registry_lock = threading.Lock()
+
+
+def dataset_key(df):
+    key = df.attrs.get('cache', {}).get('key')
+    if key is None:
+        key = f"frame-{int(pd.util.hash_pandas_object(df, index=False).sum())}"
+    return key
+
+
+def get_snapshot(df):
+    # คืนค่า snapshot ของชุดข้อมูลนี้ ถ้าหลาย session ขอพร้อมกัน จะคำนวณแค่ session แรก ที่เหลือรอใช้ผลเดียวกัน
+    key = dataset_key(df)
+    return _registered(key, lambda: Snapshot.from_frame(key, df))
+
+
+def get_cube_snapshot(key, cube):
+    # เหมือน get_snapshot แต่ข้อมูลมาเป็น cube ที่สร้างไว้แล้ว (เช่น จากการอ่านไฟล์แบบ streaming)
+    return _registered(key, lambda: Snapshot.from_cube(key, cube))
+
+
+def _registered(key, build):
+    with _registry_lock:
+        snap = _snapshots.get(key)
+        if snap is not None:
+            _snapshots.move_to_end(key)
+            return snap
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+
+    with key_lock:
+        with _registry_lock:
+            snap = _snapshots.get(key)
+        if snap is None:
+            snap = build()
+            with _registry_lock:
+                _snapshots[key] = snap
+                while len(_snapshots) > MAX_SNAPSHOTS:
+                    old_key, _ = _snapshots.popitem(last=False)
+                    _key_locks.pop(old_key, None)
+    return snap
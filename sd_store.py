@@ -0,0 +1,86 @@
+import os
+import threading
+from collections import OrderedDict
+
+import sd_schema
+
+# --- ชุดข้อมูลในหน่วยความจำที่ใช้ร่วมกันทุก session ของ process: 1 ชุดต่อ 1 key (hash ของไฟล์) ---
+# ทุก session ได้ view ที่ใช้ array ชุดเดียวกัน (read-only + copy-on-write) ไม่ copy ข้อมูลต่อ session
+# ขนาดรวมสูงสุด (MB) เกินแล้วเอาชุดที่ไม่ได้ใช้นานที่สุดออกก่อน (LRU) ชุดที่ถูกเอาออกยังโหลดกลับจาก cache บนดิสก์ได้
+MAX_MB = float(os.environ.get('SD_STORE_MAX_MB', '1024'))
+
+_frames = OrderedDict()
+_sizes = {}
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def frame_bytes(df):
+    # หน่วยความจำของข้อมูลใน DataFrame (รวมข้อความ/category)
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+
+def _view(df):
+    # DataFrame ใหม่ที่ใช้ array เดิม (attrs แยกของใครของมัน) แก้ไขใน session ใดก็ไม่กระทบชุดที่เก็บไว้
+    return df.copy(deep=False)
+
+
+def _evict(max_bytes):
+    total = sum(_sizes.values())
+    while _frames and total > max_bytes:
+        key, _ = _frames.popitem(last=False)
+        total -= _sizes.pop(key)
+        _stats['evictions'] += 1
+
+
+def get(key):
+    # view ของชุดข้อมูล key (None ถ้าไม่มีในหน่วยความจำ)
+    with _lock:
+        df = _frames.get(key)
+        if df is None:
+            _stats['misses'] += 1
+            return None
+        _frames.move_to_end(key)
+        _stats['hits'] += 1
+    return _view(df)
+
+
+def put(key, df, max_mb=None):
+    # เก็บชุดข้อมูล (freeze ก่อนถ้ายังไม่ได้ทำ) แล้วคืนค่า view ให้ผู้เรียกใช้แทน df เดิม
+    # ชุดที่ใหญ่กว่างบทั้งหมดไม่เก็บ (คืนค่า view เฉย ๆ)
+    if not df.attrs.get('frozen'):
+        df = sd_schema.freeze_frame(df)
+    size = frame_bytes(df)
+    max_bytes = (MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    with _lock:
+        if key in _frames:
+            _sizes.pop(key)
+            del _frames[key]
+        if size <= max_bytes:
+            _frames[key] = df
+            _sizes[key] = size
+            _evict(max_bytes)
+    return _view(df)
+
+
+def contains(key):
+    # มีชุดนี้ในหน่วยความจำหรือไม่ (ไม่นับเป็น hit/miss และไม่เปลี่ยนลำดับ LRU)
+    with _lock:
+        return key in _frames
+
+
+def discard(key):
+    with _lock:
+        if _frames.pop(key, None) is not None:
+            _sizes.pop(key)
+
+
+def usage():
+    # สถานะปัจจุบัน: จำนวนชุด, ขนาดรวม/งบ (byte), hit/miss/ชุดที่ถูกเอาออก
+    with _lock:
+        return {
+            'datasets': len(_frames),
+            'bytes': sum(_sizes.values()),
+            'max_bytes': int(MAX_MB * 1024 * 1024),
+            **_stats,
+        }
@@ -0,0 +1,372 @@
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import sd_cache
+import sd_cube
+import sd_kpi
+import sd_loader
+import sd_schema
+import sd_sla
+
+# --- อ่านไฟล์ใหญ่ทีละ batch (จำนวนแถวต่อ batch) หน่วยความจำสูงสุดขึ้นกับขนาด batch ไม่ใช่ขนาดไฟล์ ---
+BATCH_ROWS = int(os.environ.get('SD_STREAM_BATCH_ROWS', '50000'))
+# --- ไฟล์ที่อัปโหลดใหญ่กว่านี้ (MB) อ่านแบบ streaming แทน pd.read_excel ทั้งไฟล์ ---
+STREAM_THRESHOLD_MB = float(os.environ.get('SD_STREAM_THRESHOLD_MB', '40'))
+# --- เขียนข้อมูลที่ปรับ schema แล้วลงไฟล์ Parquet ใน cache ระหว่างอ่าน (ใช้ดูข้อมูลดิบภายหลัง) ---
+SPILL = os.environ.get('SD_STREAM_SPILL', '1') == '1'
+# --- จำนวนแถวที่แสดงในตารางข้อมูลดิบของไฟล์ที่อ่านแบบ streaming ---
+PREVIEW_ROWS = 1000
+# --- จำนวนผลการอ่านแบบ streaming ที่เก็บไว้ใน process พร้อมกัน ---
+MAX_RESULTS = 2
+
+# --- schema ของไฟล์ spill คงที่ทุก batch (ข้อความเก็บเป็น string ธรรมดา ไม่ขึ้นกับ category ของแต่ละ batch) ---
+SPILL_SCHEMA = pa.schema([
+    ('Order ID', pa.string()),
+    ('Net Order Value', pa.float64()),
+    ('Status', pa.string()),
+    ('Rider Name', pa.string()),
+    ('Payment Code', pa.string()),
+    ('Hours', pa.string()),
+    ('SLA STS', pa.string()),
+])
+TEXT_COLUMNS = ['Order ID', 'Status', 'Rider Name', 'Payment Code', 'SLA STS']
+
+
+def should_stream(uploaded_file):
+    size = getattr(uploaded_file, 'size', None)
+    if size is None:
+        size = len(uploaded_file.getvalue())
+    return size > STREAM_THRESHOLD_MB * 1024 * 1024
+
+
+def spill_path(key):
+    return os.path.join(sd_cache.CACHE_DIR, f"{key}-stream.parquet")
+
+
+def _cell_text(value):
+    # ค่าในเซลล์เป็นข้อความแบบเดียวกับ pd.read_excel(dtype=str) (ตัวเลขจำนวนเต็มไม่มี .0)
+    if value is None:
+        return None
+    if isinstance(value, float):
+        if value != value:
+            return None
+        if value.is_integer():
+            return str(int(value))
+    return str(value)
+
+
+# --- reader ทีละแถว: คืนค่า (iterator ของแถว โดยแถวแรกคือหัวตาราง, จำนวนแถวโดยประมาณหรือ None, ชื่อ engine) ---
+
+def _openpyxl_rows(source, sheet_name):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(source, read_only=True, data_only=True)
+    ws = wb[sheet_name] if isinstance(sheet_name, str) else wb.worksheets[sheet_name]
+    # read-only อ่านขนาด sheet จาก tag <dimension> (บางไฟล์ไม่มี)
+    total = ws.max_row - 1 if ws.max_row else None
+    return ws.iter_rows(values_only=True), total, 'openpyxl'
+
+
+def _pyxlsb_rows(source, sheet_name):
+    from pyxlsb import open_workbook
+
+    wb = open_workbook(source)
+    sheet = wb.get_sheet(sheet_name if isinstance(sheet_name, str) else sheet_name + 1)
+    rows = ([cell.v for cell in row] for row in sheet.rows())
+    return rows, None, 'pyxlsb'
+
+
+def _calamine_rows(source, sheet_name):
+    # .xls ไม่มี reader แบบ streaming จริง calamine อ่านทั้ง sheet ไว้ในหน่วยความจำ (แต่ยังประมวลผลทีละ batch)
+    from python_calamine import CalamineWorkbook
+
+    wb = CalamineWorkbook.from_filelike(source) if hasattr(source, 'read') else CalamineWorkbook.from_path(source)
+    sheet = wb.get_sheet_by_name(sheet_name) if isinstance(sheet_name, str) else wb.get_sheet_by_index(sheet_name)
+    return sheet.iter_rows(), sheet.height - 1, 'calamine'
+
+
+def _open_rows(source, sheet_name=0):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    ext = os.path.splitext(sd_loader._file_name(source))[1].lower()
+    if ext == '.xlsb':
+        return _pyxlsb_rows(source, sheet_name)
+    if ext == '.xls':
+        return _calamine_rows(source, sheet_name)
+    return _openpyxl_rows(source, sheet_name)
+
+
+def _sheet_batches(source, sheet_name, batch_rows, progress):
+    # batch ของ sheet เดียว คืนค่า None ถ้า sheet นี้ไม่ใช่ข้อมูล Order (ว่าง หรือไม่มีคอลัมน์ Order ID เช่น sheet สรุป/pivot)
+    rows, total, engine = _open_rows(source, sheet_name)
+    header = next(rows, None)
+    if header is None or 'Order ID' not in header:
+        return None
+    wanted = sd_loader.REQUIRED_COLUMNS + sd_sla.TIME_COLUMNS
+    positions = {name: i for i, name in enumerate(header) if name in wanted}
+    missing = [col for col in sd_loader.REQUIRED_COLUMNS if col not in positions]
+    # Hours/SLA STS ไม่บังคับ (เหมือน sd_loader): ถ้ามีเวลาดิบคำนวณได้ (sd_sla.derive) ถ้าไม่มีเติมค่าว่าง
+    # คอลัมน์ที่ว่างทั้งหมดไม่ถูกใช้เป็นมิติของ cube หน้า Dashboard จึงแจ้งเตือนแบบเดียวกับการอ่านปกติ
+    blank = [] if sd_sla.ORDER_TIME_COLUMN in positions else [col for col in missing if col in sd_loader.DERIVED_COLUMNS]
+    missing = [col for col in missing if col not in sd_loader.DERIVED_COLUMNS]
+    if missing:
+        raise ValueError(f"ไม่พบคอลัมน์ {', '.join(missing)} ใน sheet {sheet_name}")
+
+    def batches():
+        done = 0
+        while True:
+            chunk = [row for _, row in zip(range(batch_rows), rows)]
+            if not chunk:
+                break
+            # แถวว่างท้ายไฟล์ (ทุกคอลัมน์ว่าง) ไม่นับ
+            chunk = [row for row in chunk if any(v is not None for v in row)]
+            columns = {}
+            for col, i in positions.items():
+                values = [row[i] if i < len(row) else None for row in chunk]
+                if col in TEXT_COLUMNS:
+                    columns[col] = pd.array([_cell_text(v) for v in values], dtype=object)
+                elif col == 'Net Order Value':
+                    columns[col] = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').astype('float64')
+                else:
+                    columns[col] = pd.Series(values, dtype=object)
+            for col in blank:
+                columns[col] = pd.array([None] * len(chunk), dtype=object)
+            batch = pd.DataFrame(columns)
+            batch.attrs['engine'] = engine
+            batch.attrs['sheet'] = sheet_name
+            done += len(chunk)
+            if progress is not None:
+                progress(done, total)
+            if len(batch):
+                yield batch
+
+    return batches()
+
+
+def iter_batches(source, batch_rows=None, sheet_name=None, progress=None):
+    # อ่านไฟล์ทีละ batch เป็น DataFrame เฉพาะคอลัมน์ที่ใช้ (ยังไม่ normalize)
+    # sheet_name=None: ทุก sheet ที่มีข้อมูล Order ต่อกันตามลำดับ (เหมือน sd_loader.read_workbooks) ข้าม sheet สรุป/pivot
+    # progress(แถวที่อ่านแล้ว, จำนวนแถวทั้งหมดหรือ None) ถูกเรียกหลังแต่ละ batch (นับรวมทุก sheet ที่อ่านแล้ว)
+    batch_rows = batch_rows or BATCH_ROWS
+    sheets = sd_loader.sheet_names(source) if sheet_name is None else [sheet_name]
+    read = [0]
+    found = False
+    for sheet in sheets:
+        offset = read[0]
+
+        def sheet_progress(done, total, offset=offset):
+            read[0] = offset + done
+            if progress is not None:
+                progress(offset + done, offset + total if total else None)
+
+        batches = _sheet_batches(source, sheet, batch_rows, sheet_progress)
+        if batches is None:
+            continue
+        found = True
+        yield from batches
+    if not found:
+        raise ValueError(f"ไม่พบคอลัมน์ Order ID ในไฟล์ {sd_loader._file_name(source)}")
+
+
+class CubeBuilder:
+    # สร้าง sd_cube.OrderCube ทีละ batch: เก็บเฉพาะผลรวมต่อช่อง + คู่ (ช่อง, hash ของ Order ID)
+    # หน่วยความจำโตตามจำนวนช่องและจำนวน Order ไม่ซ้ำ (12 byte ต่อคู่) ไม่ได้เก็บข้อมูลรายแถว
+
+    def __init__(self):
+        self.dimensions = [dim for dim in sd_cube.DIMENSIONS if dim in sd_loader.REQUIRED_COLUMNS]
+        self.rows = 0
+        self._values = {dim: {} for dim in self.dimensions}
+        # ชุดรหัสมิติ -> รหัสช่อง (ลำดับที่พบครั้งแรก)
+        self._cells = {}
+        self._cell_rows = np.zeros(0, dtype=np.int64)
+        self._cell_value = np.zeros(0, dtype=np.float64)
+        self._pair_cells = []
+        self._pair_orders = []
+        self._pending = 0
+
+    def _global_codes(self, dim, series):
+        # รหัสของค่าใน batch -> รหัสถาวรของทั้งไฟล์ (ค่าว่าง = -1)
+        codes, uniques = sd_kpi._codes(series)
+        mapping = self._values[dim]
+        lookup = np.array([mapping.setdefault(v, len(mapping)) for v in uniques] + [-1], dtype=np.int64)
+        return lookup[codes]
+
+    def add(self, batch):
+        # batch ที่ normalize แล้ว (sd_schema.normalize_orders) + คอลัมน์ Order ID แบบข้อความ
+        n = len(batch)
+        codes = [self._global_codes(dim, batch[dim]) for dim in self.dimensions]
+
+        # ช่องของแต่ละแถว: ชุดรหัสที่ไม่ซ้ำใน batch -> รหัสช่องถาวร
+        key = np.zeros(n, dtype=np.int64)
+        for dim, c in zip(self.dimensions, codes):
+            key = pd.factorize(key * (len(self._values[dim]) + 1) + c + 1)[0].astype(np.int64)
+        local_ids, local_keys = pd.factorize(key)
+        first = np.empty(len(local_keys), dtype=np.int64)
+        first[local_ids[::-1]] = np.arange(n)[::-1]
+        cells = self._cells
+        combos = zip(*(c[first].tolist() for c in codes))
+        to_global = np.array([cells.setdefault(combo, len(cells)) for combo in combos], dtype=np.int64)
+        cell_ids = to_global[local_ids]
+
+        n_cells = len(cells)
+        if len(self._cell_rows) < n_cells:
+            self._cell_rows = np.pad(self._cell_rows, (0, n_cells - len(self._cell_rows)))
+            self._cell_value = np.pad(self._cell_value, (0, n_cells - len(self._cell_value)))
+        self._cell_rows += np.bincount(cell_ids, minlength=n_cells)
+        values = np.nan_to_num(batch['Net Order Value'].to_numpy(dtype=np.float64, na_value=np.nan))
+        self._cell_value += np.bincount(cell_ids, weights=values, minlength=n_cells)
+
+        # Order ID -> hash 64 bit (ไม่ต้องเก็บข้อความของทุก Order)
+        order_ids = batch['Order ID']
+        valid = order_ids.notna().to_numpy()
+        hashes = pd.util.hash_array(order_ids[valid].astype(str).to_numpy(dtype=object))
+        self._pair_cells.append(cell_ids[valid].astype(np.int32))
+        self._pair_orders.append(hashes)
+        self._pending += int(valid.sum())
+        if self._pending > 4 * BATCH_ROWS:
+            self._compact()
+        self.rows += n
+
+    def _compact(self):
+        # ตัดคู่ (ช่อง, Order) ที่ซ้ำกันออก เรียงตาม Order แล้วตามช่อง
+        cells = np.concatenate(self._pair_cells) if self._pair_cells else np.zeros(0, dtype=np.int32)
+        orders = np.concatenate(self._pair_orders) if self._pair_orders else np.zeros(0, dtype=np.uint64)
+        order = np.lexsort((cells, orders))
+        cells, orders = cells[order], orders[order]
+        keep = np.ones(len(cells), dtype=bool)
+        keep[1:] = (cells[1:] != cells[:-1]) | (orders[1:] != orders[:-1])
+        self._pair_cells = [cells[keep]]
+        self._pair_orders = [orders[keep]]
+        self._pending = 0
+        return self._pair_cells[0], self._pair_orders[0]
+
+    def cube(self):
+        pair_cells, pair_orders = self._compact()
+        n_cells = len(self._cells)
+        codes = np.array(list(self._cells), dtype=np.int64).reshape(n_cells, len(self.dimensions))
+
+        columns = {}
+        for i, dim in enumerate(self.dimensions):
+            # มิติที่ไม่มีค่าเลยทั้งไฟล์ (คอลัมน์ที่ไม่มีในไฟล์ เติมค่าว่างไว้) ไม่ใส่ใน cube
+            if not (codes[:, i] >= 0).any():
+                continue
+            values = np.array(list(self._values[dim]) + [None], dtype=object)
+            columns[dim] = pd.Series(values[codes[:, i]], dtype=object).astype('category')
+        columns['rows'] = self._cell_rows[:n_cells]
+        columns['value'] = self._cell_value[:n_cells]
+        columns['orders'] = np.bincount(pair_cells, minlength=n_cells)
+        cells = sd_schema.order_categories(pd.DataFrame(columns))
+
+        # Order ที่อยู่มากกว่า 1 ช่อง (คู่เรียงตาม Order อยู่แล้ว)
+        in_many = np.zeros(len(pair_orders), dtype=bool)
+        same_as_next = pair_orders[1:] == pair_orders[:-1]
+        in_many[1:] |= same_as_next
+        in_many[:-1] |= same_as_next
+        multi_orders = pd.factorize(pair_orders[in_many])[0].astype(np.int64)
+        return sd_cube.OrderCube(cells, multi_orders, pair_cells[in_many].astype(np.int64))
+
+
+class StreamResult:
+    # ผลการอ่านแบบ streaming: cube สำหรับ KPI/กราฟ/ตัวกรอง + ไฟล์ spill (ถ้ามี) สำหรับดูข้อมูลดิบ
+
+    def __init__(self, key, cube, rows, spill, attrs):
+        self.key = key
+        self.cube = cube
+        self.rows = rows
+        self.spill = spill
+        self.attrs = attrs
+
+
+def _spill_table(raw, normalized):
+    return pa.Table.from_pandas(pd.DataFrame({
+        col: normalized[col].astype('string') if col in sd_loader.DERIVED_COLUMNS else raw[col] if col in TEXT_COLUMNS else normalized[col]
+        for col in SPILL_SCHEMA.names
+    }), schema=SPILL_SCHEMA, preserve_index=False).replace_schema_metadata(None)
+
+
+def load_stream(source, key, progress=None, spill=None, batch_rows=None):
+    # อ่านไฟล์ทีละ batch: normalize -> เพิ่มเข้า cube (ถ้าเปิด spill เขียน batch ลง Parquet ไปพร้อมกัน)
+    spill = SPILL if spill is None else spill
+    start = time.perf_counter()
+    builder = CubeBuilder()
+    writer = tmp_path = None
+    engine = None
+    sheets = set()
+    try:
+        if spill:
+            os.makedirs(sd_cache.CACHE_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=sd_cache.CACHE_DIR, suffix='.tmp')
+            os.close(fd)
+            writer = pq.ParquetWriter(tmp_path, SPILL_SCHEMA, compression='lz4')
+        for raw in iter_batches(source, batch_rows, progress=progress):
+            engine = raw.attrs['engine']
+            sheets.add(raw.attrs['sheet'])
+            raw = sd_sla.derive(raw)
+            normalized = sd_schema.normalize_orders(raw.drop(columns=['Order ID']))
+            normalized['Order ID'] = raw['Order ID']
+            builder.add(normalized)
+            if writer is not None:
+                writer.write_table(_spill_table(raw, normalized))
+        if writer is not None:
+            writer.close()
+            writer = None
+            os.replace(tmp_path, spill_path(key))
+            tmp_path = None
+            sd_cache.evict()
+    finally:
+        if writer is not None:
+            writer.close()
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    seconds = time.perf_counter() - start
+    attrs = {
+        'parse': {'engine': f"{engine or '-'} (streaming)", 'seconds': seconds, 'rows': builder.rows, 'sheets': len(sheets)},
+        'cache': {'hit': False, 'key': key, 'seconds': seconds},
+    }
+    return StreamResult(key, builder.cube(), builder.rows, spill_path(key) if spill else None, attrs)
+
+
+def preview(path, rows):
+    # แถวแรก ๆ ของไฟล์ spill (อ่านแค่ batch แรก ไม่โหลดทั้งไฟล์)
+    if not path or not os.path.exists(path):
+        return None
+    parquet = pq.ParquetFile(path)
+    first = next(parquet.iter_batches(batch_size=rows), None)
+    return first.to_pandas() if first is not None else None
+
+
+_results = OrderedDict()
+_registry_lock = threading.Lock()
+_key_locks = {}
+
+
+def get_stream(key, source, progress=None):
+    # ผลการอ่านไฟล์นี้ (key = hash ของเนื้อไฟล์) ใช้ร่วมกันทุก session ถ้าหลาย session อัปโหลดไฟล์เดียวกันพร้อมกัน
+    # จะอ่านแค่ session แรก ที่เหลือรอใช้ผลเดียวกัน (ไม่ใช้ st.cache_resource เพราะ progress bar อยู่นอกฟังก์ชัน)
+    with _registry_lock:
+        result = _results.get(key)
+        if result is not None:
+            _results.move_to_end(key)
+            return result
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+
+    with key_lock:
+        with _registry_lock:
+            result = _results.get(key)
+        if result is None:
+            result = load_stream(source, key, progress=progress)
+            with _registry_lock:
+                _results[key] = result
+                while len(_results) > MAX_RESULTS:
+                    old_key, _ = _results.popitem(last=False)
+                    _key_locks.pop(old_key, None)
+    return result
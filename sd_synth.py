@@ -0,0 +1,122 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# --- สร้างไฟล์ export SD จำลอง (คอลัมน์เดียวกับที่ Dashboard ใช้) สำหรับทดสอบความเร็ว ---
+# ตัวอย่าง: python sd_synth.py --rows 100000 --format xlsx --out sd_100k.xlsx
+
+STATUSES = ['COMPLETE', 'CANCEL', 'UNSUCCESSFUL ON DEMAND DELIVERY', 'ASSIGNED', 'PICKED UP', 'ON DELIVERY']
+STATUS_WEIGHTS = [0.78, 0.05, 0.03, 0.05, 0.04, 0.05]
+PAYMENT_CODES = ['COD', 'CREDIT CARD', 'PROMPTPAY', 'WALLET', 'VOUCHER']
+PAYMENT_WEIGHTS = [0.35, 0.25, 0.25, 0.1, 0.05]
+# --- ช่วงเวลาทำงาน 08-21 น. คนสั่งเยอะช่วงเที่ยงและเย็น ---
+HOURS = np.arange(8, 22)
+HOUR_WEIGHTS = np.array([2, 4, 6, 9, 11, 9, 6, 5, 6, 8, 10, 9, 6, 3], dtype=float)
+
+# Excel รองรับสูงสุด 1,048,576 แถวต่อ sheet (รวมหัวตาราง)
+EXCEL_MAX_ROWS = 1_048_575
+FORMATS = ['xlsx', 'parquet']
+# --- วันที่ของเวลาจำลอง (--timestamps) ---
+ORDER_DAY = pd.Timestamp('2024-05-02')
+
+
+def generate_orders(rows, seed=0, riders=None, timestamps=False):
+    # สร้าง DataFrame จำลอง โดยให้ SLA STS สอดคล้องกับ Status
+    # timestamps=True: ใส่เวลาดิบ (sd_sla.TIME_COLUMNS) แทน Hours/SLA STS โดยให้คำนวณกลับได้ค่าเดิม
+    rng = np.random.default_rng(seed)
+    riders = riders or max(5, rows // 25)
+
+    status = rng.choice(STATUSES, size=rows, p=STATUS_WEIGHTS)
+    sla = np.where(rng.random(rows) < 0.88, 'Within SLA', 'Over SLA').astype(object)
+    sla[status == 'CANCEL'] = 'Cancel'
+    sla[np.isin(status, ['PICKED UP', 'ON DELIVERY'])] = 'Dispatched'
+    sla[status == 'ASSIGNED'] = 'Pending'
+
+    rider = np.array([f"Rider {i:05d}" for i in range(riders)], dtype=object)[rng.integers(0, riders, size=rows)]
+    # Order ที่ยังไม่มี Rider รับงาน
+    rider[(status == 'ASSIGNED') & (rng.random(rows) < 0.5)] = None
+
+    df = pd.DataFrame({
+        'Order ID': (10_000_000 + np.arange(rows)).astype(str),
+        'Net Order Value': np.round(rng.lognormal(mean=5.5, sigma=0.6, size=rows), 2),
+        'Status': status,
+        'Rider Name': rider,
+        'Payment Code': rng.choice(PAYMENT_CODES, size=rows, p=PAYMENT_WEIGHTS),
+        'Hours': rng.choice(HOURS, size=rows, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum()),
+        'SLA STS': sla,
+    })
+    if not timestamps:
+        return df
+    return _with_timestamps(df, rng)
+
+
+def _with_timestamps(df, rng):
+    # เวลาสั่งอยู่ในชั่วโมง Hours, เวลาส่งถึงห่างจากเวลาสั่งตาม SLA STS (SLA 60 นาทีตามค่าเริ่มต้นของ sd_sla)
+    import sd_sla
+
+    rows = len(df)
+    sla = df['SLA STS'].to_numpy()
+    minute = pd.to_timedelta(1, unit='min')
+    order_time = ORDER_DAY + pd.to_timedelta(df['Hours'] * 60 + rng.integers(0, 60, size=rows), unit='min')
+    dispatch_time = order_time + rng.integers(5, 30, size=rows) * minute
+    delivery_time = order_time + np.where(sla == 'Over SLA', rng.integers(61, 120, size=rows), rng.integers(31, 61, size=rows)) * minute
+    delivered = np.isin(sla, ['Within SLA', 'Over SLA'])
+    return df.drop(columns=['Hours', 'SLA STS']).assign(**{
+        sd_sla.ORDER_TIME_COLUMN: order_time,
+        sd_sla.DISPATCH_TIME_COLUMN: dispatch_time.where(delivered | (sla == 'Dispatched')),
+        sd_sla.DELIVERY_TIME_COLUMN: delivery_time.where(delivered),
+    })
+
+
+def _write_xlsx(df, path):
+    # ใช้ openpyxl แบบ write-only เพื่อให้เขียนไฟล์ใหญ่ได้เร็วและไม่กินหน่วยความจำ
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet1')
+    ws.append(list(df.columns))
+    for row in df.itertuples(index=False, name=None):
+        ws.append([None if pd.isna(v) else v for v in row])
+    wb.save(path)
+
+
+def write_export(df, path, fmt=None):
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt == 'xlsx':
+        if len(df) > EXCEL_MAX_ROWS:
+            raise ValueError(f"xlsx รองรับสูงสุด {EXCEL_MAX_ROWS:,} แถว ใช้ --format parquet สำหรับไฟล์ที่ใหญ่กว่านี้")
+        _write_xlsx(df, path)
+    elif fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    elif fmt == 'xlsb':
+        # ยังไม่มี library Python ที่เขียน .xlsb ได้ (pyxlsb อ่านได้อย่างเดียว)
+        raise ValueError("เขียน .xlsb ไม่ได้ กรุณาสร้าง .xlsx แล้ว Save As .xlsb ใน Excel")
+    else:
+        raise ValueError(f"ไม่รู้จักรูปแบบไฟล์: {fmt}")
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="สร้างไฟล์ export SD จำลองสำหรับทดสอบ Dashboard")
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--format', choices=FORMATS + ['xlsb'], default='xlsx')
+    parser.add_argument('--out', help="ชื่อไฟล์ปลายทาง (ค่าเริ่มต้น sd_synth_<rows>.<format>)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timestamps', action='store_true', help="ใส่เวลาสั่ง/ออกจากสาขา/ส่งถึง แทนคอลัมน์ Hours และ SLA STS")
+    args = parser.parse_args(argv)
+
+    out = args.out or f"sd_synth_{args.rows}.{args.format}"
+    try:
+        write_export(generate_orders(args.rows, seed=args.seed, timestamps=args.timestamps), out, args.format)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(out)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
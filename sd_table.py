@@ -0,0 +1,103 @@
+import io
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# --- คอลัมน์ที่ให้กรองด้วยรายการค่า (categorical) ---
+FILTER_COLUMNS = ['Site', 'Status', 'SLA STS', 'Payment Code', 'Hours', 'Rider Name']
+PAGE_SIZES = [50, 100, 500, 1000]
+CSV_CHUNK_ROWS = 50_000
+
+
+def filtered_positions(df, filters, sort_by=None, ascending=True):
+    # คืนค่าตำแหน่งแถว (numpy array) ที่ผ่านตัวกรองและเรียงแล้ว โดยไม่สร้าง DataFrame ใหม่
+    mask = np.ones(len(df), dtype=bool)
+    for col, values in filters.items():
+        if values:
+            mask &= df[col].isin(values).to_numpy()
+    positions = np.flatnonzero(mask)
+    if sort_by:
+        column = df[sort_by].iloc[positions].reset_index(drop=True)
+        order = column.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+        positions = positions[order]
+    return positions
+
+
+class CsvChunkStream(io.RawIOBase):
+    # สร้าง CSV ทีละ chunk ตอนที่ถูกอ่าน แทนการเรียก df.to_csv() ทั้งก้อนในครั้งเดียว (ไม่มี str ทั้งไฟล์ + bytes อีกชุดพร้อมกัน)
+    # หมายเหตุ: ผู้อ่าน (st.download_button) อ่านจนหมดแล้วเก็บ bytes ทั้งไฟล์ไว้ในหน่วยความจำจนกว่าจะดาวน์โหลดเสร็จ
+    # ไม่ได้ส่งไปยัง browser ทีละ chunk
+
+    def __init__(self, df, positions, chunk_rows=CSV_CHUNK_ROWS):
+        self.df = df
+        self.positions = positions
+        self.chunk_rows = chunk_rows
+        self.offset = 0
+        self.buffer = b''
+        self.header_written = False
+
+    def readable(self):
+        return True
+
+    def _next_chunk(self):
+        if self.offset >= len(self.positions) and self.header_written:
+            return b''
+        chunk = self.df.iloc[self.positions[self.offset:self.offset + self.chunk_rows]]
+        data = chunk.to_csv(index=False, header=not self.header_written).encode('utf-8-sig' if not self.header_written else 'utf-8')
+        self.header_written = True
+        self.offset += self.chunk_rows
+        return data
+
+    def readinto(self, b):
+        while not self.buffer:
+            self.buffer = self._next_chunk()
+            if not self.buffer:
+                return 0
+        n = min(len(b), len(self.buffer))
+        b[:n] = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        return n
+
+
+def render_raw_table(df, key='raw'):
+    # ตารางข้อมูลดิบแบบแบ่งหน้า: กรอง/เรียงที่ฝั่ง server แล้วส่งไปแสดงเฉพาะหน้าที่เลือก
+    columns = [col for col in FILTER_COLUMNS if col in df.columns]
+    filter_cols = st.columns(len(columns)) if columns else []
+    filters = {}
+    for col, container in zip(columns, filter_cols):
+        options = list(df[col].cat.categories) if isinstance(df[col].dtype, pd.CategoricalDtype) else sorted(df[col].dropna().unique())
+        filters[col] = container.multiselect(col, options, key=f"{key}_filter_{col}")
+
+    sort_col, order_col, size_col = st.columns((2, 1, 1))
+    sort_by = sort_col.selectbox("เรียงตาม", ['(ไม่เรียง)'] + list(df.columns), key=f"{key}_sort")
+    ascending = order_col.radio("ลำดับ", ['น้อยไปมาก', 'มากไปน้อย'], horizontal=True, key=f"{key}_order") == 'น้อยไปมาก'
+    page_size = size_col.selectbox("แถวต่อหน้า", PAGE_SIZES, key=f"{key}_size")
+
+    # จำผลการกรอง/เรียงไว้ใน session เพื่อให้การเปลี่ยนหน้าไม่ต้องกรอง/เรียงใหม่
+    data_key = df.attrs.get('cache', {}).get('key', id(df))
+    state_key = (data_key, tuple((col, tuple(v)) for col, v in filters.items()), sort_by, ascending)
+    cached = st.session_state.get(f"{key}_positions")
+    if cached is None or cached[0] != state_key:
+        positions = filtered_positions(df, filters, None if sort_by == '(ไม่เรียง)' else sort_by, ascending)
+        st.session_state[f"{key}_positions"] = (state_key, positions)
+        # ตัวกรอง/การเรียงเปลี่ยน กลับไปหน้าแรก
+        st.session_state[f"{key}_page"] = 1
+    else:
+        positions = cached[1]
+
+    total_pages = max(1, math.ceil(len(positions) / page_size))
+    page_no = st.number_input("หน้า", min_value=1, max_value=total_pages, key=f"{key}_page")
+    st.caption(f"ทั้งหมด {total_pages:,} หน้า / {len(positions):,} แถว")
+    start = (page_no - 1) * page_size
+    st.dataframe(df.iloc[positions[start:start + page_size]])
+
+    # data เป็น callable: สร้าง CSV เฉพาะตอนกดปุ่ม (rerun ปกติ/เปลี่ยนหน้าไม่สร้าง) แต่ตอนกดยังใช้หน่วยความจำเท่าขนาดไฟล์ CSV
+    st.download_button(
+        "ดาวน์โหลด CSV (ตามตัวกรอง)",
+        data=lambda: CsvChunkStream(df, positions),
+        file_name="sd_raw_data.csv",
+        mime="text/csv",
+        key=f"{key}_csv",
+    )
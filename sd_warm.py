@@ -0,0 +1,83 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+import sd_assets
+import sd_cache
+import sd_live
+import sd_snapshot
+
+# --- pre-warm ตอนเริ่ม server: โหลดชุดข้อมูลล่าสุดที่รู้จัก + สร้าง snapshot/กราฟ/bitmap index ไว้เบื้องหลัง ---
+# viewer คนแรกหลังรีสตาร์ทจะได้ผลจาก cache แทนการ parse Excel และ import Plotly เอง (ปิดได้ด้วย SD_WARM=0)
+WARM_ON_START = os.environ.get('SD_WARM', '1') == '1'
+
+_started = set()
+_lock = threading.Lock()
+# --- ผลของการ pre-warm เบื้องหลังรอบล่าสุด (dataset, rows, seconds หรือ error) ---
+status = {}
+
+
+def latest_dataset(folder=sd_live.DROP_DIR):
+    # ชุดข้อมูลล่าสุดที่รู้จัก: ไฟล์ล่าสุดในโฟลเดอร์ drop (ผ่านตัวเฝ้าโฟลเดอร์เดียวกับ Live mode)
+    # ถ้าโฟลเดอร์ว่าง ใช้ชุดข้อมูลที่ถูกใช้ล่าสุดใน cache บนดิสก์ (เช่น ไฟล์ที่อัปโหลดครั้งก่อน)
+    df = sd_live.get_watcher(folder).poll()
+    if df is not None:
+        return df
+    key = sd_cache.latest_key()
+    return sd_cache.cached_orders(key) if key else None
+
+
+def warm(figures=tuple(sd_snapshot.FIGURE_BUILDERS), image_urls=(), folder=sd_live.DROP_DIR):
+    # โหลดรูป + ชุดข้อมูลล่าสุด แล้วสร้าง snapshot/กราฟ/bitmap index ไว้ใน registry ของ process (และ JSON ของกราฟบนดิสก์)
+    start = time.perf_counter()
+    for url in image_urls:
+        sd_assets.get_image(url)
+    result = {'images': len(image_urls), 'dataset': None, 'rows': 0}
+    df = latest_dataset(folder)
+    if df is not None:
+        snap = sd_snapshot.get_snapshot(df)
+        snap.prepare(figures)
+        result.update(dataset=snap.key, rows=len(df))
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def start(figures=tuple(sd_snapshot.FIGURE_BUILDERS), image_urls=(), folder=sd_live.DROP_DIR):
+    # เริ่ม pre-warm ใน thread เบื้องหลังครั้งเดียวต่อ process (session ที่เรียกไม่ต้องรอ)
+    if not WARM_ON_START:
+        return False
+    job = (tuple(figures), tuple(image_urls), folder)
+    with _lock:
+        if job in _started:
+            return False
+        _started.add(job)
+
+    def worker():
+        try:
+            status.update(warm(figures, image_urls, folder))
+        except Exception as e:
+            # pre-warm ไม่สำเร็จไม่กระทบการใช้งาน (session จะโหลดเองตามปกติ)
+            status['error'] = e
+
+    threading.Thread(target=worker, name='sd-warm', daemon=True).start()
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="เตรียม cache (ข้อมูล/กราฟ/รูป) จาก export ล่าสุด ก่อนหรือพร้อมกับการเริ่ม streamlit")
+    parser.add_argument('--folder', default=sd_live.DROP_DIR, help="โฟลเดอร์ drop ที่มีไฟล์ export")
+    parser.add_argument('--image', action='append', default=[], help="URL ของรูปที่ต้องการเก็บไว้บนดิสก์ (ใส่ได้หลายครั้ง)")
+    args = parser.parse_args(argv)
+
+    result = warm(image_urls=args.image, folder=args.folder)
+    if result['dataset'] is None:
+        print(f"ไม่พบชุดข้อมูลใน {args.folder} หรือใน cache ({result['seconds']:.2f} วินาที)")
+    else:
+        print(f"{result['dataset']}: {result['rows']:,} แถว, กราฟ {len(sd_snapshot.FIGURE_BUILDERS)} รูป ใน {result['seconds']:.2f} วินาที")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import http.server
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+import sd_assets
+
+IMAGE = b'\x89PNG\r\n\x1a\n-image-v1'
+ETAG = '"v1"'
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    # /img.png ตอบรูปพร้อม ETag (304 ถ้า If-None-Match ตรง) path อื่นตอบ 500
+    log = []
+
+    def do_GET(self):
+        etag = self.headers.get('If-None-Match')
+        if self.path == '/img.png':
+            status = 304 if etag == ETAG else 200
+        else:
+            status = 500
+        self.log.append((self.path, etag, status))
+        self.send_response(status)
+        if status == 200:
+            self.send_header('ETag', ETAG)
+            self.send_header('Content-Length', str(len(IMAGE)))
+        else:
+            self.send_header('Content-Length', '0')
+        self.end_headers()
+        if status == 200:
+            self.wfile.write(IMAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.log = []
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", _Handler.log
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    bundled = tmp_path / 'bundled'
+    bundled.mkdir()
+    shutil.copy(os.path.join(sd_assets.BUNDLED_DIR, sd_assets.PLACEHOLDER_FILE), bundled / sd_assets.PLACEHOLDER_FILE)
+    monkeypatch.setattr(sd_assets, 'ASSET_DIR', str(tmp_path / 'assets'))
+    monkeypatch.setattr(sd_assets, 'BUNDLED_DIR', str(bundled))
+    for state in (sd_assets._memory, sd_assets._failed_at, sd_assets._refreshing):
+        state.clear()
+    return bundled
+
+
+def _wait_refreshed(url, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with sd_assets._lock:
+            if url not in sd_assets._refreshing:
+                return
+        time.sleep(0.01)
+    raise AssertionError("การเช็ครูปเบื้องหลังไม่จบ")
+
+
+def test_first_fetch_then_304_revalidation(server, monkeypatch):
+    base, log = server
+    url = f"{base}/img.png"
+
+    data, data_uri = sd_assets.get_image(url)
+    assert data == IMAGE
+    assert data_uri.startswith('data:image/png;base64,')
+    assert log == [('/img.png', None, 200)]
+
+    # เรียกซ้ำใน process เดิม: ใช้หน่วยความจำ ไม่ยิง request
+    assert sd_assets.get_bytes(url) == IMAGE
+    assert len(log) == 1
+
+    # process ใหม่ (หน่วยความจำว่าง) และรูปบนดิสก์หมดอายุ: แสดงรูปบนดิสก์ทันที แล้วเช็คด้วย ETag เบื้องหลัง
+    sd_assets._memory.clear()
+    monkeypatch.setattr(sd_assets, 'ASSET_TTL_SECONDS', -1)
+    assert sd_assets.get_bytes(url) == IMAGE
+    _wait_refreshed(url)
+    assert log[1] == ('/img.png', ETAG, 304)
+    data, meta = sd_assets._read_disk(url)
+    assert data == IMAGE and meta['etag'] == ETAG
+
+
+def test_download_failure_uses_bundled_copy(server, isolated):
+    base, log = server
+    (isolated / 'Robot_pic.png').write_bytes(b'bundled-robot')
+    url = f"{base}/Robot_pic.png"
+
+    assert sd_assets.get_bytes(url) == b'bundled-robot'
+    _wait_refreshed(url)
+    assert log == [('/Robot_pic.png', None, 500)]
+    # ดาวน์โหลดไม่สำเร็จ ยังใช้รูปสำรองต่อ
+    assert sd_assets.get_bytes(url) == b'bundled-robot'
+
+
+def test_failure_backoff_and_placeholder(server, isolated):
+    base, log = server
+    url = f"{base}/missing.png"
+    placeholder = (isolated / sd_assets.PLACEHOLDER_FILE).read_bytes()
+
+    assert sd_assets.get_bytes(url) == placeholder
+    assert len(log) == 1
+    # ภายใน RETRY_AFTER_SECONDS ไม่ยิง request ซ้ำ
+    assert sd_assets.get_bytes(url) == placeholder
+    assert len(log) == 1
+    # ครบเวลาแล้วลองใหม่
+    sd_assets._failed_at[url] -= sd_assets.RETRY_AFTER_SECONDS + 1
+    assert sd_assets.get_bytes(url) == placeholder
+    assert len(log) == 2
+
+
+def test_placeholder_missing_returns_none(server, isolated):
+    base, _ = server
+    os.remove(isolated / sd_assets.PLACEHOLDER_FILE)
+    assert sd_assets.get_image(f"{base}/missing.png") == (None, None)
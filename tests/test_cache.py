@@ -0,0 +1,66 @@
+import os
+
+import pandas as pd
+import pytest
+
+import sd_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(sd_cache, 'CACHE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def _frame(rows=1000):
+    return pd.DataFrame({'Order ID': range(rows), 'Net Order Value': [1.5] * rows})
+
+
+def test_put_get_roundtrip():
+    df = _frame()
+    assert sd_cache.get('missing') is None
+    assert sd_cache.put('a', df)
+    pd.testing.assert_frame_equal(sd_cache.get('a'), df)
+
+
+def test_content_hash_depends_on_bytes_and_sla_settings(monkeypatch):
+    key = sd_cache.content_hash(b'data')
+    assert key.startswith(f"v{sd_cache.CACHE_VERSION}-")
+    assert key == sd_cache.content_hash(b'data')
+    assert key != sd_cache.content_hash(b'other')
+    monkeypatch.setattr(sd_cache.sd_sla, 'SLA_MINUTES', 45.0)
+    assert key != sd_cache.content_hash(b'data')
+
+
+def test_evict_removes_least_recently_used(cache_dir):
+    for i, key in enumerate(['old', 'mid', 'new']):
+        sd_cache.put(key, _frame())
+        os.utime(sd_cache._path(key), (1000 + i, 1000 + i))
+    # อ่าน 'old' แล้วกลายเป็นไฟล์ที่ใช้ล่าสุด
+    sd_cache.get('old')
+    size = os.path.getsize(sd_cache._path('mid'))
+    sd_cache.evict(max_mb=2.5 * size / 1024 / 1024)
+    assert sorted(name[:-len('.parquet')] for name in os.listdir(cache_dir)) == ['new', 'old']
+    sd_cache.evict(max_mb=0)
+    assert os.listdir(cache_dir) == []
+
+
+def test_corrupt_file_is_removed():
+    path = sd_cache._path('broken')
+    with open(path, 'wb') as f:
+        f.write(b'PAR1 not really parquet')
+    assert sd_cache.get('broken') is None
+    assert not os.path.exists(path)
+
+
+def test_failed_write_leaves_no_files(cache_dir):
+    def writer(tmp_path):
+        raise OSError('disk full')
+    assert not sd_cache._write(sd_cache._path('x'), writer)
+    assert os.listdir(cache_dir) == []
+
+
+def test_text_entries():
+    assert sd_cache.get_text('fig') is None
+    sd_cache.put_text('fig', '{"data": []}')
+    assert sd_cache.get_text('fig') == '{"data": []}'
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import sd_cache
+import sd_charts
+import sd_schema
+import sd_snapshot
+import sd_synth
+
+
+@pytest.fixture
+def df_hourly():
+    # Hours เรียงแบบตัวเลขตามลำดับ category ('9' มาก่อน '10') และชั่วโมง '11' ไม่มี Order
+    hours = pd.Categorical(['10', '9', '9', '10', '11'], categories=['9', '10', '11'], ordered=True)
+    sla = pd.Categorical(['Within SLA', 'Over SLA', 'Within SLA', 'Cancel', 'Pending'], categories=sd_schema.SLA_ORDER, ordered=True)
+    return pd.DataFrame({'Hours': hours, 'SLA STS': sla, 'Count': [4, 1, 2, 3, 0]})
+
+
+def test_hourly_matrix(df_hourly):
+    matrix = sd_charts.hourly_matrix(df_hourly)
+    assert list(matrix.index) == ['9', '10']
+    assert list(matrix.columns) == ['Within SLA', 'Over SLA', 'Pending', 'Cancel']
+    assert matrix.loc['9'].tolist() == [2, 1, 0, 0]
+    assert matrix.loc['10'].tolist() == [4, 0, 0, 3]
+
+
+@pytest.mark.parametrize('combo', [False, True])
+def test_build_hourly_chart(df_hourly, combo):
+    matrix = sd_charts.hourly_matrix(df_hourly)
+    fig = sd_charts.build_hourly_chart(matrix, combo=combo)
+    bars = [trace for trace in fig.data if trace.type == 'bar']
+    assert [trace.name for trace in bars] == list(matrix.columns)
+    # ค่า 0 ไม่วาดแท่ง
+    within = bars[0]
+    assert list(within.y) == [2, 4]
+    assert all(np.isnan(bars[2].y))
+    totals = [trace for trace in fig.data if trace.type == 'scatter']
+    assert len(totals) == 1
+    assert list(totals[0].y) == [3, 7]
+    assert list(fig.layout.xaxis.categoryarray) == ['9', '10']
+    if combo:
+        assert totals[0].yaxis == 'y2'
+
+
+def test_snapshot_reuses_figure_json(tmp_path, monkeypatch):
+    # กราฟของชุดข้อมูลเดิม (key เดิม) สร้างจาก JSON บนดิสก์ ไม่เรียก builder อีก
+    monkeypatch.setattr(sd_cache, 'CACHE_DIR', str(tmp_path))
+    df = sd_schema.normalize_orders(sd_synth.generate_orders(500, seed=12))
+    built = sd_snapshot.Snapshot.from_frame('dataset', df).figure('hourly_combo')
+
+    def fail(snap):
+        raise AssertionError('figure rebuilt')
+    monkeypatch.setitem(sd_snapshot.FIGURE_BUILDERS, 'hourly_combo', fail)
+    loaded = sd_snapshot.Snapshot.from_frame('dataset', df).figure('hourly_combo')
+    assert loaded.to_plotly_json() == built.to_plotly_json()
@@ -0,0 +1,121 @@
+from dataclasses import asdict
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sd_cube
+import sd_filters
+import sd_kpi
+import sd_schema
+import sd_stream
+import sd_synth
+
+
+@pytest.fixture(scope='module')
+def orders():
+    # Order บางส่วนมีหลายแถวต่างช่องกัน (สถานะ/Payment เปลี่ยน) เพื่อทดสอบการหักจำนวนที่นับซ้ำตอน rollup
+    df = sd_synth.generate_orders(3000, seed=7)
+    repeats = df.sample(200, random_state=1).assign(Status='CANCEL', **{'SLA STS': 'Cancel'})
+    moved = df.sample(100, random_state=2).assign(**{'Payment Code': 'VOUCHER', 'SLA STS': 'Over SLA'})
+    return pd.concat([df, repeats, moved], ignore_index=True)
+
+
+@pytest.fixture(scope='module')
+def normalized(orders):
+    return sd_schema.normalize_orders(orders)
+
+
+def _baseline_kpis(df):
+    # KPI แบบเดิม: กรอง DataFrame แล้ว nunique ทีละตัวชี้วัด
+    non_cancel = df[df['Status'] != sd_kpi.STATUS_CANCEL]
+    total_orders = df['Order ID'].nunique()
+    total_complete = int((df['Status'] == sd_kpi.STATUS_COMPLETE).sum())
+    non_cancel_orders = non_cancel['Order ID'].nunique()
+    over_sla_orders = non_cancel.loc[non_cancel['SLA STS'] == sd_kpi.SLA_OVER, 'Order ID'].nunique()
+    return sd_kpi.KPIResult(
+        total_orders=total_orders,
+        total_value=float(df['Net Order Value'].sum()),
+        total_complete=total_complete,
+        total_on_process=total_orders - total_complete,
+        total_unsuccessful=int((df['Status'] == sd_kpi.STATUS_UNSUCCESSFUL).sum()),
+        total_riders=df['Rider Name'].nunique(),
+        non_cancel_orders=non_cancel_orders,
+        over_sla_orders=over_sla_orders,
+        over_sla_rate=(over_sla_orders / non_cancel_orders) * 100 if non_cancel_orders > 0 else 0.0,
+    )
+
+
+def _assert_kpis_equal(actual, expected):
+    # จำนวนต้องตรงกัน ค่าทศนิยม (มูลค่ารวม/อัตรา) ต่างได้แค่เศษจากลำดับการบวก
+    assert asdict(actual) == pytest.approx(asdict(expected))
+
+
+def _rollup(cube, by):
+    # ผล rollup ที่ไม่ขึ้นกับลำดับช่อง/รายการ category (ใช้เทียบ cube สองชุด)
+    result = cube.rollup(by).astype({dim: object for dim in by})
+    return result.sort_values(by).reset_index(drop=True)
+
+
+def test_cube_kpis_match_baseline(normalized):
+    cube = sd_cube.OrderCube.from_frame(normalized)
+    _assert_kpis_equal(cube.kpis(), _baseline_kpis(normalized))
+    _assert_kpis_equal(sd_kpi.compute_kpis(normalized), _baseline_kpis(normalized))
+
+
+def test_cube_charts_match_baseline(normalized):
+    cube = sd_cube.OrderCube.from_frame(normalized)
+
+    payments = normalized['Payment Code'].value_counts()
+    assert dict(zip(cube.payment_counts()['Payment Code'], cube.payment_counts()['Count'])) == payments[payments > 0].to_dict()
+
+    riders = normalized[normalized['Status'] != sd_kpi.STATUS_CANCEL].groupby('Rider Name', observed=True)['Order ID'].nunique()
+    assert dict(zip(cube.rider_order_counts()['Rider Name'], cube.rider_order_counts()['Total Orders'])) == riders.to_dict()
+
+    hourly = normalized.groupby(['Hours', 'SLA STS'], observed=True).size()
+    assert cube.hourly().set_index(['Hours', 'SLA STS'])['Count'].to_dict() == hourly.to_dict()
+
+
+@pytest.mark.parametrize('filters', [
+    {'Payment Code': ['COD', 'WALLET']},
+    {'Hours': ['11', '12', '13'], 'SLA STS': ['Over SLA']},
+    {'Rider Name': ['Rider 00003', 'Rider 00042'], 'Payment Code': ['VOUCHER']},
+])
+def test_filtered_cube_kpis_match_baseline(normalized, filters):
+    cube = sd_cube.OrderCube.from_frame(normalized)
+    mask = sd_filters.BitmapIndex(cube.cells).select(filters)
+    rows = np.logical_and.reduce([normalized[dim].isin(values).to_numpy() for dim, values in filters.items()])
+    _assert_kpis_equal(cube.subset(mask).kpis(), _baseline_kpis(normalized[rows]))
+
+
+def test_streaming_builder_matches_from_frame(orders, normalized):
+    # ป้อนทีละ batch แบบเดียวกับ sd_stream.load_stream (normalize แยกต่อ batch รายการ category จึงต่างกันได้)
+    builder = sd_stream.CubeBuilder()
+    for start in range(0, len(orders), 700):
+        raw = orders.iloc[start:start + 700]
+        batch = sd_schema.normalize_orders(raw.drop(columns=['Order ID']))
+        batch['Order ID'] = raw['Order ID']
+        builder.add(batch)
+    streamed = builder.cube()
+    expected = sd_cube.OrderCube.from_frame(normalized)
+
+    assert builder.rows == len(orders)
+    assert streamed.dimensions == expected.dimensions
+    _assert_kpis_equal(streamed.kpis(), expected.kpis())
+    for dim in expected.dimensions:
+        pd.testing.assert_frame_equal(_rollup(streamed, [dim]), _rollup(expected, [dim]))
+    pd.testing.assert_frame_equal(_rollup(streamed, ['Hours', 'SLA STS']), _rollup(expected, ['Hours', 'SLA STS']))
+
+
+def test_stream_reads_every_order_sheet(tmp_path, orders, normalized):
+    # workbook หลาย sheet: อ่านทุก sheet ที่มี Order ID ข้าม sheet สรุป แบบเดียวกับ sd_loader.read_workbooks
+    path = tmp_path / 'multi.xlsx'
+    with pd.ExcelWriter(path) as writer:
+        orders.iloc[:2000].to_excel(writer, sheet_name='Day1', index=False)
+        pd.DataFrame({'Summary': [1, 2]}).to_excel(writer, sheet_name='Pivot', index=False)
+        orders.iloc[2000:].to_excel(writer, sheet_name='Day2', index=False)
+
+    result = sd_stream.load_stream(str(path), 'multi', spill=False, batch_rows=700)
+    assert result.rows == len(orders)
+    assert result.attrs['parse']['sheets'] == 2
+    _assert_kpis_equal(result.cube.kpis(), sd_cube.OrderCube.from_frame(normalized).kpis())
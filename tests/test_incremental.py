@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+import sd_incremental
+import sd_kpi
+import sd_schema
+import sd_synth
+
+
+def test_append_matches_full_recount():
+    # ไฟล์แรกทั้งวัน แล้วไฟล์ถัดไปมีทั้ง Order ที่เปลี่ยนสถานะและ Order ใหม่
+    first = sd_synth.generate_orders(2000, seed=3)
+    pending = first[first['Status'] != 'COMPLETE']
+    changed = pending.sample(300, random_state=4).assign(Status='COMPLETE', **{'SLA STS': 'Over SLA'})
+    # Order ID ตัวเลขล้วนเหมือนไฟล์แรก (sd_schema เก็บเป็น int ทั้งสองไฟล์)
+    new = sd_synth.generate_orders(500, seed=5).assign(**{'Order ID': lambda d: (d['Order ID'].astype(int) + 1_000_000).astype(str)})
+    second = pd.concat([changed, new], ignore_index=True)
+
+    state = sd_incremental.IntradayState()
+    assert state.apply(sd_schema.normalize_orders(first)) == len(first)
+    assert state.verify() == []
+    assert state.apply(sd_schema.normalize_orders(second)) == len(second)
+    assert state.verify() == []
+    # อัปโหลดไฟล์เดิมซ้ำ ไม่มี Order ที่เปลี่ยน
+    assert state.apply(sd_schema.normalize_orders(second)) == 0
+
+    latest = pd.concat([first, second]).drop_duplicates('Order ID', keep='last')
+    expected = sd_kpi.compute_kpis(latest)
+    actual = state.kpis()
+    assert actual.total_orders == expected.total_orders
+    assert actual.total_complete == expected.total_complete
+    assert actual.over_sla_orders == expected.over_sla_orders
+    assert actual.total_value == pytest.approx(expected.total_value)
+
+
+def test_verify_catches_counter_drift():
+    # verify คำนวณใหม่ด้วย sd_kpi/groupby จึงจับตัวนับสะสมที่ผิดได้
+    state = sd_incremental.IntradayState()
+    state.apply(sd_schema.normalize_orders(sd_synth.generate_orders(1000, seed=6)))
+    state.sla_counts['Over SLA'] += 1
+    state.rider_counts_non_cancel['Rider 00001'] -= 1
+    assert state.verify() == ['rider_counts', 'sla_totals']
+
+
+def test_missing_hours_and_sla_columns():
+    # ไฟล์ที่ไม่มี Hours/SLA STS ไม่มีข้อมูลกราฟ (Dashboard แสดงคำเตือนแบบเดียวกับการโหลดทั้งไฟล์)
+    df = sd_synth.generate_orders(1000, seed=8).drop(columns=['Hours', 'SLA STS'])
+    state = sd_incremental.IntradayState()
+    state.apply(sd_schema.normalize_orders(df))
+    assert state.sla_totals() is None
+    assert state.hourly() is None
+    assert state.verify() == []
+
+
+def test_sla_totals_include_orders_without_hours():
+    df = sd_synth.generate_orders(1000, seed=9)
+    df.loc[df.sample(100, random_state=9).index, 'Hours'] = None
+    state = sd_incremental.IntradayState()
+    state.apply(sd_schema.normalize_orders(df))
+    assert state.sla_totals().to_dict() == df['SLA STS'].value_counts().to_dict()
+    assert state.hourly()['Count'].sum() == df['Hours'].notna().sum()
@@ -0,0 +1,64 @@
+import zipfile
+
+import pytest
+
+import sd_loader
+import sd_synth
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / 'SD_2024-05-02.xlsx'
+    sd_synth.generate_orders(300, seed=11).assign(Extra='x').to_excel(path, index=False)
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def parse_stats(monkeypatch):
+    monkeypatch.setattr(sd_loader, 'PARSE_STATS', {})
+
+
+def test_engine_chain_by_extension(monkeypatch):
+    monkeypatch.setattr(sd_loader, '_has_module', lambda name: True)
+    assert sd_loader.engine_chain('SD.xlsb') == ['pyxlsb', 'calamine']
+    assert sd_loader.engine_chain('SD.XLSX') == ['calamine', 'openpyxl']
+    # engine ที่ไม่ได้ติดตั้งถูกข้าม ถ้าไม่มีเลยใช้ตัวสำรองตัวท้าย
+    monkeypatch.setattr(sd_loader, '_has_module', lambda name: name == 'openpyxl')
+    assert sd_loader.engine_chain('SD.xlsx') == ['openpyxl']
+    monkeypatch.setattr(sd_loader, '_has_module', lambda name: False)
+    assert sd_loader.engine_chain('SD.xlsb') == ['calamine']
+
+
+def test_read_orders_projects_columns(workbook):
+    df = sd_loader.read_orders(workbook, engine='openpyxl')
+    assert set(df.columns) == set(sd_loader.REQUIRED_COLUMNS)
+    assert df.attrs['parse']['engine'] == 'openpyxl'
+    assert df.attrs['parse']['rows'] == 300
+    assert sd_loader.PARSE_STATS['openpyxl']['count'] == 1
+
+
+def test_read_orders_falls_back_to_next_engine(workbook, monkeypatch):
+    # engine แรกอ่านไม่ได้ ถอยไปใช้ตัวถัดไป และบันทึกสถิติเฉพาะตัวที่อ่านได้
+    monkeypatch.setattr(sd_loader, 'engine_chain', lambda name: ['no-such-engine', 'openpyxl'])
+    with open(workbook, 'rb') as f:
+        df = sd_loader.read_orders(sd_loader.named_buffer(f.read(), 'SD.xlsx'))
+    assert df.attrs['parse']['engine'] == 'openpyxl'
+    assert len(df) == 300
+    assert list(sd_loader.PARSE_STATS) == ['openpyxl']
+
+
+def test_read_orders_raises_last_error(tmp_path, monkeypatch):
+    path = tmp_path / 'broken.xlsx'
+    path.write_bytes(b'not a workbook')
+    monkeypatch.setattr(sd_loader, 'engine_chain', lambda name: ['no-such-engine', 'openpyxl'])
+    with pytest.raises(zipfile.BadZipFile):
+        sd_loader.read_orders(str(path))
+    assert sd_loader.PARSE_STATS == {}
+
+
+def test_parse_summary():
+    assert list(sd_loader.parse_summary().columns) == ['engine', 'files', 'rows', 'avg_seconds', 'last_seconds']
+    sd_loader._record('calamine', 1.0, 10)
+    sd_loader._record('calamine', 3.0, 30)
+    row = sd_loader.parse_summary().iloc[0]
+    assert (row['files'], row['rows'], row['avg_seconds'], row['last_seconds']) == (2, 40, 2.0, 3.0)
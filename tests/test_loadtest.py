@@ -0,0 +1,64 @@
+import os
+import struct
+import urllib.request
+import zlib
+
+import pytest
+
+import sd_loadtest
+import sd_synth
+
+
+def test_png_is_valid():
+    image = sd_loadtest._png(width=4, height=3, rgb=(1, 2, 3))
+    assert image.startswith(b'\x89PNG\r\n\x1a\n')
+    pos, chunks = 8, {}
+    while pos < len(image):
+        length, kind = struct.unpack('>I4s', image[pos:pos + 8])
+        data = image[pos + 8:pos + 8 + length]
+        assert struct.unpack('>I', image[pos + 8 + length:pos + 12 + length])[0] == zlib.crc32(kind + data)
+        chunks[kind] = data
+        pos += 12 + length
+    assert struct.unpack('>II', chunks[b'IHDR'][:8]) == (4, 3)
+    assert zlib.decompress(chunks[b'IDAT']) == (b'\x00' + b'\x01\x02\x03' * 4) * 3
+
+
+def test_image_server_and_env(tmp_path, monkeypatch):
+    monkeypatch.setenv('SD_CACHE_DIR', '/shared/cache')
+    with sd_loadtest.ImageServer() as images:
+        with urllib.request.urlopen(f"{images.url}/Rider_pic.png") as response:
+            assert response.read() == sd_loadtest._png()
+        env = sd_loadtest.server_env(str(tmp_path), images.url)
+    # ค่าที่ตั้งไว้แล้วใน env ใช้ตามเดิม ที่เหลือเป็นโฟลเดอร์ชั่วคราวของ server
+    assert env['SD_CACHE_DIR'] == '/shared/cache'
+    assert env['SD_HISTORY_DIR'] == os.path.join(str(tmp_path), 'history')
+    assert env['SD_ROBOT_IMAGE_URL'] == f"{images.url}/Robot_pic.png"
+
+
+def test_summary_without_reruns():
+    level = {
+        'app': 'sd_dashboard.py', 'input': 'synthetic-100.xlsx', 'sessions': 2, 'errors': 2,
+        'rerun_seconds': {'p50': sd_loadtest._percentile([], 50), 'p95': None},
+        'cpu_percent': None, 'peak_rss_mb': None,
+    }
+    assert sd_loadtest._summary(level) == "sd_dashboard.py synthetic-100.xlsx x2: ไม่มี rerun ที่สำเร็จ, CPU -, RSS สูงสุด -, error 2"
+
+
+@pytest.mark.parametrize('app', sd_loadtest.APPS)
+def test_run_level_against_server(tmp_path, app):
+    # server จริง 1 ตัว: 2 session อัปโหลดไฟล์เดียวกันแล้ว rerun
+    pytest.importorskip('websockets')
+    path = str(tmp_path / 'sd_synth.xlsx')
+    sd_synth.write_export(sd_synth.generate_orders(500, seed=41), path, 'xlsx')
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with sd_loadtest.ImageServer() as images:
+        env = sd_loadtest.server_env(str(tmp_path), images.url)
+        for name in ('SD_CACHE_DIR', 'SD_HISTORY_DIR', 'SD_DROP_DIR', 'SD_ASSET_DIR', 'SD_PROFILE_DIR'):
+            env[name] = str(tmp_path / name)
+        with sd_loadtest.StreamlitServer(os.path.join(repo, app), env, str(tmp_path / 'server.log')) as server:
+            level = sd_loadtest.run_level(server, path, sessions=2, reruns=2)
+    assert level['error_samples'] == []
+    assert level['completed_sessions'] == 2
+    assert level['reruns'] == 4
+    assert level['rerun_seconds']['p50'] > 0
+    assert level['first_load_seconds']['max'] >= level['first_load_seconds']['p50']
@@ -0,0 +1,58 @@
+import json
+import os
+
+import pytest
+
+import sd_assets
+import sd_cache
+import sd_kpi
+import sd_publish
+import sd_schema
+import sd_synth
+
+
+@pytest.fixture(autouse=True)
+def offline(tmp_path, monkeypatch):
+    # ไม่โหลดรูปจากเครือข่าย และเก็บ JSON ของกราฟใน tmp
+    monkeypatch.setattr(sd_assets, 'get_data_uri', lambda url: 'data:image/png;base64,AAAA')
+    monkeypatch.setattr(sd_cache, 'CACHE_DIR', str(tmp_path / 'cache'))
+
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def test_publish_page_and_metrics(tmp_path):
+    df = sd_schema.normalize_orders(sd_synth.generate_orders(800, seed=31))
+    out = tmp_path / 'out'
+    path = sd_publish.publish(df, 'SD <Bangna>.xlsx', str(out))
+    assert path == str(out / sd_publish.PAGE_FILE)
+
+    page = _read(path)
+    assert f'<meta http-equiv="refresh" content="{sd_publish.PAGE_REFRESH_SECONDS}">' in page
+    assert 'SD &lt;Bangna&gt;.xlsx' in page
+    for label, value in sd_kpi.kpi_tiles(sd_kpi.compute_kpis(df)):
+        assert f'<div class="kpi-value">{value}</div>' in page
+    # plotly.js เป็นไฟล์แยกในโฟลเดอร์เดียวกัน ไม่ฝังในหน้า
+    scripts = [name for name in os.listdir(out) if name.startswith('plotly-')]
+    assert len(scripts) == 1
+    assert f'<script src="{scripts[0]}"></script>' in page
+    assert page.count('class="plotly-graph-div"') == 3
+    assert 'class="warning"' not in page
+
+    data = json.loads(_read(out / sd_publish.METRICS_FILE))
+    assert data['source'] == 'SD <Bangna>.xlsx'
+    assert data['rows'] == len(df)
+    assert data['kpis']['total_orders'] == df['Order ID'].nunique()
+    assert data['tiles'] == dict(sd_kpi.kpi_tiles(sd_kpi.compute_kpis(df)))
+
+
+def test_publish_without_sla_columns(tmp_path):
+    df = sd_schema.normalize_orders(sd_synth.generate_orders(300, seed=32).drop(columns=['Hours', 'SLA STS']))
+    page = _read(sd_publish.publish(df, 'SD.xlsx', str(tmp_path), inline_js=True))
+    assert page.count('class="warning"') == 2
+    assert page.count('class="plotly-graph-div"') == 1
+    # inline: ไม่มีไฟล์ plotly.js แยก
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('plotly-')]
+    assert sorted(name for name in os.listdir(tmp_path) if not os.path.isdir(tmp_path / name)) == [sd_publish.PAGE_FILE, sd_publish.METRICS_FILE]
@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+
+import sd_schema
+
+
+def test_numeric_ids_downcast():
+    ids = sd_schema._downcast_ids(pd.Series(['123', '4567', '89']))
+    assert pd.api.types.is_integer_dtype(ids.dtype)
+    assert list(ids) == [123, 4567, 89]
+    # ค่าตัวเลขจาก reader (int/float ที่เป็นจำนวนเต็ม) แปลงได้เลย
+    assert pd.api.types.is_integer_dtype(sd_schema._downcast_ids(pd.Series([1.0, 2.0])).dtype)
+
+
+@pytest.mark.parametrize('values', [
+    ['00123', '123'],
+    ['123', '1e3'],
+    [' 123', '456'],
+    ['123', 'N123'],
+])
+def test_ids_that_do_not_round_trip_stay_text(values):
+    # แปลงแล้วจะได้ค่าซ้ำหรือค่าที่ต่างจากไฟล์ คงเป็นข้อความ
+    ids = sd_schema._downcast_ids(pd.Series(values))
+    assert list(ids) == values
+
+
+def test_leading_zero_ids_stay_distinct():
+    df = pd.DataFrame({'Order ID': ['00123', '123'], 'Status': ['COMPLETE', 'COMPLETE'], 'Net Order Value': [1, 2]})
+    assert sd_schema.normalize_orders(df)['Order ID'].nunique() == 2
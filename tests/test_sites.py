@@ -0,0 +1,67 @@
+import io
+
+import pandas as pd
+import pytest
+
+import sd_cache
+import sd_loader
+import sd_store
+import sd_synth
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(sd_cache, 'CACHE_DIR', str(tmp_path))
+    # อ่านใน process นี้ (ไม่ spawn process pool ในการทดสอบ)
+    monkeypatch.setattr(sd_loader, 'LOAD_WORKERS', 1)
+    # ชุดข้อมูลในหน่วยความจำแยกต่อการทดสอบ
+    monkeypatch.setattr(sd_store, '_frames', sd_store.OrderedDict())
+    monkeypatch.setattr(sd_store, '_sizes', {})
+
+
+def _upload(name, sheets):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer) as writer:
+        for sheet, df in sheets.items():
+            df.to_excel(writer, sheet_name=sheet, index=False)
+    return sd_loader.named_buffer(buffer.getvalue(), name)
+
+
+@pytest.fixture
+def uploads():
+    bangna = sd_synth.generate_orders(400, seed=21)
+    # Order ID ขึ้นต้นด้วยตัวอักษร (เก็บเป็นข้อความ) ต่างจากอีกไฟล์ที่เป็นตัวเลข
+    rama9 = sd_synth.generate_orders(250, seed=22).assign(**{'Order ID': lambda d: 'R' + d['Order ID'].astype(str)})
+    return [
+        _upload('MFC_Bangna_2024-05-02.xlsx', {'AM': bangna.iloc[:150], 'Pivot': pd.DataFrame({'Total': [1]}), 'PM': bangna.iloc[150:]}),
+        _upload('MFC_Rama9_20240502.xlsx', {'Orders': rama9}),
+    ]
+
+
+def test_site_name():
+    assert sd_loader.site_name('MFC_Bangna_2024-05-31.xlsx') == 'MFC_Bangna'
+    assert sd_loader.site_name('SD_20240531.xlsb') == 'SD'
+    assert sd_loader.site_name('Rama9 31-05-2024.xlsx') == 'Rama9'
+    assert sd_loader.site_name('2024-05-31.xlsx') == '2024-05-31'
+
+
+def test_load_many_adds_site_column(uploads):
+    df = sd_cache.load_many(uploads)
+    assert len(df) == 650
+    assert df['Site'].value_counts().to_dict() == {'MFC_Bangna': 400, 'MFC_Rama9': 250}
+    assert df['Order ID'].nunique() == 650
+    assert df.attrs['sites'] == {'files': 2, 'sites': 2}
+    assert df.attrs['parse']['files'] == 2
+    assert not df.attrs['cache']['hit']
+
+
+def test_load_many_reuses_cached_files(uploads):
+    keys = [sd_cache.content_hash(f.getvalue()) for f in uploads]
+    # ไฟล์ที่เคยอ่านแล้ว (ทีละไฟล์) ไม่ต้อง parse ใหม่ตอนรวม
+    sd_cache.load_orders(uploads[0], key=keys[0])
+    df = sd_cache.load_many(uploads, keys=keys)
+    assert df.attrs['parse']['files'] == 1
+    again = sd_cache.load_many(uploads, keys=keys)
+    assert again.attrs['cache']['hit']
+    assert again.attrs['cache']['key'] == df.attrs['cache']['key']
+    pd.testing.assert_frame_equal(again, df)
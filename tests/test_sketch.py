@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+import sd_sketch
+
+
+def _ids(start, stop):
+    return pd.Series([f"{i:08d}" for i in range(start, stop)])
+
+
+def test_estimate_within_three_sigma():
+    for n in (1_000, 50_000):
+        ids = _ids(0, n)
+        # ค่าซ้ำไม่ถูกนับเพิ่ม
+        estimate = sd_sketch.HLL.from_values(pd.concat([ids, ids.head(n // 10)])).estimate()
+        assert abs(estimate - n) <= 3 * sd_sketch.relative_error() * n
+
+
+def test_merge_equals_sketch_of_union():
+    a, b = _ids(0, 30_000), _ids(20_000, 45_000)
+    merged = sd_sketch.HLL.from_values(a).merge(sd_sketch.HLL.from_values(b))
+    union = sd_sketch.HLL.from_values(pd.concat([a, b]))
+    np.testing.assert_array_equal(merged.registers, union.registers)
+    assert merged.estimate() == union.estimate()
+
+    blobs = [sd_sketch.HLL.from_values(part).to_bytes() for part in (a, b)]
+    np.testing.assert_array_equal(sd_sketch.merge_bytes(blobs).registers, union.registers)
+
+
+def test_group_sketches_merge_to_total():
+    # sketch ต่อชั่วโมง รวมกันแล้วเท่ากับ sketch ของทั้งไฟล์
+    df = pd.DataFrame({'Order ID': _ids(0, 5_000), 'hour': np.arange(5_000) % 14})
+    groups = sd_sketch.group_sketches(df, ['hour'], columns=['Order ID'])
+    merged = sd_sketch.merge_bytes(groups['registers'])
+    np.testing.assert_array_equal(merged.registers, sd_sketch.HLL.from_values(df['Order ID']).registers)
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import sd_sla
+
+
+def _times(values):
+    return sd_sla.timestamps(pd.Series(values, dtype='object'))
+
+
+def test_hour_buckets_keep_only_present_hours():
+    # ช่วงที่ไม่มี Order ไม่อยู่ในรายการ category และรหัสถูกนับใหม่ต่อกัน
+    order = _times(['2024-05-02 08:10:00', '2024-05-02 13:59:00', None, '2024-05-02 08:59:00', '2024-05-03 00:00:00'])
+    hours = sd_sla.hour_buckets(*order, bucket_minutes=60)
+    assert list(hours.categories) == ['0', '8', '13']
+    assert list(hours.codes) == [1, 2, -1, 1, 0]
+    assert hours.ordered
+
+
+@pytest.mark.parametrize('bucket_minutes, expected', [
+    (15, ['08:00', '08:00', '08:15', '08:45']),
+    (30, ['08:00', '08:00', '08:00', '08:30']),
+])
+def test_sub_hour_buckets(bucket_minutes, expected):
+    # ขอบช่วง: 08:14:59 อยู่ช่วง 08:00, 08:15:00 เริ่มช่วงถัดไป
+    order = _times(['2024-05-02 08:00:00', '2024-05-02 08:14:59', '2024-05-02 08:15:00', '2024-05-02 08:59:00'])
+    hours = sd_sla.hour_buckets(*order, bucket_minutes=bucket_minutes)
+    assert list(hours.astype(str)) == expected
+
+
+def test_bucket_must_divide_day():
+    with pytest.raises(ValueError):
+        sd_sla.hour_buckets(*_times(['2024-05-02 08:00:00']), bucket_minutes=7)
+
+
+def test_classify():
+    status = pd.Series(['COMPLETE', 'COMPLETE', 'ON PROCESS', 'ON PROCESS', 'CANCEL', 'COMPLETE'])
+    order = _times(['2024-05-02 08:00:00'] * 5 + [None])
+    dispatch = _times(['2024-05-02 08:20:00', '2024-05-02 08:20:00', '2024-05-02 08:20:00', None, '2024-05-02 08:20:00', '2024-05-02 08:20:00'])
+    # ส่งถึงพอดี 60 นาที = Within SLA, เกินไป 1 วินาที = Over SLA
+    delivery = _times(['2024-05-02 09:00:00', '2024-05-02 09:00:01', None, None, '2024-05-02 08:30:00', '2024-05-02 08:30:00'])
+    sla = sd_sla.classify(status, order, dispatch, delivery, sla_minutes=60)
+    # CANCEL ทับผลจากเวลา แม้จะมีเวลาส่งถึง, ส่งถึงแต่ไม่มีเวลาสั่ง = ไม่มีค่า
+    assert list(sla[:5]) == ['Within SLA', 'Over SLA', 'Dispatched', 'Pending', 'Cancel']
+    assert pd.isna(sla[5])
+
+
+@pytest.mark.parametrize('mode, hours, sla', [
+    ('auto', ['5'], ['Within SLA']),
+    ('always', ['8'], ['Over SLA']),
+    ('off', ['5'], ['Within SLA']),
+])
+def test_derive_modes(mode, hours, sla):
+    df = pd.DataFrame({
+        'Status': ['COMPLETE'], 'Hours': ['5'], 'SLA STS': ['Within SLA'],
+        'Order Time': ['2024-05-02 08:00:00'], 'Delivery Time': ['2024-05-02 09:30:00'],
+    })
+    result = sd_sla.derive(df, sla_minutes=60, bucket_minutes=60, mode=mode)
+    # คอลัมน์เวลาดิบถูกตัดออกทุก mode
+    assert list(result.columns) == ['Status', 'Hours', 'SLA STS']
+    assert list(result['Hours'].astype(str)) == hours
+    assert list(result['SLA STS'].astype(str)) == sla
+
+
+def test_derive_fills_missing_columns():
+    df = pd.DataFrame({'Status': ['COMPLETE', 'ON PROCESS'], 'Order Time': ['2024-05-02 08:00:00', '2024-05-02 10:05:00']})
+    result = sd_sla.derive(df, mode='auto', bucket_minutes=60)
+    assert list(result['Hours'].astype(str)) == ['8', '10']
+    assert list(result['SLA STS'].astype(str)) == ['Pending', 'Pending']
+    assert np.array_equal(result['Hours'].cat.codes, [0, 1])
@@ -0,0 +1,45 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sd_table
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        'Order ID': [5, 3, 9, 1, 7],
+        'Status': pd.Categorical(['COMPLETE', 'CANCEL', 'COMPLETE', 'ON PROCESS', 'COMPLETE']),
+        'Net Order Value': [10.0, np.nan, 30.0, 20.0, 10.0],
+    })
+
+
+def test_filtered_positions(df):
+    np.testing.assert_array_equal(sd_table.filtered_positions(df, {}), [0, 1, 2, 3, 4])
+    # ตัวกรองที่ไม่ได้เลือกค่า (list ว่าง) ไม่กรอง
+    np.testing.assert_array_equal(sd_table.filtered_positions(df, {'Status': ['COMPLETE'], 'Order ID': []}), [0, 2, 4])
+    np.testing.assert_array_equal(sd_table.filtered_positions(df, {'Status': ['COMPLETE']}, 'Order ID', ascending=False), [2, 4, 0])
+
+
+def test_sort_is_stable_with_missing_last(df):
+    np.testing.assert_array_equal(sd_table.filtered_positions(df, {}, 'Net Order Value'), [0, 4, 3, 2, 1])
+    np.testing.assert_array_equal(sd_table.filtered_positions(df, {}, 'Net Order Value', ascending=False), [2, 3, 0, 4, 1])
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 2, 5, 50])
+def test_csv_stream_matches_to_csv(df, chunk_rows):
+    positions = sd_table.filtered_positions(df, {}, 'Order ID')
+    data = io.BufferedReader(sd_table.CsvChunkStream(df, positions, chunk_rows=chunk_rows)).read()
+    # BOM (utf-8-sig) เฉพาะต้นไฟล์ และ header แค่ครั้งเดียว
+    assert data.startswith(b'\xef\xbb\xbf')
+    assert data.count(b'\xef\xbb\xbf') == 1
+    assert data.count(b'Order ID') == 1
+    assert data == df.iloc[positions].to_csv(index=False).encode('utf-8-sig')
+    assert len(pd.read_csv(io.BytesIO(data), encoding='utf-8-sig')) == len(df)
+
+
+def test_csv_stream_without_rows_writes_header(df):
+    data = sd_table.CsvChunkStream(df, np.array([], dtype=np.int64)).read()
+    assert data == b'\xef\xbb\xbfOrder ID,Status,Net Order Value\n'